@@ -0,0 +1,123 @@
+import numpy as np
+import pandas as pd
+from cache_chamados import MemoriaLRU
+from desempenho import medir
+from esquema import codificar
+
+
+# Colunas categóricas usadas nos filtros e gráficos do dashboard
+COLUNAS_CATEGORIA = ["regional", "status", "motivo", "lider"]
+
+_preparados = MemoriaLRU(capacidade=2)
+_agregados = MemoriaLRU(capacidade=64)
+
+
+def mascara_codigos(codigos, categorias, tamanho, filtros):
+    """Máscara das linhas cujos códigos atendem a `filtros` ((coluna, valores), ...)."""
+    mask = np.ones(tamanho, dtype=bool)
+    for col, valores in filtros:
+        if valores and col in codigos:
+            selecionados = categorias[col].get_indexer(list(valores))
+            mask &= np.isin(codigos[col], selecionados[selecionados >= 0])
+    return mask
+
+
+class DadosPreparados:
+    """Chamados codificados uma única vez por versão dos dados.
+
+    Cada coluna categórica vira um vetor de códigos inteiros (-1 para vazio) e o
+    tempo de atendimento em minutos é calculado uma vez para todas as linhas.
+    Aceita também as métricas agregadas (metricas.py): cada linha então pesa
+    `quantidade` chamados e traz a soma/contagem das durações já calculadas.
+    """
+
+    def __init__(self, df, versao):
+        self.df = df
+        self.versao = versao
+        self.codigos = {}
+        self.categorias = {}
+        for col in COLUNAS_CATEGORIA:
+            if col in df.columns:
+                self.codigos[col], self.categorias[col] = codificar(df[col])
+
+        # Peso de cada linha e soma/quantidade de tempos (minutos) com fechamento
+        self.pesos = None
+        self.soma_tempo = None
+        self.qtd_tempo = None
+        if "quantidade" in df.columns:
+            self.pesos = df["quantidade"].to_numpy(dtype=np.int64)
+            self.soma_tempo = df["soma_duracao_s"].to_numpy(dtype=float) / 60
+            self.qtd_tempo = df["qtd_duracao"].to_numpy(dtype=np.int64)
+        elif "duracao_s" in df.columns or ("abertura" in df.columns and "fechamento" in df.columns):
+            if "duracao_s" in df.columns:
+                segundos = df["duracao_s"].to_numpy(dtype=float, na_value=np.nan)
+            else:
+                abertura = pd.to_datetime(df["abertura"], errors="coerce")
+                fechamento = pd.to_datetime(df["fechamento"], errors="coerce")
+                segundos = (fechamento - abertura).dt.total_seconds().to_numpy()
+            tempo_minutos = segundos / 60
+            com_tempo = ~np.isnan(tempo_minutos)
+            self.soma_tempo = np.where(com_tempo, tempo_minutos, 0.0)
+            self.qtd_tempo = com_tempo.astype(np.int64)
+
+    def mascara(self, filtros):
+        """Máscara booleana das linhas que atendem a `filtros` ((coluna, valores), ...)."""
+        return mascara_codigos(self.codigos, self.categorias, len(self.df), filtros)
+
+    def filtrar(self, filtros):
+        return self.df[self.mascara(filtros)]
+
+    def total(self, mask):
+        return int(mask.sum() if self.pesos is None else self.pesos[mask].sum())
+
+    def contagem(self, col, mask):
+        """Equivalente a `value_counts()` da coluna nas linhas da máscara."""
+        codigos = self.codigos[col][mask]
+        validos = codigos >= 0
+        pesos = None if self.pesos is None else self.pesos[mask][validos]
+        totais = np.bincount(codigos[validos], weights=pesos, minlength=len(self.categorias[col]))
+        serie = pd.Series(totais.astype(np.int64), index=self.categorias[col], name="count")
+        return serie[serie > 0].sort_values(ascending=False, kind="stable")
+
+    def tempo_medio(self, col, mask):
+        """Tempo médio (minutos) por categoria, considerando só chamados com fechamento."""
+        codigos = self.codigos[col][mask]
+        validos = codigos >= 0
+        tamanho = len(self.categorias[col])
+        soma = np.bincount(codigos[validos], weights=self.soma_tempo[mask][validos], minlength=tamanho)
+        quantidade = np.bincount(codigos[validos], weights=self.qtd_tempo[mask][validos], minlength=tamanho)
+        com_dados = quantidade > 0
+        media = pd.Series(soma[com_dados] / quantidade[com_dados], index=self.categorias[col][com_dados])
+        return media.sort_values(ascending=False)
+
+
+@medir()
+def preparar_dados(df, versao):
+    """Dados preparados para a versão informada; recalcula só quando a versão muda."""
+    return _preparados.obter(versao, lambda: DadosPreparados(df, versao))
+
+
+@medir()
+def calcular_agregados(preparado, filtros):
+    """Todas as agregações do dashboard para um conjunto de filtros, memoizadas por versão."""
+    def calcular():
+        mask = preparado.mascara(filtros)
+        agregados = {
+            "total": preparado.total(mask),
+            "contagens": {col: preparado.contagem(col, mask) for col in preparado.codigos},
+            "tempo_medio_motivo": None,
+        }
+        if preparado.soma_tempo is not None and "motivo" in preparado.codigos:
+            agregados["tempo_medio_motivo"] = preparado.tempo_medio("motivo", mask)
+        return agregados
+
+    return _agregados.obter((preparado.versao, filtros), calcular)
+
+
+def filtrar_chamados_por(df, filtros):
+    """Linhas de `df` que atendem a `filtros` ((coluna, valores), ...), sem codificação prévia."""
+    mask = pd.Series(True, index=df.index)
+    for col, valores in filtros:
+        if valores and col in df.columns:
+            mask &= df[col].isin(valores)
+    return df[mask]
@@ -0,0 +1,203 @@
+"""Tempo de resolução e SLA sobre todo o histórico de chamados.
+
+O tempo de resolução é calculado em segundos para todas as linhas de uma vez
+(fechamento - abertura), sem depender da coluna `duracao` em texto. Para cada
+versão do cache de chamados, os chamados finalizados são ordenados uma única
+vez por (categoria, tempo); percentis por categoria saem dessa ordem em tempo
+linear para qualquer filtro. Violações de SLA e faixas de idade dos chamados
+abertos são contagens com `np.bincount`. O prazo padrão do SLA é definido por
+CHAMADOS_SLA_HORAS (24 h).
+"""
+import os
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from agregacoes import mascara_codigos
+from cache_chamados import MemoriaLRU
+from desempenho import medir
+from esquema import codificar
+
+
+SLA_HORAS = float(os.getenv("CHAMADOS_SLA_HORAS", "24"))
+
+PERCENTIS = (50, 90, 99)
+
+# Colunas em que percentis e violações podem ser agrupados (e filtrados)
+COLUNAS_ANALISE = ["regional", "loja", "lider", "motivo", "status"]
+
+# Faixas de idade dos chamados abertos: limite superior (horas) e rótulo
+FAIXAS_IDADE = [
+    (4, "até 4 h"),
+    (24, "4 a 24 h"),
+    (72, "1 a 3 dias"),
+    (168, "3 a 7 dias"),
+    (np.inf, "mais de 7 dias"),
+]
+
+_analises = MemoriaLRU(capacidade=2)
+_resultados = MemoriaLRU(capacidade=64)
+
+
+def _datas(serie):
+    # O cache de chamados já entrega datetime; converte só o que vier em texto
+    return serie if pd.api.types.is_datetime64_dtype(serie) else pd.to_datetime(serie, errors="coerce")
+
+
+def agora_s():
+    """Agora em segundos, no mesmo relógio das datas gravadas (datetime naive do app)."""
+    return float(np.datetime64(datetime.now(), "s").astype(np.int64))
+
+
+class AnaliseChamados:
+    """Chamados preparados para as análises de tempo, uma vez por versão dos dados.
+
+    Códigos das colunas e ordenações por categoria são montados no primeiro uso.
+    """
+
+    def __init__(self, df, versao):
+        self.df = df
+        self.versao = versao
+        self.tamanho = len(df)
+        self.codigos = {}
+        self.categorias = {}
+        self._ordem = {}
+
+        abertura = _datas(df["abertura"] if self.tamanho else pd.Series(dtype="datetime64[ns]"))
+        fechamento = (
+            _datas(df["fechamento"]) if "fechamento" in df.columns
+            else pd.Series(pd.NaT, index=df.index, dtype="datetime64[ns]")
+        )
+        # Segundos de resolução (NaN sem fechamento) e abertura em segundos desde a época
+        if "duracao_s" in df.columns:
+            self.duracao_s = df["duracao_s"].to_numpy(dtype=float, na_value=np.nan)
+        else:
+            self.duracao_s = (fechamento - abertura).dt.total_seconds().to_numpy()
+        self.abertura_s = abertura.to_numpy().astype("datetime64[ns]").view(np.int64) / 1e9
+        self.abertura_s[abertura.isna().to_numpy()] = np.nan
+        self.finalizado = ~np.isnan(self.duracao_s)
+        aberto = (df["status"] == "Aberto").to_numpy() if "status" in df.columns else np.zeros(self.tamanho, bool)
+        self.aberto = aberto & ~np.isnan(self.abertura_s)
+
+    def codificar(self, col):
+        """Códigos inteiros (-1 para vazio) e categorias da coluna, calculados uma vez."""
+        if col not in self.codigos and col in COLUNAS_ANALISE and col in self.df.columns:
+            codigos, self.categorias[col] = codificar(self.df[col])
+            # Tipo inteiro menor: a ordenação estável de inteiros pequenos usa radix sort
+            self.codigos[col] = codigos.astype(np.int16 if len(self.categorias[col]) < 2 ** 15 else np.int64)
+        return col in self.codigos
+
+    def ordem(self, col=None):
+        """Índices dos finalizados ordenados por duração (dentro de cada categoria de `col`)."""
+        if col not in self._ordem:
+            if col is None:
+                finalizados = np.flatnonzero(self.finalizado)
+                self._ordem[None] = finalizados[np.argsort(self.duracao_s[finalizados])]
+            else:
+                geral = self.ordem()
+                # Ordenação estável: a ordem por duração se mantém dentro de cada categoria
+                self._ordem[col] = geral[np.argsort(self.codigos[col][geral], kind="stable")]
+        return self._ordem[col]
+
+    def mascara(self, filtros):
+        for col, valores in filtros:
+            if valores:
+                self.codificar(col)
+        return mascara_codigos(self.codigos, self.categorias, self.tamanho, filtros)
+
+    def percentis(self, col, mask, percentis=PERCENTIS):
+        """Percentis do tempo de resolução (horas) por categoria de `col`, mais a linha "Geral"."""
+        colunas = ["chamados"] + [f"p{p}" for p in percentis]
+        linhas = {}
+        ordem = self.ordem()[mask[self.ordem()]]
+        if len(ordem):
+            linhas["Geral"] = [len(ordem)] + list(_interpolar(self.duracao_s[ordem], np.array([0]), np.array([len(ordem)]), percentis)[:, 0])
+        if col is not None and self.codificar(col):
+            ordem = self.ordem(col)[mask[self.ordem(col)]]
+            codigos = self.codigos[col][ordem]
+            validos = codigos >= 0
+            ordem, codigos = ordem[validos], codigos[validos]
+            contagem = np.bincount(codigos, minlength=len(self.categorias[col]))
+            com_dados = np.flatnonzero(contagem)
+            inicios = (np.cumsum(contagem) - contagem)[com_dados]
+            valores = _interpolar(self.duracao_s[ordem], inicios, contagem[com_dados], percentis)
+            for posicao, codigo in enumerate(com_dados):
+                linhas[self.categorias[col][codigo]] = [contagem[codigo]] + list(valores[:, posicao])
+        tabela = pd.DataFrame.from_dict(linhas, orient="index", columns=colunas)
+        tabela[colunas[1:]] = tabela[colunas[1:]] / 3600
+        tabela["chamados"] = tabela["chamados"].astype(np.int64)
+        geral = tabela.loc[["Geral"]] if "Geral" in tabela.index else tabela.iloc[:0]
+        return pd.concat([geral, tabela.drop(index="Geral", errors="ignore").sort_values(f"p{percentis[-1]}", ascending=False)])
+
+    def violacoes(self, col, mask, sla_horas=SLA_HORAS, agora=None):
+        """Chamados e violações do SLA por categoria de `col`.
+
+        Viola o SLA o chamado finalizado que levou mais que o prazo e o aberto há
+        mais tempo que o prazo.
+        """
+        limite = sla_horas * 3600
+        self.codificar(col)
+        agora = agora_s() if agora is None else agora
+        violado = (self.finalizado & (self.duracao_s > limite)) | (self.aberto & (agora - self.abertura_s > limite))
+        codigos = self.codigos[col][mask]
+        validos = codigos >= 0
+        tamanho = len(self.categorias[col])
+        chamados = np.bincount(codigos[validos], minlength=tamanho)
+        violados = np.bincount(codigos[validos], weights=violado[mask][validos], minlength=tamanho).astype(np.int64)
+        com_dados = chamados > 0
+        tabela = pd.DataFrame(
+            {"chamados": chamados[com_dados], "violacoes": violados[com_dados]},
+            index=self.categorias[col][com_dados],
+        )
+        tabela["percentual"] = 100 * tabela["violacoes"] / tabela["chamados"]
+        return tabela.sort_values(["violacoes", "percentual"], ascending=False, kind="stable")
+
+    def idade_abertos(self, mask, agora=None):
+        """Quantidade de chamados abertos em cada faixa de idade."""
+        agora = agora_s() if agora is None else agora
+        selecionados = self.aberto & mask
+        idade_h = (agora - self.abertura_s[selecionados]) / 3600
+        faixas = np.searchsorted([limite for limite, _ in FAIXAS_IDADE[:-1]], idade_h, side="right")
+        contagem = np.bincount(faixas, minlength=len(FAIXAS_IDADE))
+        return pd.Series(contagem, index=[rotulo for _, rotulo in FAIXAS_IDADE], name="count")
+
+
+def _interpolar(valores, inicios, contagens, percentis):
+    """Percentis (interpolação linear, como np.percentile) de vários trechos ordenados de `valores`.
+
+    Cada trecho começa em `inicios[i]` e tem `contagens[i]` elementos. Retorna
+    uma matriz (percentis x trechos).
+    """
+    resultado = np.empty((len(percentis), len(inicios)))
+    for linha, p in enumerate(percentis):
+        posicao = (contagens - 1) * (p / 100)
+        baixo = np.floor(posicao).astype(np.int64)
+        alto = np.minimum(baixo + 1, contagens - 1)
+        fracao = posicao - baixo
+        resultado[linha] = valores[inicios + baixo] * (1 - fracao) + valores[inicios + alto] * fracao
+    return resultado
+
+
+@medir()
+def preparar_analise(df, versao):
+    """Análise preparada para a versão informada dos chamados; recalcula só quando a versão muda."""
+    return _analises.obter(versao, lambda: AnaliseChamados(df, versao))
+
+
+@medir()
+def calcular_analise(analise, filtros, col="regional", sla_horas=SLA_HORAS):
+    """Percentis por motivo, violações de SLA por `col` e idade dos abertos, memoizados.
+
+    A idade depende do relógio: o resultado vale por um minuto.
+    """
+    minuto = int(agora_s() // 60)
+
+    def calcular():
+        mask = analise.mascara(filtros)
+        agora = minuto * 60.0
+        return {
+            "percentis": analise.percentis("motivo", mask),
+            "violacoes": analise.violacoes(col, mask, sla_horas, agora) if analise.codificar(col) else None,
+            "idade_abertos": analise.idade_abertos(mask, agora),
+        }
+
+    return _resultados.obter((analise.versao, filtros, col, sla_horas, minuto), calcular)
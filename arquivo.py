@@ -0,0 +1,50 @@
+"""Arquivamento de chamados finalizados antigos.
+
+Chamados finalizados há mais de CHAMADOS_DIAS_ARQUIVO dias (padrão 90) saem da
+tabela `chamados` e vão para `chamados_historico`, particionada por mês de
+abertura (função `arquivar_chamados` de schema.sql). Assim a carga do cache,
+a listagem e as consultas por status crescem com o volume recente, não com o
+histórico. As métricas do dashboard continuam contando os arquivados.
+
+A listagem só consulta o histórico quando o período escolhido começa antes da
+abertura mais recente arquivada (`database.precisa_historico`); chamados
+abertos nunca são arquivados.
+
+Arquivamento periódico (ex.: cron): python arquivo.py [dias]
+"""
+import os
+import sys
+import streamlit as st
+
+
+DIAS_ARQUIVO = int(os.getenv("CHAMADOS_DIAS_ARQUIVO", "90"))
+
+
+def painel_arquivo():
+    """Arquivamento sob demanda e limite do histórico, na barra lateral (admin)."""
+    import database
+
+    with st.sidebar.expander("🗄️ Arquivo de chamados"):
+        limite = database.limite_historico()
+        if limite is None:
+            st.write("Nenhum chamado arquivado.")
+        else:
+            st.write(f"Histórico: chamados abertos até {limite:%d/%m/%Y}")
+        dias = st.number_input("Finalizados há mais de (dias)", min_value=1, value=DIAS_ARQUIVO, step=1,
+                               key="dias_arquivo")
+        if st.button("Arquivar agora", key="arquivar_chamados"):
+            total = database.arquivar_chamados(dias)
+            st.success(f"✅ {total or 0} chamado(s) arquivado(s).")
+
+
+def main(argv=None):
+    import database
+
+    argv = sys.argv[1:] if argv is None else argv
+    dias = int(argv[0]) if argv else DIAS_ARQUIVO
+    total = database.arquivar_chamados(dias)
+    print(f"Chamados arquivados (finalizados há mais de {dias} dias): {total or 0}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
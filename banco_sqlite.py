@@ -0,0 +1,529 @@
+"""Banco embutido em SQLite com a mesma interface de cliente do Supabase.
+
+`database.py` fala com o banco só pela interface do `supabase.Client`:
+`table(nome)` com select/insert/upsert/update/delete, filtros (eq, neq, gt,
+gte, lt, lte, in_, is_, not_), order, limit/range e execute(), e `rpc(nome,
+parametros)` com as funções de schema.sql. `ClienteSQLite` implementa essa
+interface sobre um arquivo SQLite com índices em status, abertura, regional,
+loja e fechamento, para rodar o sistema sem Supabase (CHAMADOS_BACKEND=sqlite)
+e comparar a latência das consultas entre os bancos. `assinar` entrega as
+alterações feitas pelo próprio processo, como o canal de tempo real. Gatilhos
+numeram as alterações de chamados e guardam as remoções, como em schema.sql.
+"""
+import copy
+import re
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+import metricas
+from supabase_local import RespostaLocal
+
+
+ESQUEMA = """
+create table if not exists chamados (
+    id integer primary key autoincrement,
+    regional text,
+    loja text,
+    lider text,
+    motivo text,
+    abertura text,
+    status text,
+    fechamento text,
+    duracao text,
+    observacao text,
+    chave text unique,
+    alteracao integer
+);
+create index if not exists chamados_status_abertura on chamados (status, abertura);
+create index if not exists chamados_abertura on chamados (abertura);
+create index if not exists chamados_regional_loja on chamados (regional, loja);
+create index if not exists chamados_loja on chamados (loja);
+create index if not exists chamados_fechamento on chamados (fechamento);
+
+-- Histórico de chamados arquivados (schema.sql); sem partições no SQLite, o
+-- índice na abertura faz o papel da poda por mês
+create table if not exists chamados_historico (
+    id integer primary key,
+    regional text,
+    loja text,
+    lider text,
+    motivo text,
+    abertura text,
+    status text,
+    fechamento text,
+    duracao text,
+    observacao text,
+    chave text,
+    alteracao integer
+);
+create index if not exists chamados_historico_abertura on chamados_historico (abertura);
+
+create table if not exists motivos (
+    id integer primary key autoincrement,
+    motivo text not null unique
+);
+
+create table if not exists usuarios (
+    id integer primary key autoincrement,
+    usuario text not null unique,
+    senha text,
+    papel text
+);
+
+create table if not exists metricas_chamados (
+    dia text not null,
+    regional text not null default '',
+    loja text not null default '',
+    lider text not null default '',
+    motivo text not null default '',
+    status text not null,
+    quantidade integer not null default 0,
+    soma_duracao_s real not null default 0,
+    qtd_duracao integer not null default 0,
+    primary key (dia, regional, loja, lider, motivo, status)
+);
+"""
+
+# Numeração das alterações de chamados (gatilhos de schema.sql). Sem sequências
+# nem NEW alterável no SQLite, o número sai de uma tabela de uma linha e é
+# gravado depois do insert/update; `returning` devolve a linha sem ele.
+ALTERACOES = """
+create index if not exists chamados_alteracao on chamados (alteracao);
+
+create table if not exists chamados_sequencia (valor integer not null);
+insert into chamados_sequencia (valor) select 0 where not exists (select 1 from chamados_sequencia);
+
+create table if not exists chamados_removidos (
+    id integer not null,
+    alteracao integer not null
+);
+create index if not exists chamados_removidos_alteracao on chamados_removidos (alteracao);
+
+create trigger if not exists chamados_alteracao_insert after insert on chamados
+begin
+    update chamados_sequencia set valor = valor + 1;
+    update chamados set alteracao = (select valor from chamados_sequencia) where id = new.id;
+end;
+
+create trigger if not exists chamados_alteracao_update
+after update of regional, loja, lider, motivo, abertura, status, fechamento, duracao, observacao, chave on chamados
+begin
+    update chamados_sequencia set valor = valor + 1;
+    update chamados set alteracao = (select valor from chamados_sequencia) where id = new.id;
+end;
+
+create trigger if not exists chamados_remocao after delete on chamados
+begin
+    update chamados_sequencia set valor = valor + 1;
+    insert into chamados_removidos (id, alteracao) select old.id, valor from chamados_sequencia;
+end;
+"""
+
+# Índices de chamados (benchmark: mesma consulta com e sem índices)
+INDICES = ["chamados_status_abertura", "chamados_abertura", "chamados_regional_loja", "chamados_loja", "chamados_fechamento"]
+
+_IDENTIFICADOR = re.compile(r"^[a-z_][a-z0-9_]*$")
+
+
+def _nome(coluna):
+    """Nome de tabela/coluna validado antes de entrar no SQL."""
+    coluna = coluna.strip()
+    if not _IDENTIFICADOR.match(coluna):
+        raise ValueError(f"Nome inválido: {coluna!r}")
+    return coluna
+
+
+class ConsultaSQLite:
+    def __init__(self, cliente, tabela):
+        self._cliente = cliente
+        self._tabela = _nome(tabela)
+        self._operacao = "select"
+        self._colunas = "*"
+        self._contar = False
+        self._dados = None
+        self._filtros = []
+        self._parametros = []
+        self._negar = False
+        self._ordem = []
+        self._limite = None
+        self._deslocamento = 0
+        self._ignorar_duplicados = False
+        self._conflito = None
+
+    # Operações
+    def select(self, colunas="*", count=None):
+        self._operacao = "select"
+        if colunas and colunas != "*":
+            self._colunas = ", ".join(_nome(c) for c in colunas.split(","))
+        self._contar = count is not None
+        return self
+
+    def insert(self, dados, **kwargs):
+        self._operacao = "insert"
+        self._dados = dados if isinstance(dados, list) else [dados]
+        return self
+
+    def upsert(self, dados, on_conflict=None, ignore_duplicates=False, **kwargs):
+        self._operacao = "upsert"
+        self._dados = dados if isinstance(dados, list) else [dados]
+        self._conflito = [_nome(c) for c in on_conflict.split(",")] if on_conflict else ["id"]
+        self._ignorar_duplicados = ignore_duplicates
+        return self
+
+    def update(self, dados, **kwargs):
+        self._operacao = "update"
+        self._dados = dados
+        return self
+
+    def delete(self, **kwargs):
+        self._operacao = "delete"
+        return self
+
+    # Filtros
+    def _filtro(self, condicao, *parametros):
+        negar, self._negar = self._negar, False
+        self._filtros.append(f"not ({condicao})" if negar else condicao)
+        self._parametros.extend(parametros)
+        return self
+
+    @property
+    def not_(self):
+        self._negar = True
+        return self
+
+    def eq(self, coluna, valor):
+        return self._filtro(f"{_nome(coluna)} = ?", valor)
+
+    def neq(self, coluna, valor):
+        return self._filtro(f"{_nome(coluna)} <> ?", valor)
+
+    def _intervalo(self, coluna, operador, valor):
+        # Intervalos de datas costumam ser seletivos: `unlikely` faz o SQLite preferir o
+        # índice da coluna a percorrer a tabela na ordem do id
+        condicao = f"{_nome(coluna)} {operador} ?"
+        return self._filtro(condicao if _nome(coluna) == "id" else f"unlikely({condicao})", valor)
+
+    def gt(self, coluna, valor):
+        return self._intervalo(coluna, ">", valor)
+
+    def gte(self, coluna, valor):
+        return self._intervalo(coluna, ">=", valor)
+
+    def lt(self, coluna, valor):
+        return self._intervalo(coluna, "<", valor)
+
+    def lte(self, coluna, valor):
+        return self._intervalo(coluna, "<=", valor)
+
+    def in_(self, coluna, valores):
+        valores = list(valores)
+        if not valores:
+            return self._filtro("0")
+        return self._filtro(f"{_nome(coluna)} in ({', '.join('?' * len(valores))})", *valores)
+
+    def is_(self, coluna, valor):
+        if valor in (None, "null"):
+            return self._filtro(f"{_nome(coluna)} is null")
+        return self._filtro(f"{_nome(coluna)} is ?", valor)
+
+    # Ordenação e paginação
+    def order(self, coluna, desc=False):
+        # Como no PostgREST: nulos por último na ordem crescente e primeiro na decrescente
+        # (o id nunca é nulo, e ordenar só por ele aproveita a ordem da tabela)
+        direcao = "desc" if desc else "asc"
+        if _nome(coluna) == "id":
+            self._ordem.append(f"id {direcao}")
+        else:
+            self._ordem.append(f"({_nome(coluna)} is null) {direcao}, {_nome(coluna)} {direcao}")
+        return self
+
+    def limit(self, quantidade):
+        self._limite = quantidade
+        return self
+
+    def range(self, inicio, fim):
+        self._deslocamento = inicio
+        self._limite = fim - inicio + 1
+        return self
+
+    def execute(self):
+        return self._cliente._executar(self)
+
+    def _onde(self):
+        return f" where {' and '.join(self._filtros)}" if self._filtros else ""
+
+
+class ChamadaSQLite:
+    def __init__(self, cliente, nome, parametros):
+        self._cliente = cliente
+        self._nome = nome
+        self._parametros = parametros
+
+    def execute(self):
+        cliente = self._cliente
+        with cliente._lock, cliente._conexao:
+            cliente.requisicoes += 1
+            return RespostaLocal(FUNCOES[self._nome](cliente, **self._parametros))
+
+
+# Equivalentes das funções SQL de schema.sql
+def _somar_metricas(cliente, p_linhas):
+    """Soma às métricas os incrementos já agrupados por chave (parte de cadastrar/finalizar)."""
+    colunas = metricas.COLUNAS_CHAVE + metricas.COLUNAS_VALOR
+    cliente._conexao.executemany(
+        f"insert into metricas_chamados ({', '.join(colunas)}) values ({', '.join('?' * len(colunas))}) "
+        "on conflict (dia, regional, loja, lider, motivo, status) do update set "
+        "quantidade = quantidade + excluded.quantidade, "
+        "soma_duracao_s = soma_duracao_s + excluded.soma_duracao_s, "
+        "qtd_duracao = qtd_duracao + excluded.qtd_duracao",
+        [
+            [l.get(c) or "" for c in metricas.COLUNAS_CHAVE] + [l.get(c) or 0 for c in metricas.COLUNAS_VALOR]
+            for l in p_linhas
+        ],
+    )
+    return None
+
+
+def _reconstruir_metricas(cliente):
+    cliente._conexao.execute("delete from metricas_chamados")
+    return cliente._conexao.execute("""
+        insert into metricas_chamados
+            (dia, regional, loja, lider, motivo, status, quantidade, soma_duracao_s, qtd_duracao)
+        select date(abertura),
+               coalesce(regional, ''), coalesce(loja, ''), coalesce(lider, ''), coalesce(motivo, ''),
+               status,
+               count(*),
+               coalesce(sum((julianday(fechamento) - julianday(abertura)) * 86400), 0),
+               count(fechamento)
+        from (select * from chamados union all select * from chamados_historico)
+        where abertura is not null and status is not null
+        group by 1, 2, 3, 4, 5, 6
+    """).rowcount
+
+
+def _resumir_metricas(cliente, p_inicio=None, p_fim=None):
+    cursor = cliente._conexao.execute("""
+        select regional, lider, motivo, status,
+               sum(quantidade) as quantidade,
+               sum(soma_duracao_s) as soma_duracao_s,
+               sum(qtd_duracao) as qtd_duracao
+        from metricas_chamados
+        where (:inicio is null or dia >= :inicio)
+          and (:fim is null or dia <= :fim)
+        group by regional, lider, motivo, status
+        having sum(quantidade) <> 0
+    """, {"inicio": p_inicio, "fim": p_fim})
+    return [dict(linha) for linha in cursor]
+
+
+def _finalizar_chamados(cliente, p_ids, p_observacao=None, p_fechamento=None):
+    fechamento = datetime.fromisoformat(p_fechamento) if p_fechamento else datetime.now()
+    abertos = cliente._conexao.execute(
+        f"select * from chamados where status = 'Aberto' and id in ({', '.join('?' * len(p_ids))})",
+        [int(i) for i in p_ids],
+    ).fetchall() if p_ids else []
+    finalizados = []
+    incrementos = []
+    for linha in map(dict, abertos):
+        abertura = datetime.fromisoformat(linha["abertura"]).replace(tzinfo=None)
+        linha.update({
+            "status": "Finalizado",
+            "fechamento": fechamento.isoformat(),
+            "duracao": str(fechamento - abertura).split(".")[0],
+            "observacao": p_observacao,
+        })
+        finalizados.append(linha)
+        chave = {c: linha.get(c) or "" for c in metricas.COLUNAS_CHAVE[1:-1]}
+        chave["dia"] = abertura.date().isoformat()
+        incrementos.append(dict(chave, status="Aberto", quantidade=-1))
+        incrementos.append(dict(
+            chave, status="Finalizado", quantidade=1,
+            soma_duracao_s=(fechamento - abertura).total_seconds(), qtd_duracao=1,
+        ))
+    cliente._conexao.executemany(
+        "update chamados set status = ?, fechamento = ?, duracao = ?, observacao = ? where id = ?",
+        [(l["status"], l["fechamento"], l["duracao"], l["observacao"], l["id"]) for l in finalizados],
+    )
+    _somar_metricas(cliente, incrementos)
+    for linha in finalizados:
+        cliente._publicar("chamados", "UPDATE", linha)
+    return [{k: linha[k] for k in ("id", "fechamento", "duracao")} for linha in finalizados]
+
+
+def _cadastrar_chamados(cliente, p_chamados):
+    inseridos = []
+    for chamado in p_chamados:
+        linha = cliente._conexao.execute(
+            "insert into chamados (regional, loja, lider, motivo, abertura, status, chave) "
+            "values (?, ?, ?, ?, ?, ?, ?) on conflict (chave) do nothing returning *",
+            [chamado.get(c) for c in ("regional", "loja", "lider", "motivo", "abertura")]
+            + [chamado.get("status") or "Aberto", chamado.get("chave")],
+        ).fetchone()
+        if linha is not None:
+            inseridos.append(dict(linha))
+    _somar_metricas(cliente, metricas.incrementos_abertura(inseridos))
+    for linha in inseridos:
+        cliente._publicar("chamados", "INSERT", linha)
+    return [{"id": linha["id"], "chave": linha["chave"]} for linha in inseridos]
+
+
+def _arquivar_chamados(cliente, p_dias=90):
+    corte = (datetime.now() - timedelta(days=p_dias)).isoformat()
+    movidos = cliente._conexao.execute(
+        "delete from chamados where status = 'Finalizado' and fechamento < ? and abertura is not null returning *",
+        [corte],
+    ).fetchall()
+    if movidos:
+        colunas = list(movidos[0].keys())
+        cliente._conexao.executemany(
+            f"insert into chamados_historico ({', '.join(colunas)}) values ({', '.join('?' * len(colunas))})",
+            [tuple(linha) for linha in movidos],
+        )
+    for linha in movidos:
+        cliente._publicar("chamados", "DELETE", dict(linha))
+    return len(movidos)
+
+
+def _ultima_alteracao(cliente):
+    return cliente._conexao.execute("select valor from chamados_sequencia").fetchone()[0]
+
+
+FUNCOES = {
+    "arquivar_chamados": _arquivar_chamados,
+    "cadastrar_chamados": _cadastrar_chamados,
+    "finalizar_chamados": _finalizar_chamados,
+    "reconstruir_metricas": _reconstruir_metricas,
+    "resumir_metricas": _resumir_metricas,
+    "ultima_alteracao": _ultima_alteracao,
+}
+
+
+class ClienteSQLite:
+    """Cliente sobre um arquivo SQLite com a mesma interface de consulta do `supabase.Client`."""
+
+    def __init__(self, arquivo="chamados.db", indices=True):
+        self.arquivo = arquivo
+        self.requisicoes = 0
+        self._assinantes = {}
+        self._lock = threading.RLock()
+        self._conexao = sqlite3.connect(arquivo, check_same_thread=False)
+        self._conexao.row_factory = sqlite3.Row
+        self._conexao.execute("pragma journal_mode=wal")
+        self._conexao.executescript(ESQUEMA)
+        # Arquivos criados antes da numeração das alterações
+        for tabela in ("chamados", "chamados_historico"):
+            colunas = {linha["name"] for linha in self._conexao.execute(f"pragma table_info({tabela})")}
+            if "alteracao" not in colunas:
+                self._conexao.execute(f"alter table {tabela} add column alteracao integer")
+        self._conexao.executescript(ALTERACOES)
+        if not indices:
+            for indice in INDICES:
+                self._conexao.execute(f"drop index if exists {indice}")
+        self.otimizar()
+
+    def table(self, nome):
+        return ConsultaSQLite(self, nome)
+
+    def rpc(self, nome, parametros=None):
+        return ChamadaSQLite(self, nome, parametros or {})
+
+    def assinar(self, tabela, callback, ao_mudar_estado=None):
+        """Chama `callback(payload)` a cada INSERT, UPDATE ou DELETE da tabela feito por este cliente.
+
+        Os eventos saem do próprio processo, então o canal não cai e `ao_mudar_estado` nunca é chamado.
+        """
+        self._assinantes.setdefault(tabela, []).append(callback)
+
+    def _publicar(self, tabela, tipo, linha):
+        if not self._assinantes.get(tabela):
+            return
+        registro = copy.deepcopy(linha)
+        payload = {
+            "data": {
+                "type": tipo,
+                "table": tabela,
+                "record": None if tipo == "DELETE" else registro,
+                "old_record": {"id": registro.get("id")},
+            },
+            "ids": [],
+        }
+        for callback in self._assinantes[tabela]:
+            callback(payload)
+
+    def otimizar(self):
+        """Atualiza as estatísticas usadas pelo SQLite para escolher os índices (após cargas grandes)."""
+        with self._lock:
+            self._conexao.execute("analyze")
+
+    def plano(self, consulta):
+        """Plano de execução (EXPLAIN QUERY PLAN) de uma consulta select."""
+        sql, parametros = self._montar_select(consulta)
+        with self._lock:
+            return [linha["detail"] for linha in self._conexao.execute(f"explain query plan {sql}", parametros)]
+
+    def fechar(self):
+        with self._lock:
+            self._conexao.close()
+
+    def _montar_select(self, consulta):
+        sql = f"select {consulta._colunas} from {consulta._tabela}{consulta._onde()}"
+        parametros = list(consulta._parametros)
+        if consulta._ordem:
+            sql += f" order by {', '.join(consulta._ordem)}"
+        if consulta._limite is not None or consulta._deslocamento:
+            # Limite no próprio SQL (não como parâmetro) para o planejador considerar o tamanho
+            limite = -1 if consulta._limite is None else int(consulta._limite)
+            sql += f" limit {limite} offset {int(consulta._deslocamento)}"
+        return sql, parametros
+
+    def _executar(self, consulta):
+        with self._lock, self._conexao:
+            self.requisicoes += 1
+            tabela = consulta._tabela
+
+            if consulta._operacao == "select":
+                sql, parametros = self._montar_select(consulta)
+                linhas = [dict(l) for l in self._conexao.execute(sql, parametros)]
+                total = None
+                if consulta._contar:
+                    total = self._conexao.execute(
+                        f"select count(*) from {tabela}{consulta._onde()}", consulta._parametros
+                    ).fetchone()[0]
+                return RespostaLocal(linhas, total)
+
+            if consulta._operacao in ("insert", "upsert"):
+                inseridas = []
+                for dado in consulta._dados:
+                    colunas = [_nome(c) for c in dado]
+                    sql = f"insert into {tabela} ({', '.join(colunas)}) values ({', '.join('?' * len(colunas))})"
+                    tipo = "INSERT"
+                    if consulta._operacao == "upsert":
+                        atualizar = [c for c in colunas if c not in consulta._conflito]
+                        if consulta._ignorar_duplicados or not atualizar:
+                            sql += f" on conflict ({', '.join(consulta._conflito)}) do nothing"
+                        else:
+                            sql += f" on conflict ({', '.join(consulta._conflito)}) do update set "
+                            sql += ", ".join(f"{c} = excluded.{c}" for c in atualizar)
+                            tipo = "UPSERT"
+                    linha = self._conexao.execute(sql + " returning *", list(dado.values())).fetchone()
+                    if linha is not None:
+                        inseridas.append(dict(linha))
+                        self._publicar(tabela, "INSERT" if tipo == "INSERT" else "UPDATE", inseridas[-1])
+                return RespostaLocal(inseridas)
+
+            if consulta._operacao == "update":
+                colunas = [_nome(c) for c in consulta._dados]
+                afetadas = self._conexao.execute(
+                    f"update {tabela} set {', '.join(f'{c} = ?' for c in colunas)}{consulta._onde()} returning *",
+                    list(consulta._dados.values()) + consulta._parametros,
+                ).fetchall()
+                tipo = "UPDATE"
+            else:
+                afetadas = self._conexao.execute(
+                    f"delete from {tabela}{consulta._onde()} returning *", consulta._parametros
+                ).fetchall()
+                tipo = "DELETE"
+            afetadas = [dict(l) for l in afetadas]
+            for linha in afetadas:
+                self._publicar(tabela, tipo, linha)
+            return RespostaLocal(afetadas)
@@ -0,0 +1,1165 @@
+"""Benchmarks e conferências locais do sistema de chamados.
+
+Roda contra o cliente em memória de `supabase_local`, sem acesso à rede.
+
+Uso: python benchmark.py [nome ...] [--escala 0.1] [--salvar-base] [--base arquivo] [--tolerancia 0.25]
+
+`--escala` multiplica os tamanhos padrão (quantidade de chamados, linhas da
+referência e tamanhos de exportação). Com `--salvar-base`, os resultados são
+gravados como base de comparação; sem ele, os tempos (`*_ms`), picos de
+memória (`*_mb`) e requisições são comparados com a base salva e as regressões
+acima da tolerância fazem o comando terminar com código 1. Sem base para a
+escala pedida, o comando termina com código 2.
+
+benchmark_base.json traz uma base de referência com `--escala 0.1` (a suíte
+inteira leva alguns minutos); os tempos dependem da máquina, então numa
+máquina diferente grave a própria base antes de comparar.
+"""
+import argparse
+import inspect
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from io import BytesIO
+from datetime import date, datetime, timedelta
+import numpy as np
+import pandas as pd
+from streamlit import config as st_config, logger as st_logger
+
+# Fora do `streamlit run`, silencia os avisos de contexto de script ausente
+st_config.set_option("global.showWarningOnDirectExecution", False)
+st_logger.set_log_level("error")
+
+import agregacoes
+import analise
+import chamados
+import dashboard
+import database
+import desempenho
+import database_async
+import exportacao
+import fila_escrita
+import graficos
+import metricas
+import recursos
+from cache_chamados import filtrar_chamados
+import esquema
+from esquema import tipar_chamados
+import referencia
+from referencia import IndiceReferencia
+from banco_sqlite import ClienteSQLite
+from supabase_local import ClienteLocal
+import tempo_real
+
+
+BENCHMARKS = {}
+
+
+def benchmark(funcao):
+    BENCHMARKS[funcao.__name__.removeprefix("bench_")] = funcao
+    return funcao
+
+
+def cronometrar(funcao, repeticoes=5):
+    """Menor tempo (em ms) entre `repeticoes` execuções de `funcao`."""
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return min(tempos)
+
+
+# Dados sintéticos
+REGIONAIS = [f"REGIONAL {i:02d}" for i in range(1, 27)]
+MOTIVOS = [
+    "FALHA NA IMPRESSÃO",
+    "IMPRESSORA QUEIMADA",
+    "ROUTER NÃO FUNCIONA",
+    "NOTEBOOK NÃO LIGA",
+    "COLETOR NA CONECTA NA REDE",
+]
+
+
+def gerar_chamados(quantidade, semente=0, inicio=datetime(2024, 1, 1), dias=365, lojas_por_regional=30):
+    """Gera `quantidade` chamados no formato devolvido pelo Supabase."""
+    rng = np.random.default_rng(semente)
+    regional = rng.integers(0, len(REGIONAIS), quantidade)
+    loja = rng.integers(0, lojas_por_regional, quantidade)
+    motivo = rng.integers(0, len(MOTIVOS), quantidade)
+    abertura = pd.Timestamp(inicio) + pd.to_timedelta(rng.integers(0, dias * 86400, quantidade), unit="s")
+    duracao = pd.to_timedelta(rng.integers(600, 5 * 86400, quantidade), unit="s")
+    finalizado = rng.random(quantidade) < 0.7
+
+    chamados = []
+    for i in range(quantidade):
+        fechamento = abertura[i] + duracao[i] if finalizado[i] else None
+        chamados.append({
+            "id": i + 1,
+            "regional": REGIONAIS[regional[i]],
+            "loja": f"LOJA {regional[i]:02d}{loja[i]:03d}",
+            "lider": f"LIDER {regional[i]:02d}{loja[i]:03d}",
+            "motivo": MOTIVOS[motivo[i]],
+            "abertura": abertura[i].isoformat(),
+            "fechamento": fechamento.isoformat() if fechamento is not None else None,
+            "duracao": str(duracao[i].to_pytimedelta()) if finalizado[i] else None,
+            "status": "Finalizado" if finalizado[i] else "Aberto",
+            "observacao": None,
+        })
+    return chamados
+
+
+def gerar_referencia(linhas, semente=0, inicio=datetime(2025, 9, 1), dias=30, lojas_por_regional=30):
+    """Gera dados no formato do chamado.xlsx já carregado (colunas "4", "8", "1" e "12")."""
+    rng = np.random.default_rng(semente)
+    regional = rng.integers(0, len(REGIONAIS), linhas)
+    loja = rng.integers(0, lojas_por_regional, linhas)
+    return pd.DataFrame({
+        "1": [f" LOJA {r:02d}{l:03d} " for r, l in zip(regional, loja)],
+        "4": pd.Timestamp(inicio) + pd.to_timedelta(rng.integers(0, dias, linhas), unit="D"),
+        "8": [f"{REGIONAIS[r]} " for r in regional],
+        "12": [f"LIDER {r:02d}{l:03d}" for r, l in zip(regional, loja)],
+    })
+
+
+def usar_cliente_local(chamados, latencia=0.0):
+    """Aponta `database` para um cliente em memória com os chamados informados."""
+    cliente = ClienteLocal({"chamados": chamados}, latencia=latencia)
+    database.supabase = cliente
+    database.cache_chamados.clear()
+    database.ler_metricas.clear()
+    database.ultima_alteracao_recente.clear()
+    database.limite_historico.clear()
+    database.ler_historico.clear()
+    database._visoes.limpar()
+    return cliente
+
+
+def usar_cliente_sqlite(chamados, arquivo, indices=True):
+    """Aponta `database` para um banco SQLite (banco_sqlite.py) com os chamados informados."""
+    cliente = ClienteSQLite(arquivo, indices=indices)
+    cliente.table("chamados").insert(chamados).execute()
+    cliente.otimizar()
+    cliente.requisicoes = 0
+    database.supabase = cliente
+    database.cache_chamados.clear()
+    database.ler_metricas.clear()
+    database.ultima_alteracao_recente.clear()
+    database.limite_historico.clear()
+    database.ler_historico.clear()
+    database._visoes.limpar()
+    return cliente
+
+
+# Benchmarks
+@benchmark
+def bench_listagem(quantidade=20_000):
+    """Compara filtros no servidor (com paginação) contra leitura completa + pandas."""
+    cliente = usar_cliente_local(gerar_chamados(quantidade))
+    inicio, fim = date(2024, 3, 1), date(2024, 3, 31)
+    # O recorte de um mês pode vir vazio em escalas pequenas; o de um ano sempre tem linhas
+    conferencias = [
+        {"status": "Aberto", "inicio": inicio, "fim": fim, "regional": REGIONAIS[0]},
+        {"status": "Aberto", "inicio": date(2024, 1, 1), "fim": date(2024, 12, 31), "regional": REGIONAIS[0]},
+    ]
+
+    linhas_conferidas = 0
+    for filtros in conferencias:
+        df_servidor, _ = database.consultar_chamados(colunas="*", **filtros)
+        df_pandas = filtrar_chamados(database.ler_chamados(), **filtros)
+        if df_servidor["id"].tolist() != df_pandas["id"].tolist():
+            raise AssertionError("Filtros no servidor divergem do caminho pandas")
+        linhas_conferidas += len(df_servidor)
+    if not linhas_conferidas:
+        raise AssertionError("Nenhuma linha conferida entre os filtros no servidor e o caminho pandas")
+
+    df_pagina = chamados.listar_chamados("Chamados Abertos", limite=50)
+    if df_pagina["id"].tolist() != filtrar_chamados(database.ler_chamados(), status="Aberto")["id"].head(50).tolist():
+        raise AssertionError("Página de listar_chamados diverge do caminho pandas")
+
+    def pagina():
+        chamados.listar_chamados("Chamados Abertos", limite=50)
+
+    def completo():
+        database.cache_chamados.clear()
+        filtrar_chamados(database.ler_chamados(), status="Aberto").head(50)
+
+    antes = cliente.requisicoes
+    pagina()
+    requisicoes_pagina = cliente.requisicoes - antes
+    antes = cliente.requisicoes
+    completo()
+    requisicoes_completo = cliente.requisicoes - antes
+    return {
+        "linhas_conferidas": linhas_conferidas,
+        "pagina_50_ms": cronometrar(pagina),
+        "pagina_50_requisicoes": requisicoes_pagina,
+        "leitura_completa_ms": cronometrar(completo),
+        "leitura_completa_requisicoes": requisicoes_completo,
+    }
+
+
+@benchmark
+def bench_leitura(quantidade=50_000, novos=500):
+    """ler_chamados: carga completa, atualização incremental após escritas e leitura em cache."""
+    cliente = usar_cliente_local(gerar_chamados(quantidade))
+    cache = database.cache_chamados()
+    # Sem intervalo mínimo, a leitura após as escritas vai direto ao servidor
+    intervalo, cache.intervalo_minimo = cache.intervalo_minimo, 0
+
+    def carga_completa():
+        cache.invalidar(completo=True)
+        database.ler_chamados()
+
+    inicio = time.perf_counter()
+    carga_completa()
+    carga_ms = (time.perf_counter() - inicio) * 1000
+
+    database.cadastrar_chamados_em_lote(
+        [{"regional": REGIONAIS[0], "loja": "LOJA 00000", "lider": "LIDER", "motivo": MOTIVOS[0]}] * novos
+    )
+    antes = cliente.requisicoes
+    inicio = time.perf_counter()
+    df = database.ler_chamados()
+    incremental_ms = (time.perf_counter() - inicio) * 1000
+    requisicoes_incremental = cliente.requisicoes - antes
+    if len(df) != quantidade + novos:
+        raise AssertionError("Atualização incremental perdeu chamados")
+
+    # Edição sem finalizar e remoção feitas por outro processo (direto no cliente)
+    cliente.table("chamados").update({"lider": "OUTRO LIDER"}).eq("id", 1).execute()
+    cliente.table("chamados").delete().eq("id", 2).execute()
+    df = database.ler_chamados()
+    if df.loc[df["id"] == 1, "lider"].iloc[0] != "OUTRO LIDER" or (df["id"] == 2).any():
+        raise AssertionError("Atualização incremental não viu a edição ou a remoção")
+
+    # Sem escritas, as atualizações não criam versões novas
+    database.ler_chamados()
+    versao = cache.versao
+    sem_alteracoes_ms = cronometrar(database.ler_chamados)
+    if cache.versao != versao:
+        raise AssertionError("Atualização sem escritas mudou a versão do cache")
+
+    cache.intervalo_minimo = intervalo
+    return {
+        "linhas": len(df),
+        "carga_completa_ms": round(carga_ms, 2),
+        "incremental_ms": round(incremental_ms, 2),
+        "incremental_requisicoes": requisicoes_incremental,
+        "sem_alteracoes_ms": sem_alteracoes_ms,
+        "cache_ms": cronometrar(database.ler_chamados),
+    }
+
+
+@benchmark
+def bench_tempo_real(quantidade=50_000, novos=500, finalizados=200):
+    """Cache mantido pelos eventos do tempo real contra a atualização por consulta ao servidor."""
+    cliente = usar_cliente_local(gerar_chamados(quantidade))
+    cache = database.cache_chamados()
+    cache.obter()
+    assinatura = tempo_real.AssinaturaChamados(cache)
+    assinatura.conectar(cliente)
+    database.ler_chamados()
+
+    # Escritas de outro processo: chegam só pelos eventos, sem invalidar o cache
+    inicio = time.perf_counter()
+    cliente.table("chamados").insert(
+        [{"regional": REGIONAIS[0], "loja": "LOJA 00000", "lider": "LIDER", "motivo": MOTIVOS[0],
+          "status": "Aberto", "abertura": datetime.now().isoformat()}] * novos
+    ).execute()
+    abertos = cliente.table("chamados").select("id").eq("status", "Aberto").limit(finalizados).execute().data
+    cliente.rpc("finalizar_chamados", {
+        "p_ids": [c["id"] for c in abertos], "p_observacao": None, "p_fechamento": datetime.now().isoformat(),
+    }).execute()
+    assinatura.aguardar()
+    propagacao_ms = (time.perf_counter() - inicio) * 1000
+
+    antes = cliente.requisicoes
+    inicio = time.perf_counter()
+    ao_vivo = database.ler_chamados()
+    leitura_ms = (time.perf_counter() - inicio) * 1000
+    requisicoes_tempo_real = cliente.requisicoes - antes
+
+    # Mesmo estado pelo caminho por consulta: leitura incremental no servidor
+    antes = cliente.requisicoes
+    cache.invalidar()
+    inicio = time.perf_counter()
+    consultado = database.ler_chamados()
+    consulta_ms = (time.perf_counter() - inicio) * 1000
+    requisicoes_consulta = cliente.requisicoes - antes
+    colunas = ["id", "status", "fechamento"]
+    if not ao_vivo[colunas].equals(consultado[colunas]):
+        raise AssertionError("Eventos do tempo real divergiram do servidor")
+
+    # Queda do canal: a consulta periódica volta e, na reconexão, o cache recarrega
+    # as escritas cujos eventos se perderam
+    cliente.interromper_assinatura("chamados")
+    if cache.intervalo_minimo == float("inf"):
+        raise AssertionError("Cache seguiu sem consultar o servidor com o canal fora do ar")
+    perdido = cliente.table("chamados").select("id").eq("status", "Aberto").limit(1).execute().data[0]["id"]
+    cliente.table("chamados").delete().eq("id", perdido).execute()
+    cliente.retomar_assinatura("chamados")
+    assinatura.aguardar()
+    if cache.intervalo_minimo != float("inf") or perdido in set(database.ler_chamados()["id"]):
+        raise AssertionError("Reconexão do tempo real não recuperou as escritas da queda")
+
+    return {
+        "linhas": len(ao_vivo),
+        "eventos": assinatura.eventos,
+        "quedas": assinatura.quedas,
+        "lotes": assinatura.lotes,
+        "propagacao_ms": round(propagacao_ms, 2),
+        "leitura_tempo_real_ms": round(leitura_ms, 2),
+        "leitura_tempo_real_requisicoes": requisicoes_tempo_real,
+        "leitura_consulta_ms": round(consulta_ms, 2),
+        "leitura_consulta_requisicoes": requisicoes_consulta,
+    }
+
+
+@benchmark
+def bench_filtros(quantidade=200_000, reruns=50):
+    """Listagem com o tempo real ativo: recorte refiltrado a cada rerun contra o memoizado por (versão, filtros)."""
+    usar_cliente_local(gerar_chamados(quantidade))
+    filtros = ("Chamados Finalizados", date(2024, 1, 1), date(2024, 12, 31), REGIONAIS[0], None)
+    status = chamados.STATUS_POR_FILTRO[filtros[0]]
+
+    def refiltrar():
+        # Caminho anterior: cópia do cache e filtros pandas em todo rerun da lista
+        return filtrar_chamados(database.ler_chamados(), status, *filtros[1:]).head(50)
+
+    ativo, tempo_real.ATIVO = tempo_real.ATIVO, True
+    try:
+        pagina = chamados.listar_chamados(*filtros, limite=50)
+        if pagina["id"].tolist() != refiltrar()["id"].tolist():
+            raise AssertionError("Recorte memoizado diverge do caminho pandas")
+
+        def memoizado():
+            for _ in range(reruns):
+                chamados.listar_chamados(*filtros, limite=50)
+
+        def sem_memoria():
+            for _ in range(reruns):
+                refiltrar()
+
+        def primeira_vez():
+            database._visoes.limpar()
+            chamados.listar_chamados(*filtros, limite=50)
+
+        return {
+            "linhas": quantidade,
+            "reruns": reruns,
+            "refiltrar_reruns_ms": cronometrar(sem_memoria),
+            "memoizado_reruns_ms": cronometrar(memoizado),
+            "memoizado_primeira_ms": cronometrar(primeira_vez),
+        }
+    finally:
+        tempo_real.ATIVO = ativo
+
+
+@benchmark
+def bench_backends(quantidade=200_000):
+    """Latência das consultas da listagem no cliente em memória, no SQLite sem índices e com índices."""
+    dados = gerar_chamados(quantidade)
+    consultas = {
+        "pagina_abertos": lambda: database.consultar_chamados(status="Aberto", limite=50),
+        "periodo_7_dias": lambda: database.consultar_chamados(inicio=date(2024, 6, 1), fim=date(2024, 6, 7)),
+        "regional_loja": lambda: database.consultar_chamados(regional=REGIONAIS[0], loja="LOJA 00007"),
+        "abertos_no_periodo": lambda: database.consultar_chamados(
+            status="Aberto", inicio=date(2024, 6, 1), fim=date(2024, 6, 30), limite=50
+        ),
+        "alterados_desde": lambda: database._buscar_chamados_alterados(quantidade - 1000)[0],
+    }
+    resultado = {"linhas": quantidade}
+    referencia = {}
+    with tempfile.TemporaryDirectory() as pasta:
+        backends = {
+            "memoria": lambda: usar_cliente_local(dados),
+            "sqlite_sem_indices": lambda: usar_cliente_sqlite(dados, os.path.join(pasta, "sem.db"), indices=False),
+            "sqlite": lambda: usar_cliente_sqlite(dados, os.path.join(pasta, "com.db")),
+        }
+        for backend, criar in backends.items():
+            cliente = criar()
+            for nome, consulta in consultas.items():
+                retorno = consulta()
+                linhas = retorno[0] if isinstance(retorno, tuple) else pd.DataFrame(retorno)
+                ids = sorted(linhas["id"].tolist()) if not linhas.empty else []
+                if referencia.setdefault(nome, ids) != ids:
+                    raise AssertionError(f"{backend} diverge em {nome}")
+                resultado[f"{backend}_{nome}_ms"] = cronometrar(consulta, repeticoes=3)
+            if isinstance(cliente, ClienteSQLite):
+                cliente.fechar()
+    return resultado
+
+
+@benchmark
+def bench_arquivo(quantidade=200_000, dias=90):
+    """Leituras e consultas da listagem antes e depois de arquivar os finalizados antigos (SQLite)."""
+    hoje = date.today()
+    dados = gerar_chamados(quantidade, inicio=datetime.combine(hoje - timedelta(days=730), datetime.min.time()), dias=730)
+    recente = (hoje - timedelta(days=30), hoje)
+    antigo = (hoje - timedelta(days=400), hoje - timedelta(days=370))
+    consultas = {
+        "carga_completa": lambda: (database.cache_chamados().invalidar(completo=True), database.ler_chamados())[1],
+        "pagina_abertos": lambda: database.consultar_chamados(status="Aberto", limite=50)[0],
+        "finalizados_30_dias": lambda: database.consultar_chamados("Finalizado", *recente)[0],
+        "finalizados_ha_1_ano": lambda: database.consultar_chamados("Finalizado", *antigo)[0],
+        "exportacao_completa": lambda: database.consultar_chamados(colunas="*")[0],
+    }
+    resultado = {"linhas": quantidade}
+    with tempfile.TemporaryDirectory() as pasta:
+        cliente = usar_cliente_sqlite(dados, os.path.join(pasta, "arquivo.db"))
+        referencia = {}
+        for nome, consulta in consultas.items():
+            referencia[nome] = consulta()["id"].tolist()
+            resultado[f"antes_{nome}_ms"] = cronometrar(consulta, repeticoes=3)
+
+        inicio = time.perf_counter()
+        resultado["arquivados"] = database.arquivar_chamados(dias)
+        resultado["arquivamento_ms"] = round((time.perf_counter() - inicio) * 1000, 2)
+        cliente.otimizar()
+        resultado["linhas_na_tabela"] = len(database.ler_chamados())
+
+        for nome, consulta in consultas.items():
+            ids = consulta()["id"].tolist()
+            # A carga do cache passa a trazer só a tabela principal; o resto tem de bater
+            if nome != "carga_completa" and ids != referencia[nome]:
+                raise AssertionError(f"{nome} diverge depois do arquivamento")
+            resultado[f"depois_{nome}_ms"] = cronometrar(consulta, repeticoes=3)
+        for nome, periodo in (("30_dias", recente), ("ha_1_ano", antigo)):
+            antes = cliente.requisicoes
+            database.consultar_chamados("Finalizado", *periodo)
+            resultado[f"finalizados_{nome}_requisicoes"] = cliente.requisicoes - antes
+
+        # Reruns do dashboard com o histórico: a junção com os arquivados sai da memória
+        com_historico, _ = database.ler_chamados_versao(historico=True)
+        if len(com_historico) != quantidade:
+            raise AssertionError("Chamados com o histórico não somam os gerados")
+        resultado["rerun_com_historico_ms"] = cronometrar(lambda: database.ler_chamados_versao(historico=True))
+        cliente.fechar()
+    return resultado
+
+
+def tipar_objetos(df):
+    """Tipagem anterior dos chamados: só id e datas; textos continuam objetos Python."""
+    df["id"] = pd.to_numeric(df["id"], errors="coerce").astype("Int64")
+    for col in esquema.COLUNAS_DATA:
+        df[col] = pd.to_datetime(df[col], errors="coerce", format="ISO8601")
+    return df
+
+
+@benchmark
+def bench_esquema(quantidade=200_000):
+    """Memória por 100 mil chamados e tempo de carga/filtro: JSON cru, tipagem anterior e esquema.py."""
+    linhas = gerar_chamados(quantidade)
+    escala = 100_000 / quantidade
+    carregadores = {
+        "json": lambda: pd.DataFrame(linhas),
+        "anterior": lambda: tipar_objetos(pd.DataFrame(linhas)),
+        "compacto": lambda: esquema.carregar_chamados(linhas),
+    }
+    resultado = {"linhas": quantidade}
+    quadros = {}
+    for nome, carregar in carregadores.items():
+        quadros[nome] = carregar()
+        resultado[f"{nome}_mb_por_100k"] = round(esquema.memoria_mb(quadros[nome]) * escala, 2)
+        resultado[f"{nome}_carga_ms"] = cronometrar(carregar, repeticoes=3)
+
+    filtros = {"status": "Finalizado", "inicio": date(2024, 3, 1), "fim": date(2024, 8, 31), "regional": REGIONAIS[0]}
+    anterior = filtrar_chamados(quadros["anterior"], **filtros)
+    compacto = filtrar_chamados(quadros["compacto"], **filtros)
+    if anterior["id"].tolist() != compacto["id"].tolist():
+        raise AssertionError("Filtro diverge entre os esquemas")
+    exportado = exportacao.preparar_exportacao(compacto)
+    if exportado["duracao"].tolist() != anterior["duracao"].tolist():
+        raise AssertionError("Duração exportada diverge do texto gravado no banco")
+    for nome in ("anterior", "compacto"):
+        resultado[f"{nome}_filtro_ms"] = cronometrar(lambda: filtrar_chamados(quadros[nome], **filtros))
+        resultado[f"{nome}_exportacao_csv_ms"] = cronometrar(
+            lambda: exportacao.gerar_csv(quadros[nome].head(50_000)), repeticoes=3
+        )
+    return resultado
+
+
+def cascata_mascaras(dados, inicio, fim):
+    """Cascata Regional → Loja → Líder como era feita antes, com máscaras sobre o DataFrame inteiro."""
+    mask = dados["4"].dt.date.between(inicio, fim)
+    regionais = dados[mask]["8"].str.strip().unique().tolist()
+    regional = min(regionais)
+    mask = (dados["8"].str.strip() == regional) & (dados["4"].dt.date.between(inicio, fim))
+    lojas = dados[mask]["1"].str.strip().unique().tolist()
+    loja = min(lojas)
+    mask = (dados["8"].str.strip() == regional) & (dados["1"].str.strip() == loja) & (dados["4"].dt.date.between(inicio, fim))
+    return regionais, lojas, dados[mask]["12"].iloc[0]
+
+
+def cascata_indice(indice, inicio, fim):
+    regionais = indice.regionais(inicio, fim)
+    lojas = indice.lojas(min(regionais), inicio, fim)
+    return regionais, lojas, indice.lider(min(regionais), min(lojas), inicio, fim)
+
+
+@benchmark
+def bench_cascata(linhas=50_000):
+    """Cascata Regional → Loja → Líder: máscaras pandas contra o índice pré-computado."""
+    dados = gerar_referencia(linhas)
+    inicio, fim = date(2025, 9, 10), date(2025, 9, 12)
+    indice = IndiceReferencia(dados)
+
+    esperado = cascata_mascaras(dados, inicio, fim)
+    obtido = cascata_indice(indice, inicio, fim)
+    if set(esperado[0]) != set(obtido[0]) or set(esperado[1]) != set(obtido[1]) or esperado[2] != obtido[2]:
+        raise AssertionError("Índice de referência diverge das máscaras")
+
+    return {
+        "linhas": linhas,
+        "construcao_indice_ms": cronometrar(lambda: IndiceReferencia(dados), repeticoes=3),
+        "mascaras_ms": cronometrar(lambda: cascata_mascaras(dados, inicio, fim)),
+        "indice_ms": cronometrar(lambda: cascata_indice(indice, inicio, fim)),
+    }
+
+
+@benchmark
+def bench_referencia(caminho="chamado.xlsx"):
+    """Carga dos dados de referência: parse do xlsx contra o snapshot Feather."""
+    with tempfile.TemporaryDirectory() as pasta:
+        referencia.carregar_referencia(caminho, pasta)
+        tempo_xlsx = referencia.ultimo_carregamento["segundos"] * 1000
+        dados_xlsx = referencia.ler_planilha(caminho)
+        dados_snapshot = referencia.carregar_referencia(caminho, pasta)
+        if referencia.ultimo_carregamento["origem"] != "snapshot":
+            raise AssertionError("Snapshot não foi reaproveitado")
+        pd.testing.assert_frame_equal(dados_xlsx[dados_snapshot.columns], dados_snapshot)
+        return {
+            "linhas": len(dados_snapshot),
+            "xlsx_ms": tempo_xlsx,
+            "snapshot_ms": cronometrar(lambda: referencia.carregar_referencia(caminho, pasta)),
+        }
+
+
+@benchmark
+def bench_importacao(linhas=10_000, tamanho_lote=database.TAMANHO_LOTE, latencia=0.02):
+    """Vazão da importação em lote (com validação) contra inserções de uma linha por vez.
+
+    Cada requisição ao cliente local custa `latencia` segundos, simulando a rede.
+    """
+    indice = IndiceReferencia(gerar_referencia(20_000))
+    chamados = [
+        {campo: c[campo] for campo in ("regional", "loja", "lider", "motivo")}
+        for c in gerar_chamados(linhas)
+    ]
+    chamados[0]["loja"] = "LOJA INEXISTENTE"
+
+    cliente = usar_cliente_local([], latencia=latencia)
+    inicio = time.perf_counter()
+    inseridos, falhas = database.cadastrar_chamados_em_lote(chamados, indice=indice, tamanho_lote=tamanho_lote)
+    tempo_lote = time.perf_counter() - inicio
+    if falhas[0][0] != 0 or inseridos + len(falhas) != linhas:
+        raise AssertionError("Falha da linha inválida não reportada")
+    if sum(linha["quantidade"] for linha in cliente.tabelas["metricas_chamados"]) != inseridos:
+        raise AssertionError("Métricas da importação divergem dos chamados inseridos")
+    requisicoes_lote = cliente.requisicoes
+
+    # Uma linha por requisição: mede 100 inserções e extrapola
+    cliente = usar_cliente_local([], latencia=latencia)
+    inicio = time.perf_counter()
+    for chamado in chamados[:100]:
+        cliente.table("chamados").insert(chamado).execute()
+    tempo_unitario = (time.perf_counter() - inicio) * linhas / 100
+    return {
+        "linhas": linhas,
+        "falhas": len(falhas),
+        "lote_linhas_por_s": linhas / tempo_lote,
+        "lote_requisicoes": requisicoes_lote,
+        "unitario_linhas_por_s": linhas / tempo_unitario,
+        "unitario_requisicoes": linhas,
+    }
+
+
+@benchmark
+def bench_fila(quantidade=200, latencia=0.05, falhas=3):
+    """Cadastro pela fila de escrita contra a escrita síncrona, com rede lenta e instável.
+
+    Cada cadastro é enfileirado duas vezes com a mesma chave (clique duplo) e as
+    primeiras `falhas` requisições falham; no fim deve haver um chamado por chave.
+    """
+    chamados = [
+        {campo: c[campo] for campo in ("regional", "loja", "lider", "motivo", "abertura", "status")}
+        for c in gerar_chamados(quantidade)
+    ]
+
+    # Escrita síncrona: a tela espera cada requisição (mede 20 e extrapola)
+    usar_cliente_local([], latencia=latencia)
+    inicio = time.perf_counter()
+    for chamado in chamados[:20]:
+        database.cadastrar_chamado(chamado["regional"], chamado["loja"], chamado["lider"], chamado["motivo"])
+    sincrono_ms = (time.perf_counter() - inicio) * 1000 / 20
+
+    cliente = usar_cliente_local([], latencia=latencia)
+    cliente.falhas_simuladas = falhas
+    enviar = {"cadastrar": database.enviar_chamados, "finalizar": database.enviar_finalizacoes}
+    with tempfile.TemporaryDirectory() as pasta:
+        arquivo = os.path.join(pasta, "fila.db")
+        # Metade fica numa fila sem thread, como num processo que caiu antes de enviar
+        parada = fila_escrita.FilaEscrita(arquivo, enviar, iniciar=False)
+        for posicao, chamado in enumerate(chamados[: quantidade // 2]):
+            parada.enfileirar("cadastrar", dict(chamado, chave=f"c{posicao}"), f"c{posicao}")
+        parada._conexao.close()
+
+        fila = fila_escrita.FilaEscrita(arquivo, enviar)
+        inicio = time.perf_counter()
+        for posicao, chamado in enumerate(chamados):
+            for _ in range(2):
+                fila.enfileirar("cadastrar", dict(chamado, chave=f"c{posicao}"), f"c{posicao}")
+        enfileirar_ms = (time.perf_counter() - inicio) * 1000 / (2 * quantidade)
+        if not fila.aguardar(timeout=60):
+            raise AssertionError("A fila não esvaziou")
+        envio_s = time.perf_counter() - inicio
+        estatisticas = fila.estatisticas()
+        requisicoes = cliente.requisicoes
+
+        # Finalização que ficou na fila: chega depois de outra mais recente, com
+        # o fechamento da hora do clique, e ainda assim precisa aparecer no cache
+        cliente.latencia = 0
+        ids = [c["id"] for c in cliente.tabelas["chamados"][:2]]
+        database.ler_chamados()
+        database.enviar_finalizacoes([{"ids": [ids[0]], "fechamento": datetime.now().isoformat()}])
+        database.ler_chamados()
+        atrasada = (datetime.now() - timedelta(hours=1)).isoformat()
+        fila.enfileirar("finalizar", {"ids": [ids[1]], "observacao": None, "fechamento": atrasada}, "f-atrasada")
+        if not fila.aguardar(timeout=60):
+            raise AssertionError("A fila não esvaziou")
+        status = database.ler_chamados().set_index("id")["status"]
+        if status[ids[1]] != "Finalizado":
+            raise AssertionError("Finalização atrasada da fila não chegou ao cache")
+        fila._conexao.close()
+
+        # Lote recusado por uma operação: reenviadas uma a uma, só a recusada conta a tentativa, uma vez
+        def recusar(lote):
+            if any(dados.get("recusar") for dados in lote):
+                raise ValueError("recusado")
+
+        recusas = fila_escrita.FilaEscrita(os.path.join(pasta, "recusas.db"), {"cadastrar": recusar}, iniciar=False)
+        recusas.enfileirar("cadastrar", {}, "aceita")
+        recusas.enfileirar("cadastrar", {"recusar": True}, "recusada")
+        recusas.enviar_pendentes()
+        tentativas = recusas._conexao.execute("select chave, tentativas from operacoes").fetchall()
+        if tentativas != [("recusada", 1)]:
+            raise AssertionError(f"Tentativas contadas errado no lote recusado: {tentativas}")
+        recusas._conexao.close()
+
+    gravados = cliente.tabelas["chamados"]
+    if len(gravados) != quantidade or len({c["chave"] for c in gravados}) != quantidade:
+        raise AssertionError("A fila duplicou ou perdeu chamados")
+    return {
+        "chamados": len(gravados),
+        "sincrono_ms_por_cadastro": round(sincrono_ms, 2),
+        "fila_ms_por_cadastro": round(enfileirar_ms, 3),
+        "envio_total_s": round(envio_s, 2),
+        "requisicoes": requisicoes,
+        "falhas_de_envio": estatisticas["falhas"],
+        "latencia_p50_ms": estatisticas["latencia_p50_ms"],
+        "latencia_p95_ms": estatisticas["latencia_p95_ms"],
+    }
+
+
+def _medir_memoria_processo(funcao, conexao):
+    import resource
+
+    base = rss_atual()
+    inicio = time.perf_counter()
+    funcao()
+    tempo = (time.perf_counter() - inicio) * 1000
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    conexao.send((tempo, max(pico - base, 0) / 2**20))
+    conexao.close()
+
+
+def rss_atual():
+    """RSS atual do processo em bytes (Linux)."""
+    with open("/proc/self/statm") as arquivo:
+        return int(arquivo.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def medir_memoria(funcao):
+    """Tempo (ms) e pico de memória (MB) de uma execução de `funcao`.
+
+    No Linux roda em um processo filho (fork) e mede o pico de RSS acima do
+    início; nos demais sistemas usa tracemalloc, que deixa o código bem mais lento.
+    """
+    if hasattr(os, "fork") and os.path.exists("/proc/self/statm"):
+        recebe, envia = multiprocessing.Pipe(duplex=False)
+        processo = multiprocessing.get_context("fork").Process(target=_medir_memoria_processo, args=(funcao, envia))
+        processo.start()
+        resultado = recebe.recv()
+        processo.join()
+        return resultado
+
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    funcao()
+    tempo = (time.perf_counter() - inicio) * 1000
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return tempo, pico / 2**20
+
+
+def excel_pandas(df):
+    """Exportação anterior: DataFrame inteiro via pandas.ExcelWriter."""
+    output = BytesIO()
+    with pd.ExcelWriter(output, engine="xlsxwriter") as writer:
+        df.to_excel(writer, index=False, sheet_name="chamados")
+    return output.getvalue()
+
+
+@benchmark
+def bench_exportacao(tamanhos=(10_000, 100_000, 1_000_000)):
+    """Tempo e pico de memória das exportações, além do DataFrame de entrada."""
+    resultado = {}
+    for linhas in tamanhos:
+        df = pd.DataFrame(gerar_chamados(linhas))
+        geradores = {"excel_pandas": excel_pandas}
+        geradores.update({f"{nome.lower()}": gerador for nome, (gerador, _, _) in exportacao.FORMATOS.items()})
+        for nome, gerador in geradores.items():
+            tempo, pico = medir_memoria(lambda: gerador(df))
+            resultado[f"{nome}_{linhas}_ms"] = tempo
+            resultado[f"{nome}_{linhas}_pico_mb"] = pico
+    return resultado
+
+
+def como_objetos(df):
+    """Colunas categóricas de volta a texto, como os caminhos pandas de comparação recebiam antes."""
+    return df.astype({col: object for col in esquema.COLUNAS_CATEGORIA if col in df.columns})
+
+
+def agregados_pandas(df, filtros):
+    """Agregações do dashboard como eram feitas antes: filtro, value_counts e groupby por gráfico."""
+    df_filtrado = df.copy()
+    for col, valores in filtros:
+        df_filtrado = df_filtrado[df_filtrado[col].isin(valores)]
+    contagens = {col: df_filtrado[col].value_counts() for col in ("status", "lider", "motivo", "regional")}
+    finalizados = df_filtrado[df_filtrado["fechamento"].notna()].copy()
+    finalizados["abertura"] = pd.to_datetime(finalizados["abertura"])
+    finalizados["fechamento"] = pd.to_datetime(finalizados["fechamento"])
+    finalizados["tempo_minutos"] = (finalizados["fechamento"] - finalizados["abertura"]).dt.total_seconds() / 60
+    return contagens, finalizados.groupby("motivo")["tempo_minutos"].mean().sort_values(ascending=False)
+
+
+@benchmark
+def bench_dashboard(quantidade=200_000):
+    """Agregações do dashboard_admin: caminho pandas por gráfico contra o motor de agregação."""
+    usar_cliente_local(gerar_chamados(quantidade))
+    df = database.ler_chamados()
+    versao = database.cache_chamados().versao
+    filtros = (("regional", tuple(REGIONAIS[:5])), ("status", ("Finalizado",)))
+
+    df_objetos = como_objetos(df)
+    contagens, tempo_medio = agregados_pandas(df_objetos, filtros)
+    agregados = agregacoes.calcular_agregados(agregacoes.preparar_dados(df, versao), filtros)
+    for col, esperado in contagens.items():
+        pd.testing.assert_series_equal(
+            esperado.sort_index(), agregados["contagens"][col].sort_index(), check_names=False, check_index_type=False
+        )
+    pd.testing.assert_series_equal(
+        tempo_medio.sort_index(), agregados["tempo_medio_motivo"].sort_index(), check_names=False, check_index_type=False
+    )
+
+    def motor_frio():
+        agregacoes._preparados.limpar()
+        agregacoes._agregados.limpar()
+        agregacoes.calcular_agregados(agregacoes.preparar_dados(df, versao), filtros)
+
+    return {
+        "linhas": quantidade,
+        "pandas_ms": cronometrar(lambda: agregados_pandas(df_objetos, filtros)),
+        "motor_preparacao_e_agregacao_ms": cronometrar(motor_frio),
+        "motor_nova_combinacao_ms": cronometrar(
+            lambda: (agregacoes._agregados.limpar(), agregacoes.calcular_agregados(agregacoes.preparar_dados(df, versao), filtros))
+        ),
+        "motor_memoizado_ms": cronometrar(
+            lambda: agregacoes.calcular_agregados(agregacoes.preparar_dados(df, versao), filtros)
+        ),
+    }
+
+
+def analise_pandas(df, filtros, col, sla_horas, agora):
+    """Percentis, violações do SLA e idade dos abertos com filtro, groupby e quantile do pandas."""
+    df = agregacoes.filtrar_chamados_por(df, filtros)
+    horas = (df["fechamento"] - df["abertura"]).dt.total_seconds() / 3600
+    percentis = horas.groupby(df["motivo"]).quantile([0.5, 0.9, 0.99]).unstack()
+    idade_h = (pd.Timestamp(agora, unit="s") - df["abertura"]).dt.total_seconds() / 3600
+    aberto = df["status"] == "Aberto"
+    violado = (horas > sla_horas) | (aberto & (idade_h > sla_horas))
+    violacoes = violado.groupby(df[col]).sum()
+    limites = [-np.inf] + [limite for limite, _ in analise.FAIXAS_IDADE]
+    idade = pd.cut(idade_h[aberto], limites, right=False, labels=[rotulo for _, rotulo in analise.FAIXAS_IDADE])
+    return percentis, violacoes, idade.value_counts(sort=False)
+
+
+@benchmark
+def bench_analise(quantidade=1_000_000):
+    """Percentis, SLA e idade dos abertos: pandas (groupby/quantile) contra analise.py."""
+    df = tipar_chamados(pd.DataFrame(gerar_chamados(quantidade)))
+    filtros = (("regional", tuple(REGIONAIS[:5])),)
+    agora = analise.agora_s()
+
+    def motor(versao, filtros=filtros):
+        preparada = analise.preparar_analise(df, versao)
+        mask = preparada.mascara(filtros)
+        return (
+            preparada.percentis("motivo", mask),
+            preparada.violacoes("regional", mask, analise.SLA_HORAS, agora),
+            preparada.idade_abertos(mask, agora),
+        )
+
+    df_objetos = como_objetos(df)
+    percentis, violacoes, idade = analise_pandas(df_objetos, filtros, "regional", analise.SLA_HORAS, agora)
+    resultado = motor(0)
+    esperado = percentis.loc[resultado[0].index[1:]].to_numpy()
+    if not np.allclose(esperado, resultado[0].iloc[1:, 1:].to_numpy()):
+        raise AssertionError("Percentis divergem do pandas")
+    if violacoes[violacoes.index.isin(resultado[1].index)].sort_index().tolist() != resultado[1]["violacoes"].sort_index().tolist():
+        raise AssertionError("Violações do SLA divergem do pandas")
+    if idade.tolist() != resultado[2].tolist():
+        raise AssertionError("Idade dos abertos diverge do pandas")
+
+    # Cada versão nova dos chamados refaz a preparação; na mesma versão, só as contas do filtro
+    versoes = iter(range(1, 1_000_000))
+    return {
+        "linhas": quantidade,
+        "pandas_ms": cronometrar(lambda: analise_pandas(df_objetos, filtros, "regional", analise.SLA_HORAS, agora), repeticoes=3),
+        "preparacao_e_consulta_ms": cronometrar(lambda: motor(next(versoes)), repeticoes=3),
+        "consulta_ms": cronometrar(lambda: motor(0), repeticoes=3),
+        "pandas_sem_filtro_ms": cronometrar(lambda: analise_pandas(df_objetos, (), "regional", analise.SLA_HORAS, agora), repeticoes=3),
+        "consulta_sem_filtro_ms": cronometrar(lambda: motor(0, ()), repeticoes=3),
+    }
+
+
+def tabela_metricas(cliente):
+    """Tabela metricas_chamados do cliente local, ordenada pela chave."""
+    df = pd.DataFrame(cliente.tabelas.get("metricas_chamados", []))
+    df = df[df["quantidade"] != 0]
+    return df.sort_values(metricas.COLUNAS_CHAVE).reset_index(drop=True)[metricas.COLUNAS_CHAVE + metricas.COLUNAS_VALOR]
+
+
+@benchmark
+def bench_metricas(quantidade=200_000, novos=200):
+    """Dashboard a partir do resumo das métricas contra agregar todos os chamados.
+
+    Confere que as métricas mantidas nas escritas (cadastro em lote e finalização)
+    ficam iguais às reconstruídas do zero e que o dashboard mostra os mesmos números.
+    """
+    cliente = usar_cliente_local(gerar_chamados(quantidade))
+    linhas_metricas = database.reconstruir_metricas()
+
+    # Escritas incrementais: cadastro em lote e finalização de metade dos novos
+    database.cadastrar_chamados_em_lote(
+        [{"regional": REGIONAIS[i % 3], "loja": f"LOJA {i:05d}", "lider": "LIDER", "motivo": MOTIVOS[i % 2]}
+         for i in range(novos)]
+    )
+    database.finalizar_chamados(list(range(quantidade + 1, quantidade + novos // 2 + 1)))
+    incrementais = tabela_metricas(cliente)
+    database.reconstruir_metricas()
+    reconstruidas = tabela_metricas(cliente)
+    pd.testing.assert_frame_equal(incrementais, reconstruidas, check_dtype=False)
+
+    df = database.ler_chamados()
+    resumo, versao = database.ler_metricas()
+    filtros = (("regional", tuple(REGIONAIS[:5])),)
+    bruto = agregacoes.calcular_agregados(agregacoes.preparar_dados(df, "bruto"), filtros)
+    agregado = agregacoes.calcular_agregados(agregacoes.preparar_dados(resumo, versao), filtros)
+    if bruto["total"] != agregado["total"]:
+        raise AssertionError("Total das métricas diverge dos chamados")
+    for col, esperado in bruto["contagens"].items():
+        pd.testing.assert_series_equal(
+            esperado.sort_index(), agregado["contagens"][col].sort_index(), check_names=False, check_index_type=False
+        )
+    pd.testing.assert_series_equal(
+        bruto["tempo_medio_motivo"].sort_index(), agregado["tempo_medio_motivo"].sort_index(),
+        check_names=False, check_index_type=False,
+    )
+
+    def frio(dados, chave):
+        agregacoes._preparados.limpar()
+        agregacoes._agregados.limpar()
+        agregacoes.calcular_agregados(agregacoes.preparar_dados(dados, chave), filtros)
+
+    return {
+        "chamados": len(df),
+        "linhas_metricas": linhas_metricas,
+        "linhas_resumo": len(resumo),
+        "chamados_agregacao_fria_ms": cronometrar(lambda: frio(df, "bruto")),
+        "resumo_agregacao_fria_ms": cronometrar(lambda: frio(resumo, versao)),
+    }
+
+
+@benchmark
+def bench_graficos(reruns=1000, reruns_sem_cache=100):
+    """Renderização dos gráficos do dashboard por rerun: st.pyplot sem fechar figuras contra PNG memoizado.
+
+    O caminho antigo roda `reruns_sem_cache` vezes (cada rerun gera 5 figuras) e o
+    crescimento de RSS é informado por rerun para comparar com o novo.
+    """
+    import matplotlib.pyplot as plt
+
+    usar_cliente_local(gerar_chamados(20_000))
+    df = database.ler_chamados()
+    agregados = agregacoes.calcular_agregados(agregacoes.preparar_dados(df, database.cache_chamados().versao), ())
+    contagens = agregados["contagens"]
+    graficos_rerun = [
+        (dashboard.plotar_pizza, contagens["status"], {}),
+        (dashboard.plotar_barra, contagens["lider"], {"titulo": "Principais Líderes", "figsize": (8, 6)}),
+        (dashboard.plotar_barra, contagens["motivo"], {"titulo": "Principais Motivos", "figsize": (8, 6)}),
+        (dashboard.plotar_barra, contagens["regional"], {"titulo": "Chamados por Regional", "figsize": (8, 6)}),
+        (dashboard.plotar_tempo_medio, agregados["tempo_medio_motivo"], {}),
+    ]
+
+    def rerun_antigo():
+        for plotar, serie, kwargs in graficos_rerun:
+            plotar(serie, **kwargs).savefig(BytesIO(), dpi=graficos.DPI)
+
+    def rerun_novo():
+        for plotar, serie, kwargs in graficos_rerun:
+            graficos.renderizar_png(plotar, serie, **kwargs)
+
+    resultado = {}
+    for nome, rerun, vezes in (("antigo", rerun_antigo, reruns_sem_cache), ("memoizado", rerun_novo, reruns)):
+        rss_inicial = rss_atual()
+        inicio = time.perf_counter()
+        for _ in range(vezes):
+            rerun()
+        resultado[f"{nome}_reruns"] = vezes
+        resultado[f"{nome}_ms_por_rerun"] = (time.perf_counter() - inicio) * 1000 / vezes
+        resultado[f"{nome}_rss_mb_por_rerun"] = (rss_atual() - rss_inicial) / 2**20 / vezes
+        resultado[f"{nome}_figuras_abertas"] = len(plt.get_fignums())
+        plt.close("all")
+    return resultado
+
+
+@benchmark
+def bench_paralelo(quantidade=20_000, latencia=0.05):
+    """Página da lista + catálogo de motivos: em sequência contra a página buscada em segundo plano (`sistema_chamados`)."""
+    cliente = usar_cliente_local(gerar_chamados(quantidade), latencia=latencia)
+    cliente.tabelas["motivos"] = [{"id": i + 1, "motivo": m} for i, m in enumerate(MOTIVOS)]
+    database_async.definir_cliente(cliente)
+
+    def sequencial():
+        database.listar_motivos.clear()
+        database.listar_motivos()
+        return database.consultar_chamados(status="Aberto", limite=50)[0]
+
+    def paralelo():
+        # Como em `sistema_chamados`: a página sai antes do formulário, que lê o catálogo
+        futura = database_async.agendar(database_async.consultar_chamados_async(status="Aberto", limite=50))
+        database.listar_motivos.clear()
+        database.listar_motivos()
+        return futura.result()[0]
+
+    if paralelo()["id"].tolist() != sequencial()["id"].tolist():
+        raise AssertionError("Consultas assíncronas divergem das síncronas")
+    return {
+        "latencia_ms": latencia * 1000,
+        "sequencial_ms": cronometrar(sequencial),
+        "paralelo_ms": cronometrar(paralelo),
+    }
+
+
+@benchmark
+def bench_partida(quantidade=50_000, sessoes=200, latencia=0.01):
+    """Partida a frio dos recursos do processo contra o custo de cada nova sessão.
+
+    O caminho antigo conferia os dois usuários padrão a cada sessão (duas consultas).
+    """
+    import streamlit as st
+
+    cliente = usar_cliente_local(gerar_chamados(quantidade), latencia=latencia)
+    cliente.tabelas["usuarios"] = []
+    st.cache_resource.clear()
+    recursos.tempos_carga.clear()
+
+    inicio = time.perf_counter()
+    recursos.aquecer()
+    partida_ms = (time.perf_counter() - inicio) * 1000
+    carga = dict(recursos.relatorio()["carga_ms"])
+
+    antes = cliente.requisicoes
+    inicio = time.perf_counter()
+    for _ in range(sessoes):
+        recursos.aquecer()
+    sessao_ms = (time.perf_counter() - inicio) * 1000 / sessoes
+    requisicoes_sessao = (cliente.requisicoes - antes) / sessoes
+
+    def sessao_antiga():
+        database.cadastrar_usuario_se_nao_existir("admin", "admin123", papel="admin")
+        database.cadastrar_usuario_se_nao_existir("user", "user", papel="usuario")
+
+    antes = cliente.requisicoes
+    sessao_antiga_ms = cronometrar(sessao_antiga)
+    return {
+        "partida_a_frio_ms": round(partida_ms, 1),
+        **{f"carga_{nome}_ms": tempo for nome, tempo in carga.items()},
+        "sessao_ms": round(sessao_ms, 4),
+        "sessao_requisicoes": requisicoes_sessao,
+        "sessao_antiga_ms": sessao_antiga_ms,
+        "sessao_antiga_requisicoes": (cliente.requisicoes - antes) / 5,
+    }
+
+
+@benchmark
+def bench_desempenho(quantidade=20_000, chamadas=200_000):
+    """Custo das medições de `desempenho.medir` em relação a um rerun típico."""
+    usar_cliente_local(gerar_chamados(quantidade))
+    indice = IndiceReferencia(gerar_referencia(50_000))
+    inicio, fim = date(2025, 9, 10), date(2025, 9, 12)
+
+    def vazia():
+        return None
+
+    medida = desempenho.medir("bench.vazia")(vazia)
+
+    def repetir(funcao):
+        for _ in range(chamadas):
+            funcao()
+
+    custo_chamada_us = (cronometrar(lambda: repetir(medida), 3) - cronometrar(lambda: repetir(vazia), 3)) * 1000 / chamadas
+
+    # Funções medidas que devolvem DataFrames do tamanho real (o recorte memoizado da lista)
+    filtros = ("Aberto", None, None, REGIONAIS[0], None)
+    filtrados = database.ler_chamados_filtrados
+    cache = database.cache_chamados()
+    # Sem a atualização periódica do cache no meio das repetições
+    intervalo, cache.intervalo_minimo = cache.intervalo_minimo, float("inf")
+    filtrados(*filtros)
+
+    def repetir_filtrados(funcao):
+        for _ in range(chamadas // 20):
+            funcao(*filtros)
+
+    # Diferença na casa do ruído pode sair negativa
+    custo_dataframe_us = max(0.0, (
+        cronometrar(lambda: repetir_filtrados(filtrados), 5)
+        - cronometrar(lambda: repetir_filtrados(filtrados.__wrapped__), 5)
+    ) * 1000 / (chamadas // 20))
+    cache.intervalo_minimo = intervalo
+    custo_medio_us = max(custo_chamada_us, custo_dataframe_us)
+
+    def rerun():
+        # Caminho de um rerun do admin: página da lista, cascata, agregações e exportação
+        database.consultar_chamados(status="Aberto", limite=50)
+        regional = min(indice.regionais(inicio, fim))
+        loja = min(indice.lojas(regional, inicio, fim))
+        indice.lider(regional, loja, inicio, fim)
+        agregacoes._agregados.limpar()
+        preparado = agregacoes.preparar_dados(database.ler_chamados(), "bench")
+        agregacoes.calcular_agregados(preparado, (("regional", tuple(REGIONAIS[:3])),))
+        exportacao.gerar_csv(preparado.df.head(1000))
+
+    desempenho.iniciar_rerun("bench")
+    rerun()
+    medicoes = len(desempenho.registros_rerun())
+    desempenho.finalizar_rerun()
+    rerun_ms = cronometrar(rerun)
+    return {
+        "custo_por_medicao_us": round(custo_chamada_us, 3),
+        "custo_por_medicao_dataframe_us": round(custo_dataframe_us, 3),
+        "medicoes_por_rerun": medicoes,
+        "rerun_ms": rerun_ms,
+        "sobrecarga_pct": round(100 * medicoes * custo_medio_us / 1000 / rerun_ms, 4),
+    }
+
+
+# Parâmetros escalados por --escala
+PARAMETROS_TAMANHO = ("quantidade", "linhas", "tamanhos")
+
+# Diferença mínima (ms) para um tempo maior que a base contar como regressão
+PISO_MS = 1.0
+
+
+def parametros_escalados(funcao, escala):
+    """Tamanhos padrão do benchmark multiplicados por `escala`."""
+    parametros = {}
+    for nome, parametro in inspect.signature(funcao).parameters.items():
+        if nome not in PARAMETROS_TAMANHO or escala == 1:
+            continue
+        padrao = parametro.default
+        if isinstance(padrao, tuple):
+            parametros[nome] = tuple(max(1, int(valor * escala)) for valor in padrao)
+        else:
+            parametros[nome] = max(1, int(padrao * escala))
+    return parametros
+
+
+def comparar(base, atual, tolerancia):
+    """Regressões de `atual` contra `base`: lista de (benchmark, chave, base, atual)."""
+    regressoes = []
+    for nome, resultado in atual.items():
+        for chave, valor in resultado.items():
+            anterior = base.get(nome, {}).get(chave)
+            if not isinstance(anterior, (int, float)) or not isinstance(valor, (int, float)):
+                continue
+            if chave.endswith("_ms"):
+                piorou = valor > anterior * (1 + tolerancia) and valor - anterior > PISO_MS
+            elif chave.endswith("_mb"):
+                piorou = valor > anterior * (1 + tolerancia)
+            elif "requisicoes" in chave:
+                piorou = valor > anterior
+            else:
+                continue
+            if piorou:
+                regressoes.append((nome, chave, anterior, valor))
+    return regressoes
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Benchmarks do sistema de chamados")
+    parser.add_argument("nomes", nargs="*", choices=[[]] + list(BENCHMARKS), metavar="nome")
+    parser.add_argument("--escala", type=float, default=1.0)
+    parser.add_argument("--base", default="benchmark_base.json")
+    parser.add_argument("--salvar-base", action="store_true")
+    parser.add_argument("--tolerancia", type=float, default=0.25)
+    args = parser.parse_args(argv)
+
+    resultados = {}
+    for nome in args.nomes or BENCHMARKS:
+        funcao = BENCHMARKS[nome]
+        resultado = funcao(**parametros_escalados(funcao, args.escala))
+        resultados[nome] = resultado
+        print(f"{nome}:")
+        for chave, valor in resultado.items():
+            print(f"  {chave}: {valor:.2f}" if isinstance(valor, float) else f"  {chave}: {valor}")
+
+    # A base guarda também a escala: só resultados do mesmo tamanho são comparados
+    chave_base = f"escala={args.escala:g}"
+    base = {}
+    if os.path.exists(args.base):
+        with open(args.base, encoding="utf-8") as arquivo:
+            base = json.load(arquivo)
+
+    if args.salvar_base:
+        base.setdefault(chave_base, {}).update(resultados)
+        with open(args.base, "w", encoding="utf-8") as arquivo:
+            json.dump(base, arquivo, indent=2, ensure_ascii=False, default=float)
+        print(f"Base salva em {args.base}")
+        return 0
+
+    if chave_base not in base:
+        # Sem base não há conferência de regressões: falha, para não passar despercebido
+        print(f"ERRO: sem base para comparar em {args.base} ({chave_base}); "
+              f"use --escala de uma base salva ou grave uma com --salvar-base", file=sys.stderr)
+        return 2
+    for nome in resultados:
+        if nome not in base[chave_base]:
+            print(f"AVISO: {nome} não está na base ({chave_base}); não foi comparado", file=sys.stderr)
+    regressoes = comparar(base[chave_base], resultados, args.tolerancia)
+    for nome, chave, anterior, valor in regressoes:
+        print(f"REGRESSÃO {nome}.{chave}: {anterior:g} -> {valor:g}")
+    if not regressoes:
+        print("Nenhuma regressão em relação à base.")
+    return 1 if regressoes else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
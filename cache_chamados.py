@@ -0,0 +1,223 @@
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+import pandas as pd
+from esquema import carregar_chamados, concatenar, memoria_mb
+
+
+# Versões únicas no processo, mesmo entre instâncias diferentes do cache
+_versoes = itertools.count(1)
+
+
+def filtrar_chamados(df, status=None, inicio=None, fim=None, regional=None, loja=None):
+    """Aplica em pandas os mesmos filtros que `database.consultar_chamados` envia ao servidor."""
+    if df.empty:
+        return df
+    mask = pd.Series(True, index=df.index)
+    if status:
+        mask &= df["status"] == status
+    if inicio:
+        mask &= df["abertura"] >= pd.Timestamp(inicio)
+    if fim:
+        mask &= df["abertura"] < pd.Timestamp(fim + timedelta(days=1))
+    if regional:
+        mask &= df["regional"] == regional
+    if loja:
+        mask &= df["loja"] == loja
+    return df[mask]
+
+
+def mesmas_linhas(atuais, novos):
+    """Se as linhas buscadas de novo têm os mesmos ids e valores que as do cache."""
+    if len(atuais) != len(novos) or not set(novos.columns) <= set(atuais.columns):
+        return False
+    colunas = list(novos.columns)
+    # Em `object`, categorias e textos comparam pelo valor
+    atuais = atuais.sort_values("id")[colunas].astype(object).reset_index(drop=True)
+    novos = novos.sort_values("id")[colunas].astype(object).reset_index(drop=True)
+    return atuais.equals(novos)
+
+
+def juntar_chamados(df, arquivados):
+    """Chamados da tabela principal e do histórico, sem repetir ids e ordenados por id."""
+    if arquivados.empty:
+        return df
+    if df.empty:
+        return arquivados
+    return concatenar([df, arquivados]).drop_duplicates("id").sort_values("id", ignore_index=True)
+
+
+class MemoriaLRU:
+    """Memoização limitada: descarta o resultado usado há mais tempo."""
+
+    def __init__(self, capacidade=32):
+        self.capacidade = capacidade
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obter(self, chave, calcular):
+        with self._lock:
+            if chave in self._itens:
+                self._itens.move_to_end(chave)
+                return self._itens[chave]
+        valor = calcular()
+        with self._lock:
+            self._itens[chave] = valor
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.capacidade:
+                self._itens.popitem(last=False)
+        return valor
+
+    def limpar(self):
+        with self._lock:
+            self._itens.clear()
+
+
+class CacheChamados:
+    """Cópia local da tabela de chamados, compartilhada entre sessões.
+
+    Faz uma carga completa na primeira leitura e, depois, busca apenas as linhas
+    inseridas, alteradas ou removidas depois da última alteração vista. O número
+    da alteração é mantido pelo banco (`ultima_alteracao`, schema.sql), então
+    não depende do relógio de quem escreveu. A versão só muda quando os dados
+    buscados diferem dos que já estão no cache.
+    """
+
+    def __init__(self, carregar_tudo, carregar_alterados, ultima_alteracao, intervalo_minimo=2.0):
+        self._carregar_tudo = carregar_tudo
+        self._carregar_alterados = carregar_alterados
+        self._ultima_alteracao = ultima_alteracao
+        self.intervalo_minimo = intervalo_minimo
+        self._lock = threading.Lock()
+        self._df = None
+        # A busca incremental pede as alterações depois de `_alteracao`; `_marca` é
+        # a última alteração lida do banco, que vira o cursor na busca seguinte
+        self._alteracao = None
+        self._marca = None
+        self._atualizado_em = 0.0
+        self._sujo = False
+        self.versao = next(_versoes)
+        self.acertos = 0
+        self.falhas = 0
+        self.incrementais = 0
+
+    def obter(self):
+        """Retorna uma cópia do DataFrame de chamados, atualizando se necessário."""
+        df, _ = self.instantaneo()
+        return df.copy()
+
+    def instantaneo(self):
+        """(DataFrame, versão) sem cópia, para leituras que não alteram os dados.
+
+        O cache nunca altera um DataFrame já entregue: cada atualização monta outro.
+        """
+        with self._lock:
+            if self._df is None:
+                self.falhas += 1
+                self._carga_completa()
+            elif self._sujo or time.monotonic() - self._atualizado_em >= self.intervalo_minimo:
+                self.incrementais += 1
+                self._carga_incremental()
+            else:
+                self.acertos += 1
+            return self._df, self.versao
+
+    def invalidar(self, completo=False):
+        """Marca o cache como desatualizado; `completo` descarta todos os dados."""
+        with self._lock:
+            if completo:
+                self._df = None
+                self._alteracao = None
+                self._marca = None
+            self.versao = next(_versoes)
+            self._sujo = True
+
+    def aplicar_eventos(self, eventos):
+        """Aplica alterações recebidas em tempo real sem consultar o servidor.
+
+        `eventos` é uma lista de (tipo, registro), com tipo INSERT, UPDATE ou
+        DELETE, na ordem em que aconteceram. Retorna os ids alterados.
+        """
+        with self._lock:
+            if self._df is None:
+                # A primeira leitura já trará o estado atual
+                return set()
+            alterados = {}
+            removidos = set()
+            for tipo, registro in eventos:
+                if registro.get("id") is None:
+                    continue
+                chamado_id = int(registro["id"])
+                if tipo == "DELETE":
+                    alterados.pop(chamado_id, None)
+                    removidos.add(chamado_id)
+                else:
+                    alterados[chamado_id] = registro
+                    removidos.discard(chamado_id)
+            ids = set(alterados) | removidos
+            if not ids:
+                return ids
+            df = self._df[~self._df["id"].isin(list(ids))]
+            if alterados:
+                novos = carregar_chamados(list(alterados.values()))
+                df = concatenar([df, novos]) if not df.empty else novos
+            self._df = df.sort_values("id", ignore_index=True)
+            self._marcar_atualizado()
+            return ids
+
+    def estatisticas(self):
+        with self._lock:
+            return {
+                "acertos": self.acertos,
+                "falhas": self.falhas,
+                "incrementais": self.incrementais,
+                "linhas": 0 if self._df is None else len(self._df),
+                "memoria_mb": 0.0 if self._df is None else round(memoria_mb(self._df), 2),
+                "versao": self.versao,
+                "alteracao": self._alteracao,
+            }
+
+    # Carga de dados
+    def _carga_completa(self):
+        # A marca é lida antes dos dados: o que mudar durante a carga vem na busca seguinte
+        marca = self._ultima_alteracao()
+        self._df = carregar_chamados(self._carregar_tudo())
+        self._alteracao = self._marca = marca
+        self._marcar_atualizado()
+
+    def _carga_incremental(self):
+        marca = self._ultima_alteracao()
+        linhas, removidos = self._carregar_alterados(self._alteracao)
+        # O cursor fica uma busca atrás da marca: uma alteração numerada antes da
+        # marca mas confirmada depois da leitura ainda é encontrada na busca seguinte
+        self._alteracao, self._marca = self._marca, marca
+        df = self._mesclar(linhas, removidos)
+        mudou = df is not self._df
+        self._df = df
+        self._marcar_atualizado(mudou)
+
+    def _mesclar(self, linhas, removidos):
+        """DataFrame com as linhas buscadas e sem as removidas; o mesmo objeto se nada mudou."""
+        df = self._df
+        if removidos and not df.empty:
+            presentes = df["id"].isin(list(removidos))
+            if presentes.any():
+                df = df[~presentes]
+        if not linhas:
+            return df
+        novos = carregar_chamados(linhas).drop_duplicates("id", keep="last")
+        if df.empty:
+            return novos.reset_index(drop=True)
+        alterados = df["id"].isin(novos["id"])
+        # Linhas buscadas de novo sem mudança (o cursor repete a última busca) não geram versão
+        if mesmas_linhas(df[alterados], novos):
+            return df
+        return concatenar([df[~alterados], novos]).sort_values("id", ignore_index=True)
+
+    def _marcar_atualizado(self, mudou=True):
+        if mudou:
+            self.versao = next(_versoes)
+        self._atualizado_em = time.monotonic()
+        self._sujo = False
@@ -1,121 +1,216 @@
+import json
+import time
+import uuid
 import streamlit as st
-import pandas as pd
 from datetime import datetime
-from io import BytesIO
-from database import cadastrar_chamado as db_cadastrar_chamado, finalizar_chamado as db_finalizar_chamado, ler_chamados
-from database import supabase
+from database import cadastrar_chamado as db_cadastrar_chamado, finalizar_chamados as db_finalizar_chamados
+from database import consultar_chamados, COLUNAS_LISTAGEM, listar_motivos, cadastrar_motivo
+from database import ler_chamados_filtrados, precisa_historico
+from database_async import agendar, consultar_chamados_async
+from desempenho import medir
+from exportacao import botao_exportacao
+import fila_escrita
+from recursos import indice_referencia
+import tempo_real
 
-EXCEL_PATH = "chamado.xlsx"
 
+# Funções principais
+STATUS_POR_FILTRO = {"Chamados Abertos": "Aberto", "Chamados Finalizados": "Finalizado"}
+
+
+@medir()
+def listar_chamados(filtro="Chamados Abertos", inicio=None, fim=None, regional=None, loja=None,
+                    limite=None, apos_id=None, colunas=COLUNAS_LISTAGEM):
+    """Lista chamados filtrando por status, datas, regional e loja no servidor.
+
+    Com `limite`, retorna uma página; o id para buscar a próxima fica em
+    `df.attrs["proximo_cursor"]` (None na última página). Com o tempo real
+    ativo, filtra o cache de chamados (mantido pelos eventos) em memória, com o
+    recorte memoizado por versão dos dados e filtros. Os chamados arquivados só
+    entram quando o período alcança o histórico.
+    """
+    if not (inicio and fim):
+        inicio = fim = None
+    if tempo_real.ATIVO:
+        df = ler_chamados_filtrados(STATUS_POR_FILTRO.get(filtro), inicio, fim, regional, loja)
+        if apos_id is not None:
+            df = df[df["id"] > apos_id]
+        if colunas != "*":
+            df = df[[c for c in colunas.split(",") if c in df.columns]]
+        cursor = None
+        if limite is not None:
+            cursor = int(df["id"].iloc[limite - 1]) if len(df) > limite else None
+            df = df.head(limite)
+        df = df.reset_index(drop=True)
+        df.attrs["proximo_cursor"] = cursor
+        return df
+    df, cursor = consultar_chamados(
+        status=STATUS_POR_FILTRO.get(filtro),
+        inicio=inicio,
+        fim=fim,
+        regional=regional,
+        loja=loja,
+        colunas=colunas,
+        limite=limite,
+        apos_id=apos_id,
+    )
+    df.attrs["proximo_cursor"] = cursor
+    return df
 
-# Carregar dados do Excel
-@st.cache_data
-def carregar_dados_excel():
-    try:
-        dados_excel = pd.read_excel(EXCEL_PATH, header=1)
-        dados_excel.columns = [str(c).strip().upper() for c in dados_excel.columns]
+# Interface Streamlit
 
-        # Converter colunas específicas
-        for col in ["8", "1", "12"]:
-            if col in dados_excel.columns:
-                dados_excel[col] = dados_excel[col].astype(str)
-        if "4" in dados_excel.columns:
-            dados_excel["4"] = pd.to_datetime(dados_excel["4"], errors="coerce")
+# Segundos em que repetir o mesmo envio (clique duplo) reaproveita a chave de idempotência
+JANELA_REPETICAO = 30
+
+
+def chave_envio(tipo, dados):
+    """Chave de idempotência do envio; o mesmo envio repetido logo em seguida recebe a mesma."""
+    assinatura = json.dumps([tipo, dados], sort_keys=True, default=str)
+    anterior = st.session_state.get("ultimo_envio")
+    if anterior and anterior[0] == assinatura and time.monotonic() - anterior[2] < JANELA_REPETICAO:
+        return anterior[1]
+    chave = uuid.uuid4().hex
+    st.session_state["ultimo_envio"] = (assinatura, chave, time.monotonic())
+    return chave
+
+
+TAMANHOS_PAGINA = [25, 50, 100, 200]
+COLUNAS_TABELA = ["id", "regional", "loja", "lider", "motivo", "abertura", "status"]
+
+
+def estado_paginacao(filtro_status, data_inicio, data_fim):
+    """Tamanho da página e pilha de cursores; volta à primeira página quando os filtros mudam."""
+    tamanho = st.session_state.get("tamanho_pagina", TAMANHOS_PAGINA[1])
+    chave_filtros = (filtro_status, data_inicio, data_fim, tamanho)
+    if st.session_state.get("paginacao_filtros") != chave_filtros:
+        st.session_state["paginacao_filtros"] = chave_filtros
+        st.session_state["paginacao_cursores"] = [None]
+    return tamanho, st.session_state["paginacao_cursores"]
+
+
+def pagina_atual():
+    """Identifica a página mostrada: filtros, tamanho e cursores."""
+    return st.session_state["paginacao_filtros"], tuple(st.session_state["paginacao_cursores"])
+
+
+def carregar_pagina_async(filtro_status, data_inicio, data_fim):
+    """Começa a buscar a página atual da lista em segundo plano (Future com o DataFrame).
+
+    Com o tempo real ativo a página sai do cache em memória e não há o que buscar.
+    """
+    tamanho, cursores = estado_paginacao(filtro_status, data_inicio, data_fim)
+    if tempo_real.ATIVO:
+        return None
+    status = STATUS_POR_FILTRO.get(filtro_status)
+    futura = agendar(consultar_chamados_async(
+        status, data_inicio, data_fim, limite=tamanho, apos_id=cursores[-1],
+        historico=precisa_historico(status, data_inicio),
+    ))
+    # A lista reexecuta sozinha ao paginar e recebe de novo esta busca: só vale para esta página
+    futura.pagina = pagina_atual()
+    return futura
+
+
+def lista_paginada(filtro_status, data_inicio, data_fim, pagina_futura=None):
+    """Mostra uma página de chamados em uma única tabela e retorna as linhas selecionadas."""
+    st.selectbox("Chamados por página", TAMANHOS_PAGINA, index=1, key="tamanho_pagina")
+    tamanho, cursores = estado_paginacao(filtro_status, data_inicio, data_fim)
+    chave_filtros = st.session_state["paginacao_filtros"]
+
+    df = None
+    if pagina_futura is not None and getattr(pagina_futura, "pagina", None) == pagina_atual():
+        try:
+            df, cursor = pagina_futura.result()
+            df.attrs["proximo_cursor"] = cursor
+        except Exception:
+            # Falha no acesso assíncrono: refaz a consulta pelo cliente síncrono
+            df = None
+    if df is None:
+        df = listar_chamados(filtro_status, data_inicio, data_fim, limite=tamanho, apos_id=cursores[-1])
+    if df.empty:
+        st.info("ℹ️ Nenhum chamado encontrado.")
+        return df
 
-        return dados_excel
-    except FileNotFoundError:
-        st.warning(f"⚠️ Arquivo {EXCEL_PATH} não encontrado!")
-        return pd.DataFrame()
-    except Exception as e:
-        st.error(f"Erro ao carregar Excel: {e}")
-        return pd.DataFrame()
+    evento = st.dataframe(
+        df[[c for c in COLUNAS_TABELA if c in df.columns]],
+        hide_index=True,
+        use_container_width=True,
+        on_select="rerun",
+        selection_mode="multi-row",
+        key=f"tabela_chamados_{hash(chave_filtros)}_{len(cursores)}",
+    )
 
-dados = carregar_dados_excel()
+    # A página muda no callback, antes da reexecução (só da lista): um clique basta
+    col_anterior, col_pagina, col_proxima = st.columns([1, 2, 1])
+    col_anterior.button("⬅️ Anterior", disabled=len(cursores) == 1, on_click=cursores.pop)
+    col_pagina.write(f"Página {len(cursores)}")
+    proximo_cursor = df.attrs["proximo_cursor"]
+    col_proxima.button("Próxima ➡️", disabled=proximo_cursor is None, on_click=cursores.append, args=(proximo_cursor,))
 
+    return df.iloc[[i for i in evento.selection.rows if i < len(df)]]
 
-# Funções principais
-def listar_chamados(filtro="Chamados Abertos", inicio=None, fim=None):
-    """Lista chamados filtrando por status e datas."""
-    df = ler_chamados()
 
-    if df.empty:
-        return df
+def painel_finalizacao(selecionados):
+    """Painel único para finalizar os chamados abertos selecionados na tabela."""
+    if selecionados.empty or "status" not in selecionados.columns:
+        return
+    ids = selecionados.loc[selecionados["status"] == "Aberto", "id"].tolist()
+    if not ids:
+        return
 
-    # Filtrar status
-    if filtro == "Chamados Abertos":
-        df = df[df["status"] == "Aberto"]
-    elif filtro == "Chamados Finalizados":
-        df = df[df["status"] == "Finalizado"]
+    with st.container(border=True):
+        st.write(f"Finalizar chamado(s): {', '.join(str(i) for i in ids)}")
+        adicionar_obs = st.radio("Deseja acrescentar uma observação?", options=["Sim", "Não"], key="radio_finalizar")
 
-    # Filtrar por datas
-    if inicio and fim:
-        df["abertura"] = pd.to_datetime(df["abertura"], errors="coerce")
-        df = df[df["abertura"].dt.date.between(inicio, fim)]
+        # Caixa de texto só se escolher Sim
+        observacao = None
+        if adicionar_obs == "Sim":
+            observacao = st.text_area("Digite sua observação:", key="text_finalizar")
 
-    return df
+        if st.button("Confirmar Finalização", key="confirm_finalizar"):
+            db_finalizar_chamados(ids, observacao, chave=chave_envio("finalizar", [ids, observacao]))
+            st.rerun()
+
+
+@tempo_real.ao_vivo
+def secao_lista(filtro_status, data_inicio, data_fim, pagina_futura=None):
+    """Lista e painel de finalização: paginar e selecionar reexecutam só esta parte.
+
+    Com o tempo real ativo, também redesenhados sozinhos.
+    """
+    selecionados = lista_paginada(filtro_status, data_inicio, data_fim, pagina_futura)
+    painel_finalizacao(selecionados)
 
-#Função de caixa em finalizar chamados
-def finalizar_chamado(chamado_id, observacao=None):
-    """Finaliza um chamado, atualizando status, fechamento e observacao."""
-    agora = datetime.now().isoformat()
-    supabase.table("chamados").update({
-        "status": "Finalizado",   # Deve bater com filtro
-        "fechamento": agora,
-        "observacao": observacao
-    }).eq("id", chamado_id).execute()
-
-def exportar_chamados_para_excel(df):
-    df_export = df.copy()
-
-    # Garantir que colunas de data estão em datetime e sem timezone
-    for col in ["abertura", "fechamento"]:
-        if col in df_export.columns:
-            df_export[col] = pd.to_datetime(df_export[col], errors="coerce")
-            df_export[col] = df_export[col].dt.tz_localize(None)  # remove timezone
-
-    # Opcional: garantir que "finalizado_por" aparece no Excel
-    colunas_esperadas = ["id", "regional", "loja", "lider", "motivo", "abertura", "fechamento", "duracao", "status", "observacao"]
-    colunas_existentes = [c for c in colunas_esperadas if c in df_export.columns]
-    df_export = df_export[colunas_existentes]
-
-    # Exportar para Excel
-    output = BytesIO()
-    with pd.ExcelWriter(output, engine="xlsxwriter") as writer:
-        df_export.to_excel(writer, index=False, sheet_name="chamados")
-    output.seek(0)
-    return output.getvalue()
 
-# Interface Streamlit
 def sistema_chamados(usuario_logado):
     st.title(f"📌 Sistema de Chamados - Usuário: {usuario_logado}")
     st.sidebar.header("Filtros")
 
-    # Filtros
-    filtro_status = st.sidebar.selectbox("Filtrar Chamados", ["Chamados Abertos", "Chamados Finalizados"])
-    data_inicio = st.sidebar.date_input("Data Início", value=datetime.today())
-    data_fim = st.sidebar.date_input("Data Fim", value=datetime.today())
+    # Filtros: valem juntos ao clicar em "Aplicar filtros", não a cada campo alterado
+    with st.sidebar.form("filtros_chamados"):
+        filtro_status = st.selectbox("Filtrar Chamados", ["Chamados Abertos", "Chamados Finalizados"])
+        data_inicio = st.date_input("Data Início", value=datetime.today())
+        data_fim = st.date_input("Data Fim", value=datetime.today())
+        st.form_submit_button("Aplicar filtros")
+
+    # A página da lista é buscada em paralelo enquanto o formulário é montado
+    pagina_futura = carregar_pagina_async(filtro_status, data_inicio, data_fim)
 
     # Seleção Regional
-    regionais_disponiveis = []
-    if "4" in dados.columns and "8" in dados.columns:
-        mask = dados["4"].dt.date.between(data_inicio, data_fim)
-        regionais_disponiveis = dados[mask]["8"].str.strip().unique().tolist()
+    indice = indice_referencia()
+    regionais_disponiveis = indice.regionais(data_inicio, data_fim)
     regional = st.selectbox("Regional", ["Selecione uma Regional"] + regionais_disponiveis)
 
     # Seleção Loja
     lojas_disponiveis = []
-    if regional not in ["Selecione uma Regional"] and "1" in dados.columns and "8" in dados.columns:
-        mask = (dados["8"].str.strip() == regional) & (dados["4"].dt.date.between(data_inicio, data_fim))
-        lojas_disponiveis = dados[mask]["1"].str.strip().unique().tolist()
+    if regional not in ["Selecione uma Regional"]:
+        lojas_disponiveis = indice.lojas(regional, data_inicio, data_fim)
     loja = st.selectbox("Loja", ["Selecione uma Loja"] + lojas_disponiveis)
 
     # Líder
     lider = ""
-    if loja not in ["Selecione uma Loja"] and {"8", "1", "12", "4"}.issubset(dados.columns):
-        mask = (dados["8"].str.strip() == regional) & (dados["1"].str.strip() == loja) & (dados["4"].dt.date.between(data_inicio, data_fim))
-        filtro = dados[mask]
-        if not filtro.empty:
-            lider = filtro["12"].iloc[0]
+    if loja not in ["Selecione uma Loja"]:
+        lider = indice.lider(regional, loja, data_inicio, data_fim)
     lider_editado = st.text_input("Líder", value=lider).upper()
 
     # Motivo
@@ -128,12 +223,8 @@ def sistema_chamados(usuario_logado):
         "COLETOR NA CONECTA NA REDE",
     ]
 
-    # Buscar motivos já cadastrados no Supabase (coluna 'motivo')
-    res = supabase.table("chamados").select("motivo").execute()
-    motivos_db = [m["motivo"].upper() for m in res.data if m.get("motivo")]
-
-    # Remover duplicados que já estão nos fixos
-    novos_motivos = sorted([m for m in motivos_db if m not in motivos_fixos])
+    # Motivos do catálogo (já normalizados em maiúsculas)
+    motivos_db = listar_motivos()
 
     # Junta fixos + do banco, sem duplicados
     motivos = list(dict.fromkeys(motivos_fixos + motivos_db))
@@ -152,11 +243,6 @@ def sistema_chamados(usuario_logado):
         if outro_motivo:
             motivo = outro_motivo  # substitui "OUTRO" pelo valor digitado
 
-            # Salvar no Supabase apenas se ainda não existir
-            if motivo not in motivos_db:
-                supabase.table("chamados").insert({"motivo": motivo}).execute()
-                motivos_db.append(motivo)  # atualiza a lista local
-                
     # Botão Cadastrar Chamado
     if st.button("Cadastrar Chamado"):
         motivo_final = outro_motivo if motivo == "Outro" else motivo
@@ -169,79 +255,31 @@ def sistema_chamados(usuario_logado):
         ):
             st.warning("⚠️ Todos os campos devem ser preenchidos!")
         else:
-            db_cadastrar_chamado(regional, loja, lider_editado, motivo_final)
+            # Novo motivo entra no catálogo junto com o chamado
+            if motivo_final not in motivos:
+                cadastrar_motivo(motivo_final)
+            db_cadastrar_chamado(
+                regional, loja, lider_editado, motivo_final,
+                chave=chave_envio("cadastrar", [regional, loja, lider_editado, motivo_final]),
+            )
+            # A página buscada antes do cadastro ficou desatualizada
+            pagina_futura = None
 
     # Listar chamados
     st.subheader("📋 Chamados")
-    df_chamados = listar_chamados(filtro_status, data_inicio, data_fim)
-
-    if not df_chamados.empty:
-        for _, row in df_chamados.iterrows():
-            col1, col2, col3, col4, col5, col6, col7 = st.columns([1, 2, 2, 2, 2, 1, 1])
-            col1.write(row["id"])
-            col2.write(row["regional"])
-            col3.write(row["loja"])
-            col4.write(row["lider"])
-            col5.write(row["motivo"])
-            col6.write(row["status"])
-            if row["status"] == "Aberto":
-                # Inicializa estados no session_state
-                key_finalizar = f"finalizar_{row['id']}"
-                key_obs = f"adicionar_obs_{row['id']}"
-                key_confirm = f"confirm_{row['id']}"
-
-                if key_finalizar not in st.session_state:
-                    st.session_state[key_finalizar] = False
-                if key_obs not in st.session_state:
-                    st.session_state[key_obs] = "Não"  # default para "Não"
-
-                # Botão Finalizar inicial
-                if col7.button("Finalizar", key=f"btn_{row['id']}"):
-                    st.session_state[key_finalizar] = True
-
-                # Mostrar a pergunta de observação apenas se o usuário clicou em Finalizar
-                if st.session_state[key_finalizar]:
-                    # Escolha Sim/Não
-                    adicionar_obs = st.radio(
-                        "Deseja acrescentar uma observação?",
-                        options=["Sim", "Não"],
-                        key=f"radio_{row['id']}"
-                    )
-                    st.session_state[key_obs] = adicionar_obs
-
-                    # Caixa de texto só se escolher Sim
-                    observacao = None
-                    if adicionar_obs == "Sim":
-                        observacao = st.text_area(
-                            "Digite sua observação:",
-                            key=f"text_{row['id']}"
-                        )
-
-                    # Botão de confirmação sempre disponível
-                    if st.button("Confirmar Finalização", key=key_confirm):
-                        # Finaliza o chamado mesmo que observacao seja None
-                        db_finalizar_chamado(row["id"], observacao)
-
-                        # Atualiza localmente para desaparecer da lista
-                        df_chamados.loc[df_chamados["id"] == row["id"], "status"] = "Finalizado"
-
-                        # Limpa estados
-                        st.session_state[key_finalizar] = False
-                        st.session_state[key_obs] = "Não"
-
-                        st.success(f"✅ Chamado {row['id']} finalizado!")
-                        st.rerun()
-    else:
-        st.info("ℹ️ Nenhum chamado encontrado.")
-
-    # Exportar chamados
-    if not df_chamados.empty:
-        st.download_button(
-            label="📥 Exportar Chamados para Excel",
-            data=exportar_chamados_para_excel(df_chamados),
-            file_name="chamados_exportados.xlsx",
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        )
+    if fila_escrita.ATIVA:
+        pendentes = fila_escrita.fila().profundidade()
+        if pendentes:
+            st.caption(f"⏳ {pendentes} operação(ões) aguardando envio ao servidor")
+    secao_lista(filtro_status, data_inicio, data_fim, pagina_futura)
+
+    # Exportar chamados (o arquivo só é gerado quando solicitado)
+    botao_exportacao(
+        lambda: listar_chamados(filtro_status, data_inicio, data_fim, colunas="*"),
+        (filtro_status, data_inicio, data_fim),
+        "chamados_exportados",
+        chave="chamados",
+    )
 
     # Botão sair
     if st.button("🚪 Sair"):
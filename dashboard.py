@@ -1,23 +1,20 @@
 import streamlit as st
 import matplotlib.pyplot as plt
 import pandas as pd
-from io import BytesIO
-from database import ler_chamados
-
-
-# Exportar dados para Excel
-def exportar_chamados_para_excel(df):
-    output = BytesIO()
-    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-        df.to_excel(writer, index=False, sheet_name='chamados')
-    output.seek(0)
-    return output.getvalue()
+from agregacoes import calcular_agregados, filtrar_chamados_por, preparar_dados
+from analise import SLA_HORAS, calcular_analise, preparar_analise
+from database import ler_chamados_versao, ler_metricas, ler_todos_chamados, limite_historico
+from desempenho import fragmento, medir
+from exportacao import botao_exportacao
+from graficos import BACKENDS, BACKEND_PADRAO, espec_barra, espec_pizza, exibir_grafico
+import tempo_real
 
 
 # Funções de gráficos
-def plotar_pizza(df, coluna, titulo=None, figsize=(4,4)):
+@medir()
+def plotar_pizza(contagem, titulo=None, figsize=(4,4)):
     fig, ax = plt.subplots(figsize=figsize)
-    df[coluna].value_counts().plot(
+    contagem.plot(
         kind="pie", autopct='%1.1f%%', startangle=25, ax=ax, colors=plt.cm.Paired.colors
     )
     ax.set_ylabel('')
@@ -26,12 +23,14 @@ def plotar_pizza(df, coluna, titulo=None, figsize=(4,4)):
     fig.tight_layout()
     return fig
 
-def plotar_barra(df, coluna, titulo=None, figsize=(8,5), top_n=10, ordenar_por_valor=True):
+@medir()
+def plotar_barra(contagem, titulo=None, figsize=(8,5), top_n=10, ordenar_por_valor=True):
     fig, ax = plt.subplots(figsize=figsize)
-    df_count = df[coluna].value_counts().head(top_n)
+    df_count = contagem.head(top_n)
+    # None mantém a ordem da série (ex.: faixas de idade)
     if ordenar_por_valor:
         df_count = df_count.sort_values()
-    else:
+    elif ordenar_por_valor is not None:
         df_count = df_count.sort_index()
     valores = pd.to_numeric(df_count.values)
     cores = ['green' if v <= 5 else 'red' for v in valores]
@@ -45,31 +44,8 @@ def plotar_barra(df, coluna, titulo=None, figsize=(8,5), top_n=10, ordenar_por_v
     return fig
 
 
-def plotar_tempo_medio(df, titulo="Tempo Médio por Motivo"):
-    # Verifica se as colunas existem
-    if 'abertura' not in df.columns or 'fechamento' not in df.columns:
-        st.warning(
-            "As colunas 'abertura' e/ou 'fechamento' não foram encontradas. Gráfico de tempo médio não será exibido.")
-        return None
-
-    # Considera apenas chamados finalizados
-    df_finalizados = df[df['fechamento'].notna()].copy()
-
-    if df_finalizados.empty:
-        st.info("Nenhum chamado finalizado encontrado para calcular o tempo médio.")
-        return None
-
-    # Converter para datetime
-    df_finalizados['abertura'] = pd.to_datetime(df_finalizados['abertura'])
-    df_finalizados['fechamento'] = pd.to_datetime(df_finalizados['fechamento'])
-
-    # Calcular tempo em minutos
-    df_finalizados['tempo_minutos'] = (df_finalizados['fechamento'] - df_finalizados[
-        'abertura']).dt.total_seconds() / 60
-
-    # Média por motivo
-    media_por_motivo = df_finalizados.groupby('motivo')['tempo_minutos'].mean().sort_values(ascending=False)
-
+@medir()
+def plotar_tempo_medio(media_por_motivo, titulo="Tempo Médio por Motivo"):
     # Seleciona apenas os 10 maiores
     media_por_motivo = media_por_motivo.head(10)
 
@@ -94,30 +70,111 @@ def plotar_tempo_medio(df, titulo="Tempo Médio por Motivo"):
 
 
 # Função de filtros
-def aplicar_filtros(df, colunas_filtro):
-    df_filtrado = df.copy()
-    for col in colunas_filtro:
-        if col in df.columns:
-            valores = st.sidebar.multiselect(
-                col.capitalize(), df[col].dropna().unique(),
-                placeholder=f"Selecione {col.capitalize()}"
+@medir()
+def aplicar_filtros(preparado, colunas_filtro, chave="dashboard"):
+    """Formulário de filtros; retorna os filtros como ((coluna, valores), ...).
+
+    As escolhas só valem ao clicar em "Aplicar filtros", todas de uma vez: cada
+    multiselect alterado não reexecuta a página.
+    """
+    colunas = [col for col in colunas_filtro if col in preparado.categorias]
+    filtros = []
+    with st.form(f"filtros_{chave}"):
+        for col, campo in zip(colunas, st.columns(len(colunas) or 1)):
+            valores = campo.multiselect(
+                col.capitalize(), list(preparado.categorias[col]),
+                placeholder=f"Selecione {col.capitalize()}", key=f"filtro_{chave}_{col}"
             )
             if valores:
-                df_filtrado = df_filtrado[df_filtrado[col].isin(valores)]
-    return df_filtrado
+                filtros.append((col, tuple(valores)))
+        st.form_submit_button("Aplicar filtros")
+    return tuple(filtros)
+
+
+def escolher_backend():
+    """Seletor do tipo de gráfico na barra lateral."""
+    nomes = list(BACKENDS)
+    padrao = next((i for i, nome in enumerate(nomes) if BACKENDS[nome] == BACKEND_PADRAO), 0)
+    return BACKENDS[st.sidebar.selectbox("Tipo de gráfico", nomes, index=padrao)]
+
+
+def exibir_tempo_medio(agregados, backend=None):
+    media_por_motivo = agregados["tempo_medio_motivo"]
+    if media_por_motivo is None:
+        st.warning(
+            "As colunas 'abertura' e/ou 'fechamento' não foram encontradas. Gráfico de tempo médio não será exibido.")
+    elif media_por_motivo.empty:
+        st.info("Nenhum chamado finalizado encontrado para calcular o tempo médio.")
+    else:
+        exibir_grafico(
+            plotar_tempo_medio, media_por_motivo.head(10), espec_barra("Tempo Médio por Motivo", horizontal=True), backend
+        )
+
+
+NIVEIS_SLA = {"regional": "Regional", "loja": "Loja", "lider": "Líder"}
+
+
+@fragmento
+def exibir_analise(filtros, backend=None):
+    """Percentis do tempo de resolução, violações do SLA e idade dos abertos.
+
+    Os chamados arquivados só entram quando pedidos: a leitura do histórico é a parte cara.
+    Mudar o SLA ou o nível reexecuta só este painel.
+    """
+    col_sla, col_nivel = st.columns(2)
+    sla_horas = col_sla.number_input("SLA (horas)", min_value=1.0, value=SLA_HORAS, step=1.0, key="sla_horas")
+    nivel = col_nivel.selectbox("Violações por", list(NIVEIS_SLA), format_func=NIVEIS_SLA.get, key="sla_nivel")
+    historico = limite_historico() is not None and st.checkbox("Incluir chamados arquivados", key="sla_historico")
+
+    chamados, versao = ler_chamados_versao(historico)
+    if chamados.empty:
+        st.info("Nenhum chamado para analisar.")
+        return
+    analise = calcular_analise(preparar_analise(chamados, versao), filtros, nivel, sla_horas)
+
+    st.markdown("**Tempo de resolução (horas)**")
+    st.dataframe(analise["percentis"].round(1), use_container_width=True)
+    if analise["violacoes"] is not None:
+        st.markdown(f"**Violações do SLA de {sla_horas:g} h por {NIVEIS_SLA[nivel]}**")
+        st.dataframe(analise["violacoes"].head(20).round({"percentual": 1}), use_container_width=True)
+    st.markdown("**Idade dos chamados abertos**")
+    exibir_grafico(plotar_barra, analise["idade_abertos"], espec_barra("Idade dos Chamados Abertos", ordenar=False),
+                   backend, titulo="Idade dos Chamados Abertos", figsize=(8,4), ordenar_por_valor=None)
 
 
 # Dashboard Admin
 def dashboard_admin():
     st.title("📊 Dashboard de Chamados - Admin")
-    df = ler_chamados()
-    if df.empty:
+    backend = escolher_backend()
+    conteudo_admin(backend)
+
+
+@fragmento
+def conteudo_admin(backend=None):
+    """Filtros e painéis: aplicar os filtros reexecuta só o dashboard, não o app inteiro."""
+    # Resumo das métricas: o tamanho não depende de quantos chamados existem
+    metricas, versao = ler_metricas()
+    if metricas.empty:
         st.warning("⚠️ Nenhum chamado encontrado no banco de dados.")
         return
 
-    # Aplicar filtros
+    # Codificação e agregações calculadas uma vez por leitura das métricas e filtros
+    preparado = preparar_dados(metricas, versao)
     colunas_filtro = ["regional", "status", "motivo", "lider"]
-    df_filtrado = aplicar_filtros(df, colunas_filtro)
+    filtros = aplicar_filtros(preparado, colunas_filtro, chave="admin")
+    paineis_admin(filtros, backend)
+
+
+@tempo_real.ao_vivo
+def paineis_admin(filtros, backend=None):
+    """Gráficos, tempo médio e exportação; com o tempo real ativo, redesenhados sozinhos.
+
+    Os agregados vêm memoizados por (versão das métricas, filtros): redesenhar não recalcula.
+    """
+    metricas, versao = ler_metricas()
+    preparado = preparar_dados(metricas, versao)
+    agregados = calcular_agregados(preparado, filtros)
+    contagens = agregados["contagens"]
 
     # Layout 2x2
     col1, col2 = st.columns(2)
@@ -125,49 +182,55 @@ def dashboard_admin():
 
     with col1:
         st.subheader("📌 Status")
-        st.pyplot(plotar_pizza(df_filtrado, "status"))
+        exibir_grafico(plotar_pizza, contagens["status"], espec_pizza(), backend)
 
     with col2:
         st.subheader("👔 Principais Líderes")
-        st.pyplot(plotar_barra(df_filtrado, "lider", titulo="Principais Líderes", figsize=(8,6)))
+        exibir_grafico(plotar_barra, contagens["lider"], espec_barra("Principais Líderes"), backend,
+                       top_n=10, titulo="Principais Líderes", figsize=(8,6))
 
     with col3:
         st.subheader("⚙️ Principais Motivos")
-        st.pyplot(plotar_barra(df_filtrado, "motivo", titulo="Principais Motivos", figsize=(8,6)))
+        exibir_grafico(plotar_barra, contagens["motivo"], espec_barra("Principais Motivos"), backend,
+                       top_n=10, titulo="Principais Motivos", figsize=(8,6))
 
     with col4:
         st.subheader("📊 Chamados por Regional")
-        st.pyplot(plotar_barra(df_filtrado, "regional", titulo="Chamados por Regional", figsize=(8,6)))
+        exibir_grafico(plotar_barra, contagens["regional"], espec_barra("Chamados por Regional"), backend,
+                       top_n=10, titulo="Chamados por Regional", figsize=(8,6))
 
     # Gráfico de tempo médio por motivo
     with st.expander("⏱ Tempo Médio de Suporte"):
-        fig = plotar_tempo_medio(df_filtrado)
-        if fig:
-            st.pyplot(fig)
-
-    # Exportar dados filtrados
-    if not df_filtrado.empty:
-        excel_data = exportar_chamados_para_excel(df_filtrado)
-        st.download_button(
-            label="📥 Exportar Chamados para Excel",
-            data=excel_data,
-            file_name="chamados.xlsx",
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-        )
+        exibir_tempo_medio(agregados, backend)
+
+    # Percentis e SLA calculados sobre todos os chamados (analise.py)
+    with st.expander("📈 SLA e Tempo de Resolução"):
+        exibir_analise(filtros, backend)
+
+    # Exportar dados filtrados (o arquivo só é gerado quando solicitado)
+    if agregados["total"]:
+        botao_exportacao(lambda: filtrar_chamados_por(ler_todos_chamados(), filtros), filtros, "chamados", chave="dashboard")
 
 
 # Dashboard Usuário
 def dashboard_usuario():
     st.title("📊 Status dos Chamados")
-    df = ler_chamados()
-    if df.empty:
+    conteudo_usuario()
+
+
+@fragmento
+def conteudo_usuario():
+    metricas, versao = ler_metricas()
+    if metricas.empty:
         st.warning("⚠️ Nenhum chamado encontrado no banco de dados.")
         return
 
     # Filtro apenas por status
-    df_filtrado = aplicar_filtros(df, ["status"])
+    preparado = preparar_dados(metricas, versao)
+    filtros = aplicar_filtros(preparado, ["status"], chave="usuario")
+    agregados = calcular_agregados(preparado, filtros)
 
     st.subheader("📌 Status dos Chamados")
     col1, col2, col3 = st.columns([1,2,1])
     with col2:
-        st.pyplot(plotar_pizza(df_filtrado, "status"))
+        exibir_grafico(plotar_pizza, agregados["contagens"]["status"], espec_pizza())
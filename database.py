@@ -1,86 +1,436 @@
-import os
-from datetime import datetime
+import functools
+import heapq
+from datetime import datetime, time, timedelta
 import streamlit as st
 import pandas as pd
-from supabase import create_client, Client
-from dotenv import load_dotenv
+from cache_chamados import CacheChamados, MemoriaLRU, filtrar_chamados, juntar_chamados
+from desempenho import medir
+from esquema import carregar_chamados
+import fila_escrita
+from metricas import COLUNAS_RESUMO, COLUNAS_VALOR
+from recursos import ClienteSobDemanda
+from senhas import conferir_senha, eh_hash, gerar_hash, precisa_rehash
 
-# Carregar variáveis de ambiente
-load_dotenv()  # Procura arquivo .env na raiz do projeto
+# Cliente Supabase do processo (recursos.py), criado no primeiro acesso
+supabase = ClienteSobDemanda()
 
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
+# Tamanho de página das leituras (limite padrão de linhas do PostgREST)
+TAMANHO_PAGINA = 1000
 
-if not SUPABASE_URL or not SUPABASE_KEY:
-    raise ValueError("Variáveis de ambiente SUPABASE_URL e SUPABASE_KEY não encontradas.")
+# Linhas por requisição na inserção em lote
+TAMANHO_LOTE = 500
+
+# Colunas usadas pela listagem de chamados
+COLUNAS_LISTAGEM = "id,regional,loja,lider,motivo,abertura,status"
+
+# Recortes filtrados do cache por (versão dos dados, filtros), compartilhados entre as sessões
+_visoes = MemoriaLRU(capacidade=32)
+
+
+def _buscar_paginado(montar_consulta):
+    """Executa a consulta em páginas ordenadas por id até esgotar os resultados."""
+    linhas = []
+    inicio = 0
+    while True:
+        response = montar_consulta().order("id").range(inicio, inicio + TAMANHO_PAGINA - 1).execute()
+        linhas.extend(response.data)
+        if len(response.data) < TAMANHO_PAGINA:
+            return linhas
+        inicio += TAMANHO_PAGINA
+
+
+def _buscar_todos_chamados():
+    return _buscar_paginado(lambda: supabase.table("chamados").select("*"))
+
+
+def _buscar_chamados_alterados(desde):
+    """Chamados inseridos ou alterados depois da alteração `desde` e ids removidos desde então.
+
+    O banco numera cada insert/update em `alteracao` e guarda as remoções
+    (inclusive o arquivamento) em `chamados_removidos` (schema.sql).
+    """
+    alterados = _buscar_paginado(lambda: supabase.table("chamados").select("*").gt("alteracao", desde))
+    removidos = _buscar_paginado(lambda: supabase.table("chamados_removidos").select("id").gt("alteracao", desde))
+    return alterados, [linha["id"] for linha in removidos]
+
+
+@medir()
+def ultima_alteracao():
+    """Número da última alteração de chamados no banco; muda com escritas de qualquer processo."""
+    return supabase.rpc("ultima_alteracao", {}).execute().data or 0
+
+@medir()
+@st.cache_data(ttl=5, show_spinner=False)
+def ultima_alteracao_recente():
+    """`ultima_alteracao` com até 5 s de atraso, uma consulta por processo, para quem a lê a cada rerun."""
+    return ultima_alteracao()
+
+
+@st.cache_resource
+def cache_chamados():
+    """Cache de chamados único por processo, compartilhado entre as sessões."""
+    return CacheChamados(_buscar_todos_chamados, _buscar_chamados_alterados, ultima_alteracao)
+
+
+def filtrar_consulta(consulta, status=None, inicio=None, fim=None, regional=None, loja=None, apos_id=None):
+    """Aplica os filtros da listagem a uma consulta (síncrona ou assíncrona) de chamados."""
+    if status:
+        consulta = consulta.eq("status", status)
+    if inicio:
+        consulta = consulta.gte("abertura", datetime.combine(inicio, time.min).isoformat())
+    if fim:
+        consulta = consulta.lt("abertura", datetime.combine(fim + timedelta(days=1), time.min).isoformat())
+    if regional:
+        consulta = consulta.eq("regional", regional)
+    if loja:
+        consulta = consulta.eq("loja", loja)
+    if apos_id is not None:
+        consulta = consulta.gt("id", apos_id)
+    return consulta
+
+
+def juntar_por_id(*listas):
+    """Linhas de várias tabelas, cada lista já ordenada por id, em uma única lista ordenada."""
+    return list(heapq.merge(*listas, key=lambda linha: linha["id"]))
+
+# Histórico de chamados arquivados (arquivo.py)
+
+@medir()
+@st.cache_data(ttl=60)
+def limite_historico():
+    """Abertura mais recente entre os chamados arquivados (None sem histórico)."""
+    response = (
+        supabase.table("chamados_historico").select("abertura").order("abertura", desc=True).limit(1).execute()
+    )
+    return pd.Timestamp(response.data[0]["abertura"]).tz_localize(None) if response.data else None
+
+def precisa_historico(status=None, inicio=None):
+    """Se a consulta alcança o histórico: só finalizados são arquivados, todos abertos até o limite."""
+    if status == "Aberto":
+        return False
+    limite = limite_historico()
+    return limite is not None and (inicio is None or pd.Timestamp(inicio) <= limite)
+
+@medir()
+@st.cache_resource(ttl=60, show_spinner=False)
+def ler_historico(inicio=None, fim=None):
+    """Chamados arquivados com abertura no período e a marca da leitura (como em `ler_metricas`).
+
+    O DataFrame é compartilhado entre as sessões, sem a cópia que `st.cache_data`
+    faria a cada chamada: só para leitura.
+    """
+    linhas = []
+    if precisa_historico(inicio=inicio):
+        linhas = _buscar_paginado(
+            lambda: filtrar_consulta(supabase.table("chamados_historico").select("*"), inicio=inicio, fim=fim)
+        )
+    return carregar_chamados(linhas), ("historico", inicio, fim, datetime.now().isoformat())
+
+@medir()
+def arquivar_chamados(dias):
+    """Move para o histórico os chamados finalizados há mais de `dias` dias; retorna quantos."""
+    total = supabase.rpc("arquivar_chamados", {"p_dias": int(dias)}).execute().data
+    if total:
+        limite_historico.clear()
+        ler_historico.clear()
+        # A carga completa seguinte traz só os chamados que ficaram na tabela
+        cache_chamados().invalidar(completo=True)
+    return total
 
-# Inicializar cliente Supabase
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
 
 # Funções de CRUD
 
+@medir()
 def ler_chamados():
-    response = supabase.table("chamados").select("*").execute()
-    df = pd.DataFrame(response.data)
-    return df
+    return cache_chamados().obter()
+
+@medir()
+def ler_chamados_versao(historico=False):
+    """(DataFrame de chamados, versão) sem cópia; só para leitura (análises do dashboard).
+
+    Com `historico`, inclui os chamados arquivados e a versão passa a considerar a leitura deles.
+    """
+    df, versao = cache_chamados().instantaneo()
+    if historico and limite_historico() is not None:
+        arquivados, marca = ler_historico()
+        return _visoes.obter((versao, marca), lambda: juntar_chamados(df, arquivados)), (versao, marca)
+    return df, versao
+
+@medir()
+def ler_chamados_filtrados(status=None, inicio=None, fim=None, regional=None, loja=None):
+    """Chamados do cache com os filtros da listagem, memoizados por (versão dos dados, filtros).
+
+    Inclui os arquivados quando o período alcança o histórico. O DataFrame é
+    compartilhado entre as sessões: só para leitura.
+    """
+    df, versao = cache_chamados().instantaneo()
+    filtros = (status, inicio, fim, regional, loja)
+    if not precisa_historico(status, inicio):
+        return _visoes.obter((versao, filtros), lambda: filtrar_chamados(df, *filtros))
+    arquivados, marca = ler_historico(inicio, fim)
+    return _visoes.obter((versao, marca, filtros), lambda: filtrar_chamados(juntar_chamados(df, arquivados), *filtros))
+
+@medir()
+def ler_todos_chamados():
+    """Cópia de todos os chamados, inclusive os arquivados (exportação do dashboard)."""
+    df, _ = ler_chamados_versao(historico=True)
+    return df.copy()
+
+@medir()
+def consultar_chamados(status=None, inicio=None, fim=None, regional=None, loja=None,
+                       colunas=COLUNAS_LISTAGEM, limite=None, apos_id=None):
+    """Consulta chamados com os filtros aplicados no servidor.
+
+    Sem `limite`, traz todas as linhas filtradas. Com `limite`, traz uma página
+    ordenada por id a partir de `apos_id` (paginação por chave). Retorna o
+    DataFrame e o cursor da próxima página (None quando não há mais linhas).
+    O histórico só é consultado quando o status e o período alcançam os
+    chamados arquivados.
+    """
+    def montar_consulta(tabela):
+        consulta = supabase.table(tabela).select(colunas)
+        return filtrar_consulta(consulta, status, inicio, fim, regional, loja, apos_id)
+
+    tabelas = ["chamados"] + (["chamados_historico"] if precisa_historico(status, inicio) else [])
+    if limite is None:
+        linhas = juntar_por_id(*(_buscar_paginado(functools.partial(montar_consulta, t)) for t in tabelas))
+        return carregar_chamados(linhas), None
+
+    # Uma linha a mais indica se existe próxima página
+    linhas = juntar_por_id(*(montar_consulta(t).order("id").limit(limite + 1).execute().data for t in tabelas))
+    return montar_pagina(linhas[:limite + 1], limite)
+
+def montar_pagina(linhas, limite):
+    """DataFrame da página e cursor da próxima, a partir de até `limite + 1` linhas lidas."""
+    cursor = linhas[limite - 1]["id"] if len(linhas) > limite else None
+    return carregar_chamados(linhas[:limite]), cursor
 
-def cadastrar_chamado(regional, loja, lider, motivo):
+@medir()
+def cadastrar_chamado(regional, loja, lider, motivo, chave=None):
+    """Cadastra um chamado; com `chave` (idempotência) e a fila ativa, passa pela fila de escrita.
+
+    Sem a fila, o chamado e as métricas são gravados juntos pela função
+    `cadastrar_chamados` do banco, em uma única requisição.
+    """
     # Garantir datetime naive (sem timezone)
     abertura = datetime.now().replace(tzinfo=None).isoformat()
-    supabase.table("chamados").insert({
+    chamado = {
         "regional": regional,
         "loja": loja,
         "lider": lider,
         "motivo": motivo,
         "abertura": abertura,
         "status": "Aberto"
-        }).execute()
+        }
+    if chave is not None and fila_escrita.ATIVA:
+        enfileirar("cadastrar", dict(chamado, chave=chave), chave, "✅ Chamado cadastrado!")
+        return
+    enviar_chamados([dict(chamado, chave=chave)])
     st.success("✅ Chamado cadastrado!")
 
+@medir()
+def cadastrar_chamados_em_lote(linhas, indice=None, tamanho_lote=TAMANHO_LOTE):
+    """Cadastra vários chamados com inserções de várias linhas por requisição.
+
+    `linhas` é uma lista de dicts com regional, loja, lider e motivo. Com um
+    `indice` (referencia.IndiceReferencia), cada linha é validada contra a
+    planilha antes do envio. Cada lote é gravado com as métricas pela função
+    `cadastrar_chamados` do banco, na mesma transação. Se um lote for recusado
+    pelo servidor, as linhas dele são reenviadas uma a uma para identificar as
+    que falharam.
+    Retorna (quantidade inserida, lista de (posição da linha, erro)).
+    """
+    abertura = datetime.now().replace(tzinfo=None).isoformat()
+    validas = []
+    falhas = []
+    for posicao, linha in enumerate(linhas):
+        registro = {campo: str(linha.get(campo) or "").strip() for campo in ("regional", "loja", "lider", "motivo")}
+        registro["lider"] = registro["lider"].upper()
+        registro["motivo"] = registro["motivo"].upper()
+        vazios = [campo for campo, valor in registro.items() if not valor]
+        erro = f"Campos vazios: {', '.join(vazios)}" if vazios else None
+        if erro is None and indice is not None:
+            erro = indice.validar(registro["regional"], registro["loja"], registro["lider"])
+        if erro:
+            falhas.append((posicao, erro))
+            continue
+        registro.update(abertura=abertura, status="Aberto")
+        validas.append((posicao, registro))
+
+    inseridos = []
+    for inicio in range(0, len(validas), tamanho_lote):
+        lote = validas[inicio:inicio + tamanho_lote]
+        try:
+            supabase.rpc("cadastrar_chamados", {"p_chamados": [registro for _, registro in lote]}).execute()
+            inseridos.extend(registro for _, registro in lote)
+        except Exception:
+            for posicao, registro in lote:
+                try:
+                    supabase.rpc("cadastrar_chamados", {"p_chamados": [registro]}).execute()
+                    inseridos.append(registro)
+                except Exception as e:
+                    falhas.append((posicao, str(e)))
+
+    if inseridos:
+        cadastrar_motivos({registro["motivo"] for registro in inseridos})
+        ler_metricas.clear()
+        cache_chamados().invalidar()
+    return len(inseridos), sorted(falhas)
+
+@medir()
+def finalizar_chamados(ids, observacao=None, chave=None):
+    """Finaliza vários chamados em uma única requisição.
+
+    A função `finalizar_chamados` do banco (schema.sql) grava status, fechamento,
+    observação e duração em um único UPDATE. Só altera chamados ainda abertos, então
+    cliques repetidos não reescrevem o fechamento. Retorna as linhas finalizadas.
+    Com `chave` e a fila ativa, a finalização passa pela fila de escrita.
+    """
+    ids = [int(i) for i in ids]
+    if not ids:
+        return []
+    if chave is not None and fila_escrita.ATIVA:
+        finalizacao = {"ids": ids, "observacao": observacao, "fechamento": datetime.now().isoformat()}
+        enfileirar("finalizar", finalizacao, chave, f"✅ {len(ids)} chamado(s) finalizado(s)!")
+        return []
+    response = supabase.rpc("finalizar_chamados", {
+        "p_ids": ids,
+        "p_observacao": observacao,
+        # Mesmo relógio usado na abertura (datetime naive do app)
+        "p_fechamento": datetime.now().isoformat(),
+    }).execute()
+    # As métricas já foram atualizadas pela própria função do banco
+    ler_metricas.clear()
+    cache_chamados().invalidar()
+    if response.data:
+        st.success(f"✅ {len(response.data)} chamado(s) finalizado(s)!")
+    else:
+        st.warning("⚠️ Nenhum chamado aberto encontrado para finalizar.")
+    return response.data
+
 def finalizar_chamado(chamado_id, observacao=None):
-    # Verifica se o chamado existe
-    chamado = supabase.table("chamados").select("abertura").eq("id", chamado_id).execute()
-    if not chamado.data:
-        st.error("❌ Chamado não encontrado!")
-        return
+    return finalizar_chamados([chamado_id], observacao)
+
+# Envio da fila de escrita (fila_escrita.py)
+
+def enfileirar(tipo, dados, chave, mensagem):
+    """Grava a operação na fila e espera o envio só por `fila_escrita.ESPERA_TELA`."""
+    fila = fila_escrita.fila()
+    if not fila.enfileirar(tipo, dados, chave):
+        st.info("ℹ️ Esta operação já foi recebida e está sendo enviada.")
+    elif fila.aguardar(chave):
+        st.success(mensagem)
+    else:
+        st.success("✅ Registrado! O envio ao servidor será concluído em segundo plano.")
+
+@medir()
+def enviar_chamados(chamados):
+    """Cadastra chamados em uma única requisição, com as métricas na mesma transação.
+
+    A função `cadastrar_chamados` do banco ignora chaves de idempotência já
+    gravadas (sem chave, sempre insere). Retorna as linhas inseridas (id e chave).
+    """
+    response = supabase.rpc("cadastrar_chamados", {"p_chamados": chamados}).execute()
+    if response.data:
+        ler_metricas.clear()
+        cache_chamados().invalidar()
+    return response.data
+
+@medir()
+def enviar_finalizacoes(finalizacoes):
+    """Finalizações da fila; cada uma com ids, observacao e fechamento (hora do clique).
+
+    Reenviar uma finalização não altera nada: só chamados abertos são finalizados.
+    """
+    finalizados = []
+    for finalizacao in finalizacoes:
+        finalizados.extend(supabase.rpc("finalizar_chamados", {
+            "p_ids": [int(i) for i in finalizacao["ids"]],
+            "p_observacao": finalizacao.get("observacao"),
+            "p_fechamento": finalizacao["fechamento"],
+        }).execute().data)
+    ler_metricas.clear()
+    # O `fechamento` pode ser bem anterior ao envio; a leitura incremental não
+    # depende dele, e sim da `alteracao` que o servidor numera na atualização
+    cache_chamados().invalidar()
+    return finalizados
 
-    # Atualiza status, fechamento e observação
-    agora = datetime.now().isoformat()
-    supabase.table("chamados").update({
-        "status": "Finalizado",
-        "fechamento": agora,
-        "observacao": observacao
-    }).eq("id", chamado_id).execute()
-
-    st.success(f"✅ Chamado {chamado_id} finalizado!")
-
-    # Converte string ISO 8601 para datetime
-    abertura = datetime.fromisoformat(chamado.data[0]["abertura"])
-    # Remover timezone caso exista
-    if abertura.tzinfo is not None:
-        abertura = abertura.replace(tzinfo=None)
-
-    agora = datetime.now()  # datetime naive
-    fechamento = agora.isoformat()
-    duracao = str(agora - abertura).split(".")[0]
-
-    supabase.table("chamados").update({
-        "fechamento": fechamento,
-        "duracao": duracao,
-        "status": "Finalizado"
-    }).eq("id", chamado_id).execute()
-    st.success(f"✅ Chamado {chamado_id} finalizado!")
+# Métricas agregadas (metricas.py)
 
+@medir()
+@st.cache_data(ttl=60)
+def ler_metricas(inicio=None, fim=None):
+    """Resumo das métricas por (regional, lider, motivo, status) e a marca da leitura.
+
+    O servidor soma as métricas diárias em uma única resposta; a marca identifica
+    a leitura para memoizar as agregações do dashboard.
+    """
+    response = supabase.rpc("resumir_metricas", {
+        "p_inicio": inicio.isoformat() if inicio else None,
+        "p_fim": fim.isoformat() if fim else None,
+    }).execute()
+    df = pd.DataFrame(response.data or [], columns=COLUNAS_RESUMO + COLUNAS_VALOR)
+    return df, ("metricas", inicio, fim, datetime.now().isoformat())
+
+@medir()
+def reconstruir_metricas():
+    """Recalcula as métricas a partir de todos os chamados; retorna o número de linhas."""
+    total = supabase.rpc("reconstruir_metricas", {}).execute().data
+    ler_metricas.clear()
+    return total
+
+# Catálogo de motivos
+
+@medir()
+@st.cache_data(ttl=600)
+def listar_motivos():
+    """Motivos do catálogo, em maiúsculas e sem repetição."""
+    response = supabase.table("motivos").select("motivo").order("motivo").execute()
+    return list(dict.fromkeys(m["motivo"].strip().upper() for m in response.data if m.get("motivo")))
+
+@medir()
+def cadastrar_motivos(motivos):
+    """Adiciona ao catálogo os motivos que ainda não existem e invalida a lista em cache."""
+    motivos = sorted({m.strip().upper() for m in motivos if m and m.strip()})
+    if motivos:
+        supabase.table("motivos").upsert(
+            [{"motivo": m} for m in motivos], on_conflict="motivo", ignore_duplicates=True
+        ).execute()
+        listar_motivos.clear()
+    return motivos
+
+def cadastrar_motivo(motivo):
+    return cadastrar_motivos([motivo])[0]
+
+# Usuários
+
+# Criados uma vez por processo se ainda não existirem: (usuário, senha, papel)
+USUARIOS_PADRAO = [
+    ("admin", "admin123", "admin"),
+    ("user", "user", "usuario"),
+]
+
+@medir()
 def verificar_usuario(usuario, senha):
-    result = supabase.table("usuarios").select("papel").eq("usuario", usuario).eq("senha", senha).execute()
-    if result.data:
-        return result.data[0]["papel"]
-    return None
+    """Papel do usuário se a senha confere; None caso contrário.
+
+    A senha não vai para o filtro da consulta: o hash bcrypt é conferido no
+    app. Senhas legadas em texto puro (ou com custo diferente de BCRYPT_ROUNDS)
+    são regravadas com o hash atual.
+    """
+    result = supabase.table("usuarios").select("id,senha,papel").eq("usuario", usuario).execute()
+    registro = result.data[0] if result.data else None
+    armazenada = registro["senha"] if registro else None
+    if not conferir_senha(senha, armazenada):
+        return None
+    if precisa_rehash(armazenada):
+        supabase.table("usuarios").update({"senha": gerar_hash(senha)}).eq("id", registro["id"]).execute()
+    return registro["papel"]
 
 def cadastrar_usuario(usuario, senha, papel="usuario"):
     supabase.table("usuarios").insert({
         "usuario": usuario,
-        "senha": senha,
+        "senha": gerar_hash(senha),
         "papel": papel
     }).execute()
 
@@ -88,15 +438,41 @@ def cadastrar_usuario_se_nao_existir(usuario, senha, papel="usuario"):
     resultado = supabase.table("usuarios").select("id").eq("usuario", usuario).execute()
     if resultado.data:
         return False  # Usuário já existe
-    supabase.table("usuarios").insert({
-        "usuario": usuario,
-        "senha": senha,
-        "papel": papel
-    }).execute()
+    cadastrar_usuario(usuario, senha, papel)
     return True
 
+@st.cache_resource
+def inicializar_usuarios():
+    """Cria os usuários padrão que faltam, uma vez por processo e com uma única consulta."""
+    usuarios = [usuario for usuario, _, _ in USUARIOS_PADRAO]
+    existentes = {
+        u["usuario"] for u in supabase.table("usuarios").select("usuario").in_("usuario", usuarios).execute().data
+    }
+    novos = [
+        {"usuario": usuario, "senha": gerar_hash(senha), "papel": papel}
+        for usuario, senha, papel in USUARIOS_PADRAO if usuario not in existentes
+    ]
+    if novos:
+        supabase.table("usuarios").insert(novos).execute()
+    return [u["usuario"] for u in novos]
+
+def migrar_senhas():
+    """Troca por hash bcrypt todas as senhas ainda gravadas em texto puro."""
+    usuarios = _buscar_paginado(lambda: supabase.table("usuarios").select("id,senha"))
+    migrados = 0
+    for usuario in usuarios:
+        if usuario.get("senha") and not eh_hash(usuario["senha"]):
+            supabase.table("usuarios").update({"senha": gerar_hash(usuario["senha"])}).eq("id", usuario["id"]).execute()
+            migrados += 1
+    return migrados
+
 def zerar_banco(confirmar=False):
     if confirmar:
         supabase.table("chamados").delete().neq("id", 0).execute()
+        supabase.table("chamados_historico").delete().neq("id", 0).execute()
+        limite_historico.clear()
+        ler_historico.clear()
+        reconstruir_metricas()
+        cache_chamados().invalidar(completo=True)
 #       supabase.table("usuarios").delete().neq("id", 0).execute()
         st.success("✅ Banco de dados zerado com sucesso!")
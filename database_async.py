@@ -0,0 +1,133 @@
+"""Acesso assíncrono ao Supabase para consultas independentes em paralelo.
+
+Um laço de eventos roda em uma thread própria do processo, com um único
+cliente assíncrono (e seu pool de conexões HTTP) reaproveitado por todas as
+sessões. O script do Streamlit continua síncrono: agenda corrotinas com
+`agendar` e segue montando a tela; a lista de chamados busca a página assim
+enquanto o formulário (índice de referência e catálogo de motivos) é montado.
+"""
+import asyncio
+import random
+import threading
+import httpx
+from realtime import RealtimeSubscribeStates
+from supabase import AsyncClientOptions, acreate_client
+
+from database import COLUNAS_LISTAGEM, filtrar_consulta, juntar_por_id, montar_pagina
+import recursos
+
+
+# Limite de cada tentativa, número de tentativas e espera base entre elas (segundos)
+TIMEOUT = 10.0
+TENTATIVAS = 3
+ESPERA_BASE = 0.2
+
+# Conexões HTTP mantidas abertas e reaproveitadas
+LIMITES_CONEXAO = httpx.Limits(max_connections=20, max_keepalive_connections=10)
+
+_loop = None
+_cliente = None
+_lock = threading.Lock()
+
+
+def _obter_loop():
+    global _loop
+    with _lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="supabase-async", daemon=True).start()
+        return _loop
+
+
+async def _obter_cliente():
+    global _cliente
+    if _cliente is None and recursos.BACKEND != "supabase":
+        # Banco embutido: o cliente síncrono do processo roda nas threads do executor
+        _cliente = recursos.cliente_banco()
+    if _cliente is None:
+        opcoes = AsyncClientOptions(httpx_client=httpx.AsyncClient(limits=LIMITES_CONEXAO, timeout=TIMEOUT, http2=True))
+        _cliente = await acreate_client(*recursos.credenciais_supabase(), options=opcoes)
+    return _cliente
+
+
+def definir_cliente(cliente):
+    """Troca o cliente usado (ex.: supabase_local.ClienteLocal em benchmarks)."""
+    global _cliente
+    _cliente = cliente
+
+
+async def executar(montar_consulta, timeout=TIMEOUT, tentativas=TENTATIVAS):
+    """Executa `montar_consulta(cliente)` com timeout e novas tentativas com backoff exponencial.
+
+    Só falhas de rede e timeouts são repetidas; erros devolvidos pela API sobem direto.
+    """
+    cliente = await _obter_cliente()
+    for tentativa in range(tentativas):
+        consulta = montar_consulta(cliente)
+        try:
+            if asyncio.iscoroutinefunction(consulta.execute):
+                return await asyncio.wait_for(consulta.execute(), timeout)
+            # Clientes síncronos (como o local) rodam em uma thread para não travar o laço
+            return await asyncio.wait_for(asyncio.get_running_loop().run_in_executor(None, consulta.execute), timeout)
+        except (asyncio.TimeoutError, httpx.TransportError):
+            if tentativa == tentativas - 1:
+                raise
+            await asyncio.sleep(ESPERA_BASE * 2 ** tentativa * (1 + random.random()))
+
+
+def agendar(corrotina):
+    """Começa a executar a corrotina em segundo plano e devolve um Future (`.result()` espera)."""
+    return asyncio.run_coroutine_threadsafe(corrotina, _obter_loop())
+
+
+async def assinar_alteracoes(tabela, callback, timeout=TIMEOUT, ao_mudar_estado=None):
+    """Assina INSERT/UPDATE/DELETE da tabela no Supabase Realtime.
+
+    `callback(payload)` é chamado na thread do laço de eventos a cada alteração.
+    Depois da confirmação, `ao_mudar_estado(estado)` recebe os estados seguintes
+    do canal ("SUBSCRIBED" de novo a cada reconexão, "CHANNEL_ERROR", "TIMED_OUT").
+    Retorna o canal depois que o servidor confirma a assinatura.
+    """
+    cliente = await _obter_cliente()
+    confirmado = asyncio.get_running_loop().create_future()
+
+    def ao_mudar_estado_canal(estado, erro):
+        if confirmado.done():
+            if ao_mudar_estado:
+                ao_mudar_estado(str(getattr(estado, "value", estado)))
+            return
+        if estado == RealtimeSubscribeStates.SUBSCRIBED:
+            confirmado.set_result(True)
+        else:
+            confirmado.set_exception(erro or RuntimeError(f"Assinatura de {tabela}: {estado}"))
+
+    canal = cliente.channel(f"alteracoes-{tabela}")
+    canal.on_postgres_changes("*", callback=callback, table=tabela, schema="public")
+    await canal.subscribe(ao_mudar_estado_canal)
+    await asyncio.wait_for(confirmado, timeout)
+    return canal
+
+
+def canal_ativo(canal):
+    """Se o canal segue inscrito e o socket conectado; quedas não passam por `ao_mudar_estado`."""
+    return canal.is_joined and canal.socket.is_connected
+
+
+# Consultas
+async def consultar_chamados_async(status=None, inicio=None, fim=None, regional=None, loja=None,
+                                   colunas=COLUNAS_LISTAGEM, limite=50, apos_id=None, historico=False):
+    """Versão assíncrona de `database.consultar_chamados` para uma página de chamados.
+
+    Com `historico` (ver `database.precisa_historico`), a página do histórico é
+    buscada ao mesmo tempo e as duas são combinadas por id.
+    """
+    def consulta(tabela):
+        return executar(
+            lambda cliente: filtrar_consulta(
+                cliente.table(tabela).select(colunas), status, inicio, fim, regional, loja, apos_id
+            ).order("id").limit(limite + 1)
+        )
+
+    tabelas = ["chamados"] + (["chamados_historico"] if historico else [])
+    respostas = await asyncio.gather(*(consulta(t) for t in tabelas))
+    return montar_pagina(juntar_por_id(*(r.data for r in respostas))[:limite + 1], limite)
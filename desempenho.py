@@ -0,0 +1,220 @@
+"""Medição de desempenho por rerun do Streamlit.
+
+`medir` envolve uma função e registra a duração, as linhas e o tamanho em bytes
+do resultado (em DataFrames, o das colunas, sem o conteúdo dos textos). Os registros ficam na thread do script (um rerun por vez em cada
+thread) e somados em totais do processo. O painel "Desempenho" do admin mostra
+o rerun atual e exporta os registros em JSON lines e os totais no formato
+texto do Prometheus. Com DESEMPENHO_ARQUIVO definido, cada rerun também é
+anexado a esse arquivo JSONL.
+
+Fragmentos (`fragmento`) reexecutam sem passar pelo topo do script: cada
+reexecução isolada vira um rerun próprio, com o nome do fragmento.
+"""
+import functools
+import json
+import os
+import threading
+import time
+import uuid
+import weakref
+from collections import deque
+
+
+ARQUIVO = os.getenv("DESEMPENHO_ARQUIVO")
+
+# Reruns recentes do processo (para exportação)
+historico = deque(maxlen=200)
+
+# Totais do processo por nome: [chamadas, segundos, linhas, bytes]
+_totais = {}
+# (referência fraca, (linhas, bytes)) por id dos DataFrames já medidos: os
+# compartilhados (cache, memos) são devolvidos muitas vezes sem mudar
+_tamanhos = {}
+_local = threading.local()
+_lock = threading.Lock()
+
+
+def _tamanho_tabela(alvo):
+    """(linhas, bytes) de DataFrame/Series, sem o conteúdo dos textos; memoizado pelo objeto."""
+    memo = _tamanhos.get(id(alvo))
+    if memo is not None and memo[0]() is alvo:
+        return memo[1]
+    # `deep=True` percorreria cada texto: dezenas de ms por chamada em 200 mil chamados
+    uso = alvo.memory_usage(index=False, deep=False)
+    tamanho = len(alvo), int(uso.sum() if hasattr(uso, "sum") else uso)
+    chave = id(alvo)
+    _tamanhos[chave] = (weakref.ref(alvo, lambda _: _tamanhos.pop(chave, None)), tamanho)
+    return tamanho
+
+
+def _tamanho(resultado):
+    """(linhas, bytes) do resultado; em DataFrames, os bytes não incluem o conteúdo dos textos."""
+    alvo = resultado[0] if isinstance(resultado, tuple) and resultado else resultado
+    if isinstance(alvo, (bytes, bytearray)):
+        return None, len(alvo)
+    if isinstance(alvo, str):
+        return None, len(alvo)
+    if hasattr(alvo, "memory_usage"):
+        return _tamanho_tabela(alvo)
+    if hasattr(alvo, "shape"):
+        return (alvo.shape[0] if alvo.shape else None), getattr(alvo, "nbytes", None)
+    if isinstance(alvo, (list, dict)):
+        return len(alvo), None
+    if isinstance(alvo, int) and not isinstance(alvo, bool):
+        return alvo, None
+    return None, None
+
+
+def registrar(nome, segundos, linhas=None, tamanho=None):
+    registros = getattr(_local, "registros", None)
+    if registros is not None:
+        registros.append((nome, segundos, linhas, tamanho))
+    with _lock:
+        total = _totais.get(nome)
+        if total is None:
+            total = _totais[nome] = [0, 0.0, 0, 0]
+        total[0] += 1
+        total[1] += segundos
+        total[2] += linhas or 0
+        total[3] += tamanho or 0
+
+
+def medir(nome=None):
+    """Decorador: registra duração, linhas e bytes de cada chamada da função."""
+    def decorador(funcao):
+        rotulo = nome or f"{funcao.__module__}.{funcao.__qualname__}"
+
+        @functools.wraps(funcao)
+        def envolvida(*args, **kwargs):
+            inicio = time.perf_counter()
+            resultado = funcao(*args, **kwargs)
+            registrar(rotulo, time.perf_counter() - inicio, *_tamanho(resultado))
+            return resultado
+
+        # Mantém o `.clear()` das funções com st.cache_data/st.cache_resource
+        if hasattr(funcao, "clear"):
+            envolvida.clear = funcao.clear
+        return envolvida
+    return decorador
+
+
+def iniciar_rerun(sessao=None, fragmento=None):
+    """Começa a coletar os registros do rerun atual (chamado no topo do script)."""
+    _local.registros = []
+    _local.inicio = time.perf_counter()
+    _local.rerun = {
+        "rerun": uuid.uuid4().hex[:12], "sessao": sessao, "fragmento": fragmento, "horario": time.time(),
+    }
+
+
+def registros_rerun():
+    """Registros do rerun atual: lista de dicts com nome, ms, linhas e bytes."""
+    return [
+        {"nome": nome, "ms": round(segundos * 1000, 3), "linhas": linhas, "bytes": tamanho}
+        for nome, segundos, linhas, tamanho in getattr(_local, "registros", None) or []
+    ]
+
+
+def finalizar_rerun():
+    """Fecha o rerun atual, guardando-o no histórico (e no arquivo, se configurado)."""
+    if getattr(_local, "registros", None) is None:
+        return None
+    rerun = dict(
+        _local.rerun,
+        total_ms=round((time.perf_counter() - _local.inicio) * 1000, 3),
+        medicoes=registros_rerun(),
+    )
+    _local.registros = None
+    historico.append(rerun)
+    if ARQUIVO:
+        with _lock, open(ARQUIVO, "a", encoding="utf-8") as arquivo:
+            arquivo.write(json.dumps(rerun, ensure_ascii=False) + "\n")
+    return rerun
+
+
+def fragmento(funcao=None, *, run_every=None):
+    """`st.fragment` medido: quando só o fragmento reexecuta, seus registros formam um rerun próprio."""
+    import streamlit as st
+
+    if funcao is None:
+        return functools.partial(fragmento, run_every=run_every)
+    rotulo = f"{funcao.__module__}.{funcao.__qualname__}"
+
+    @functools.wraps(funcao)
+    def medida(*args, **kwargs):
+        if getattr(_local, "registros", None) is not None:
+            # Parte de um rerun já medido (o script inteiro ou um fragmento externo)
+            return funcao(*args, **kwargs)
+        iniciar_rerun(st.session_state.get("sessao_id"), fragmento=rotulo)
+        try:
+            return funcao(*args, **kwargs)
+        finally:
+            finalizar_rerun()
+
+    return st.fragment(medida, run_every=run_every)
+
+
+def exportar_jsonl(reruns=None):
+    """Reruns (padrão: histórico do processo) em JSON lines."""
+    return "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in (historico if reruns is None else reruns))
+
+
+def exportar_prometheus():
+    """Totais do processo no formato texto do Prometheus."""
+    with _lock:
+        totais = {nome: list(valores) for nome, valores in _totais.items()}
+    metricas = [
+        ("chamados_operacao_chamadas_total", "counter", "Chamadas por operação", 0),
+        ("chamados_operacao_segundos_total", "counter", "Tempo gasto por operação", 1),
+        ("chamados_operacao_linhas_total", "counter", "Linhas devolvidas por operação", 2),
+        ("chamados_operacao_bytes_total", "counter", "Bytes devolvidos por operação", 3),
+    ]
+    linhas = []
+    for metrica, tipo, descricao, posicao in metricas:
+        linhas.append(f"# HELP {metrica} {descricao}")
+        linhas.append(f"# TYPE {metrica} {tipo}")
+        for nome, valores in sorted(totais.items()):
+            linhas.append(f'{metrica}{{operacao="{nome}"}} {valores[posicao]:g}')
+    return "\n".join(linhas) + "\n"
+
+
+def limpar():
+    with _lock:
+        _totais.clear()
+    historico.clear()
+
+
+def painel_desempenho():
+    """Painel "Desempenho" na barra lateral (admin): medições do rerun atual e exportação."""
+    import pandas as pd
+    import streamlit as st
+
+    with st.sidebar.expander("⏱ Desempenho"):
+        # Interações dentro de fragmentos não redesenham este painel: elas aparecem
+        # como reruns próprios aqui no próximo rerun completo e na exportação
+        sessao = st.session_state.get("sessao_id")
+        fragmentos = [r for r in list(historico) if r.get("fragmento") and r["sessao"] == sessao][-5:]
+        if fragmentos:
+            st.write("Últimos reruns de fragmentos:")
+            st.dataframe(
+                pd.DataFrame(fragmentos, columns=["fragmento", "total_ms"]), hide_index=True, use_container_width=True
+            )
+        medicoes = pd.DataFrame(registros_rerun(), columns=["nome", "ms", "linhas", "bytes"])
+        if medicoes.empty:
+            st.write("Nenhuma medição neste rerun.")
+        else:
+            resumo = medicoes.groupby("nome", sort=False).agg(
+                chamadas=("ms", "size"), ms=("ms", "sum"), linhas=("linhas", "sum"), bytes=("bytes", "sum")
+            ).sort_values("ms", ascending=False)
+            inicio = getattr(_local, "inicio", None)
+            if inicio is not None:
+                st.write(f"Rerun até aqui: {(time.perf_counter() - inicio) * 1000:.0f} ms")
+            st.dataframe(resumo, use_container_width=True)
+        st.download_button(
+            "Reruns (JSONL)", exportar_jsonl(), file_name="desempenho.jsonl", mime="application/x-ndjson",
+            key="desempenho_jsonl",
+        )
+        st.download_button(
+            "Totais (Prometheus)", exportar_prometheus(), file_name="desempenho.prom", mime="text/plain",
+            key="desempenho_prometheus",
+        )
@@ -0,0 +1,118 @@
+"""Tipos dos chamados em memória.
+
+`tipar_chamados` é o único ponto em que as linhas lidas do banco (JSON) viram
+colunas tipadas; cache, listagem, histórico e tempo real passam por ele:
+
+- regional, loja, lider, motivo e status viram `category`: cada texto é
+  guardado uma vez e cada linha ocupa um código de 1 ou 2 bytes;
+- abertura e fechamento viram datetime64 sem timezone, uma única vez;
+- o texto `duracao` dá lugar a `duracao_s`, segundos inteiros (Int32), e
+  volta a ser texto só na exportação (`formatar_duracao`);
+- id usa o menor inteiro que comporta os valores.
+
+Sem linhas, `carregar_chamados` devolve as colunas de `TIPOS_CHAMADOS` vazias,
+para que filtros e seleções de colunas funcionem igual num resultado vazio.
+
+`pd.concat` de colunas categóricas com categorias diferentes devolve `object`;
+`concatenar` une as categorias antes, para o cache continuar compacto a cada
+atualização incremental.
+"""
+import numpy as np
+import pandas as pd
+
+
+COLUNAS_CATEGORIA = ["regional", "loja", "lider", "motivo", "status"]
+COLUNAS_DATA = ["abertura", "fechamento"]
+
+# Colunas dos chamados em memória, já tipadas (ver `tipar_chamados`)
+TIPOS_CHAMADOS = {
+    "id": np.int32,
+    "regional": "category",
+    "loja": "category",
+    "lider": "category",
+    "motivo": "category",
+    "abertura": "datetime64[ns]",
+    "fechamento": "datetime64[ns]",
+    "status": "category",
+    "observacao": object,
+    "chave": object,
+    "alteracao": np.int64,
+    "duracao_s": "Int32",
+}
+
+
+def tipar_chamados(df):
+    """Aplica os tipos compactos às colunas presentes em `df` (linhas vindas do banco)."""
+    if df.empty:
+        return df
+    if "id" in df.columns:
+        ids = pd.to_numeric(df["id"], errors="coerce")
+        if ids.isna().any():
+            df["id"] = ids.astype("Int64")
+        else:
+            df["id"] = ids.astype(np.int32 if ids.max() < 2 ** 31 else np.int64)
+    for col in COLUNAS_DATA:
+        if col in df.columns and not pd.api.types.is_datetime64_dtype(df[col]):
+            df[col] = pd.to_datetime(df[col], errors="coerce", format="ISO8601")
+            if getattr(df[col].dt, "tz", None) is not None:
+                df[col] = df[col].dt.tz_localize(None)
+    if "abertura" in df.columns and "fechamento" in df.columns:
+        # Mesmo arredondamento do texto gravado pelo banco (segundos inteiros, para baixo)
+        segundos = np.floor((df["fechamento"] - df["abertura"]).dt.total_seconds())
+        df["duracao_s"] = segundos.astype("Int32")
+        df = df.drop(columns="duracao", errors="ignore")
+    for col in COLUNAS_CATEGORIA:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype("category")
+    return df
+
+
+def carregar_chamados(linhas):
+    """DataFrame tipado a partir das linhas (dicts) devolvidas pelo banco."""
+    if not linhas:
+        return pd.DataFrame({col: pd.Series(dtype=tipo) for col, tipo in TIPOS_CHAMADOS.items()})
+    return tipar_chamados(pd.DataFrame(linhas))
+
+
+def codificar(serie):
+    """Códigos inteiros (-1 para vazio) e categorias; colunas categóricas já trazem os dois."""
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        return serie.cat.codes.to_numpy(), serie.cat.categories
+    return pd.factorize(serie)
+
+
+def concatenar(dfs):
+    """`pd.concat` (índice novo) mantendo as colunas categóricas, com as categorias unidas."""
+    dfs = list(dfs)
+    for col in COLUNAS_CATEGORIA:
+        tipos = [df[col].dtype for df in dfs if col in df.columns]
+        if len(tipos) < 2 or not all(isinstance(tipo, pd.CategoricalDtype) for tipo in tipos):
+            continue
+        categorias = tipos[0].categories
+        for tipo in tipos[1:]:
+            categorias = categorias.append(tipo.categories.difference(categorias))
+        for posicao, df in enumerate(dfs):
+            if col in df.columns and not df[col].cat.categories.equals(categorias):
+                df = df.copy(deep=False)
+                df[col] = df[col].cat.set_categories(categorias)
+                dfs[posicao] = df
+    return pd.concat(dfs, ignore_index=True)
+
+
+def formatar_duracao(segundos):
+    """Texto da duração como str(timedelta) ("1 day, 2:03:04"), o mesmo da coluna do banco."""
+    validos = segundos.dropna().astype(np.int64)
+    dias, resto = np.divmod(validos, 86400)
+    horas, resto = np.divmod(resto, 3600)
+    minutos, segs = np.divmod(resto, 60)
+    texto = horas.astype(str) + ":" + minutos.astype(str).str.zfill(2) + ":" + segs.astype(str).str.zfill(2)
+    com_dias = dias != 0
+    texto[com_dias] = (
+        dias[com_dias].astype(str) + np.where(dias[com_dias].abs() == 1, " day, ", " days, ") + texto[com_dias]
+    )
+    return texto.reindex(segundos.index)
+
+
+def memoria_mb(df):
+    """Memória ocupada pelo DataFrame, contando o conteúdo dos textos (MB)."""
+    return df.memory_usage(deep=True).sum() / 2 ** 20
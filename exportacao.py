@@ -0,0 +1,113 @@
+import streamlit as st
+import pandas as pd
+import xlsxwriter
+from io import BytesIO
+from database import ultima_alteracao_recente
+from desempenho import fragmento, medir
+from esquema import formatar_duracao
+
+
+COLUNAS_EXPORTACAO = ["id", "regional", "loja", "lider", "motivo", "abertura", "fechamento", "duracao", "status", "observacao"]
+
+# Linhas convertidas por vez ao gravar o Excel
+TAMANHO_BLOCO = 10_000
+
+
+def preparar_exportacao(df):
+    """Seleciona as colunas exportadas, com datas em datetime sem timezone.
+
+    A duração volta ao texto gravado no banco a partir de `duracao_s` (esquema.py).
+    """
+    colunas = [
+        c for c in COLUNAS_EXPORTACAO if c in df.columns or (c == "duracao" and "duracao_s" in df.columns)
+    ] or list(df.columns)
+    df_export = df[[c for c in colunas if c in df.columns]].copy()
+    if "duracao" in colunas and "duracao" not in df_export.columns:
+        df_export.insert(colunas.index("duracao"), "duracao", formatar_duracao(df["duracao_s"]))
+    for col in ["abertura", "fechamento"]:
+        if col in df_export.columns and not pd.api.types.is_datetime64_dtype(df_export[col]):
+            df_export[col] = pd.to_datetime(df_export[col], errors="coerce")
+            if df_export[col].dt.tz is not None:
+                df_export[col] = df_export[col].dt.tz_localize(None)
+    return df_export
+
+
+@medir()
+def gerar_excel(df, tamanho_bloco=TAMANHO_BLOCO):
+    """Gera o xlsx em modo constant_memory do xlsxwriter, convertendo um bloco de linhas por vez."""
+    df = preparar_exportacao(df)
+    output = BytesIO()
+    workbook = xlsxwriter.Workbook(output, {"constant_memory": True})
+    worksheet = workbook.add_worksheet("chamados")
+    formato_data = workbook.add_format({"num_format": "yyyy-mm-dd hh:mm:ss"})
+    for posicao, col in enumerate(df.columns):
+        if pd.api.types.is_datetime64_any_dtype(df[col]):
+            worksheet.set_column(posicao, posicao, 20, formato_data)
+
+    worksheet.write_row(0, 0, list(df.columns))
+    linha = 1
+    for inicio in range(0, len(df), tamanho_bloco):
+        # NaN/NaT viram células vazias
+        bloco = df.iloc[inicio:inicio + tamanho_bloco].astype(object)
+        bloco = bloco.where(bloco.notna(), None)
+        for valores in bloco.itertuples(index=False, name=None):
+            worksheet.write_row(linha, 0, valores)
+            linha += 1
+    workbook.close()
+    return output.getvalue()
+
+
+@medir()
+def gerar_csv(df):
+    # BOM para o Excel reconhecer UTF-8
+    return preparar_exportacao(df).to_csv(index=False, chunksize=TAMANHO_BLOCO).encode("utf-8-sig")
+
+
+@medir()
+def gerar_parquet(df):
+    output = BytesIO()
+    preparar_exportacao(df).to_parquet(output, index=False)
+    return output.getvalue()
+
+
+# Formato: (gerador, extensão, mime)
+FORMATOS = {
+    "Excel": (gerar_excel, "xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "CSV": (gerar_csv, "csv", "text/csv"),
+    "Parquet": (gerar_parquet, "parquet", "application/octet-stream"),
+}
+
+
+@st.cache_data(max_entries=8, ttl=300, show_spinner="Gerando arquivo...")
+def _exportar(formato, filtros, versao, _obter_df):
+    # `_obter_df` fica fora da chave do cache: o resultado depende só de formato, filtros e versão
+    return FORMATOS[formato][0](_obter_df())
+
+
+@fragmento
+def botao_exportacao(obter_df, filtros, nome_arquivo, chave):
+    """Exportação sob demanda: o arquivo só é gerado quando o usuário pede.
+
+    `obter_df` devolve os dados a exportar e `filtros` (tupla) identifica o
+    recorte, junto com a última alteração dos chamados no banco (lida no máximo
+    a cada 5 s por processo), para reaproveitar arquivos já gerados: escritas de
+    outros processos também geram um arquivo novo, e atualizações do cache sem
+    escritas não.
+    É um fragmento: escolher o formato e preparar o arquivo não redesenham a página.
+    """
+    col_formato, col_botao = st.columns([1, 1])
+    formato = col_formato.selectbox("Formato", list(FORMATOS), key=f"formato_{chave}")
+    assinatura = (formato, filtros, ultima_alteracao_recente())
+
+    if col_botao.button("📦 Preparar exportação", key=f"preparar_{chave}"):
+        st.session_state[f"exportacao_{chave}"] = assinatura
+
+    if st.session_state.get(f"exportacao_{chave}") == assinatura:
+        _, extensao, mime = FORMATOS[formato]
+        st.download_button(
+            label=f"📥 Baixar Chamados ({formato})",
+            data=_exportar(*assinatura, _obter_df=obter_df),
+            file_name=f"{nome_arquivo}.{extensao}",
+            mime=mime,
+            key=f"baixar_{chave}",
+        )
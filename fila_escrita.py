@@ -0,0 +1,238 @@
+"""Fila local de escritas (SQLite) para cadastro e finalização de chamados.
+
+Cada cadastro ou finalização é gravado primeiro em um arquivo SQLite, com uma
+chave de idempotência gerada no app, e a tela segue sem esperar o Supabase.
+Uma thread envia as operações pendentes em lotes; se o envio falhar, elas
+ficam na fila e são reenviadas com espera crescente. Enfileirar de novo a
+mesma chave não faz nada, e o banco ignora chaves já gravadas (schema.sql),
+então cliques repetidos e reenvios não duplicam chamados.
+
+A fila é opcional: só com FILA_ESCRITA=1 as escritas passam por ela; sem a
+variável, cadastros e finalizações vão direto ao Supabase. Ativa, ela cria o
+arquivo FILA_ESCRITA_ARQUIVO (padrão fila_escrita.db, no diretório em que o app
+roda) e um clique pode esperar até ESPERA_TELA segundos pelo envio antes de
+seguir com a operação pendente.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+import httpx
+import streamlit as st
+from desempenho import registrar
+
+
+ATIVA = os.getenv("FILA_ESCRITA", "0") == "1"
+ARQUIVO = os.getenv("FILA_ESCRITA_ARQUIVO", "fila_escrita.db")
+
+# Operações enviadas por requisição
+TAMANHO_LOTE = 200
+
+# Espera (segundos) entre verificações da fila sem operações novas
+INTERVALO = 1.0
+
+# Espera entre tentativas: BASE * 2^tentativas, até o MÁXIMO (segundos)
+ESPERA_BASE = 0.5
+ESPERA_MAXIMA = 60.0
+
+# Depois de tantas falhas a operação fica parada na fila, para conferência
+MAX_TENTATIVAS = 20
+
+# Quanto a tela espera pelo envio antes de seguir com a operação na fila
+ESPERA_TELA = 2.0
+
+
+def falha_de_rede(erro):
+    return isinstance(erro, (OSError, httpx.TransportError))
+
+
+class FilaEscrita:
+    """Fila durável de operações enviadas por uma thread em segundo plano.
+
+    `enviar` associa cada tipo de operação a uma função que recebe a lista de
+    dados de um lote e os grava no servidor (levanta exceção em caso de falha).
+    """
+
+    def __init__(self, arquivo, enviar, iniciar=True):
+        self.enviar = enviar
+        self.enviadas = 0
+        self.falhas = 0
+        self.ultimo_erro = None
+        # Segundos entre enfileirar e confirmar o envio, das operações recentes
+        self.latencias = deque(maxlen=1000)
+        self._lock = threading.Lock()
+        self._acordar = threading.Event()
+        self._conexao = sqlite3.connect(arquivo, check_same_thread=False)
+        self._conexao.execute("pragma journal_mode=wal")
+        self._conexao.execute("pragma synchronous=full")
+        self._conexao.execute("""
+            create table if not exists operacoes (
+                chave text primary key,
+                tipo text not null,
+                dados text not null,
+                criado_em real not null,
+                tentativas integer not null default 0,
+                proxima_tentativa real not null default 0,
+                erro text
+            )
+        """)
+        if iniciar:
+            threading.Thread(target=self._trabalhar, name="fila-escrita", daemon=True).start()
+
+    def enfileirar(self, tipo, dados, chave):
+        """Grava a operação na fila; False se a chave já estava nela."""
+        if tipo not in self.enviar:
+            raise ValueError(f"Tipo de operação desconhecido: {tipo}")
+        with self._lock, self._conexao:
+            novo = self._conexao.execute(
+                "insert or ignore into operacoes (chave, tipo, dados, criado_em) values (?, ?, ?, ?)",
+                (chave, tipo, json.dumps(dados, default=str), time.time()),
+            ).rowcount == 1
+        self._acordar.set()
+        return novo
+
+    def pendente(self, chave):
+        with self._lock:
+            return self._conexao.execute("select 1 from operacoes where chave = ?", (chave,)).fetchone() is not None
+
+    def aguardar(self, chave=None, timeout=ESPERA_TELA):
+        """Espera o envio da operação (ou da fila toda); True se não há mais o que esperar."""
+        limite = time.monotonic() + timeout
+        while (self.pendente(chave) if chave else self.profundidade()):
+            if time.monotonic() >= limite:
+                return False
+            time.sleep(0.02)
+        return True
+
+    def profundidade(self):
+        """Operações ainda não enviadas (incluindo as paradas por excesso de falhas)."""
+        with self._lock:
+            return self._conexao.execute("select count(*) from operacoes").fetchone()[0]
+
+    def estatisticas(self):
+        with self._lock:
+            pendentes, paradas, mais_antiga = self._conexao.execute(
+                "select count(*), coalesce(sum(tentativas >= ?), 0), min(criado_em) from operacoes",
+                (MAX_TENTATIVAS,),
+            ).fetchone()
+            latencias = sorted(self.latencias)
+
+        def percentil(p):
+            return round(latencias[min(len(latencias) - 1, int(p * len(latencias)))] * 1000, 1) if latencias else None
+
+        return {
+            "pendentes": pendentes,
+            "paradas": paradas,
+            "mais_antiga_s": round(time.time() - mais_antiga, 1) if mais_antiga else None,
+            "enviadas": self.enviadas,
+            "falhas": self.falhas,
+            "latencia_p50_ms": percentil(0.5),
+            "latencia_p95_ms": percentil(0.95),
+            "ultimo_erro": self.ultimo_erro,
+        }
+
+    def enviar_pendentes(self):
+        """Envia as operações vencidas, em lotes de operações seguidas do mesmo tipo.
+
+        Retorna quantas foram enviadas.
+        """
+        with self._lock:
+            linhas = self._conexao.execute(
+                "select chave, tipo, dados, criado_em, tentativas from operacoes "
+                "where proxima_tentativa <= ? and tentativas < ? order by criado_em, rowid limit ?",
+                (time.time(), MAX_TENTATIVAS, TAMANHO_LOTE),
+            ).fetchall()
+        lotes = []
+        for linha in linhas:
+            if lotes and lotes[-1][0][1] == linha[1]:
+                lotes[-1].append(linha)
+            else:
+                lotes.append([linha])
+
+        enviadas = 0
+        for lote in lotes:
+            erro = self._enviar_lote(lote)
+            if erro is None:
+                enviadas += len(lote)
+            elif falha_de_rede(erro) or len(lote) == 1:
+                self._adiar(lote)
+                if falha_de_rede(erro):
+                    # Sem conexão, as demais também falhariam: esperam a próxima tentativa
+                    break
+            else:
+                # Lote recusado: uma a uma, para não travar as demais por causa de uma;
+                # cada operação conta só a própria falha, não a do lote
+                for linha in lote:
+                    if self._enviar_lote([linha]) is None:
+                        enviadas += 1
+                    else:
+                        self._adiar([linha])
+        return enviadas
+
+    def _adiar(self, lote):
+        """Conta mais uma tentativa das operações e agenda a próxima, com espera crescente."""
+        agora = time.time()
+        with self._lock, self._conexao:
+            self._conexao.executemany(
+                "update operacoes set tentativas = ?, proxima_tentativa = ?, erro = ? where chave = ?",
+                [
+                    (tentativas + 1, agora + min(ESPERA_MAXIMA, ESPERA_BASE * 2 ** tentativas), self.ultimo_erro, chave)
+                    for chave, _, _, _, tentativas in lote
+                ],
+            )
+
+    def _enviar_lote(self, lote):
+        """Envia um lote; retorna None ou a exceção (as operações continuam na fila)."""
+        tipo = lote[0][1]
+        inicio = time.perf_counter()
+        try:
+            self.enviar[tipo]([json.loads(dados) for _, _, dados, _, _ in lote])
+        except Exception as e:
+            self.falhas += 1
+            self.ultimo_erro = f"{type(e).__name__}: {e}"
+            return e
+        registrar(f"fila_escrita.{tipo}", time.perf_counter() - inicio, len(lote))
+        agora = time.time()
+        with self._lock, self._conexao:
+            self._conexao.executemany("delete from operacoes where chave = ?", [(chave,) for chave, *_ in lote])
+            self.latencias.extend(agora - criado_em for _, _, _, criado_em, _ in lote)
+            self.enviadas += len(lote)
+        return None
+
+    def _trabalhar(self):
+        while True:
+            self._acordar.wait(INTERVALO)
+            self._acordar.clear()
+            try:
+                while self.enviar_pendentes() == TAMANHO_LOTE:
+                    pass
+            except Exception as e:
+                # Erro na própria fila (ex.: arquivo): tenta de novo no próximo ciclo
+                self.ultimo_erro = f"{type(e).__name__}: {e}"
+
+
+@st.cache_resource(show_spinner=False)
+def fila():
+    """Fila única do processo; as operações que sobraram de uma execução anterior são enviadas."""
+    import database
+
+    return FilaEscrita(ARQUIVO, {
+        "cadastrar": database.enviar_chamados,
+        "finalizar": database.enviar_finalizacoes,
+    })
+
+
+def painel_fila():
+    """Profundidade da fila e latência de envio, na barra lateral (admin)."""
+    with st.sidebar.expander("📤 Fila de escrita"):
+        dados = fila().estatisticas()
+        st.write(f"Pendentes: {dados['pendentes']} (paradas após {MAX_TENTATIVAS} falhas: {dados['paradas']})")
+        if dados["mais_antiga_s"] is not None:
+            st.write(f"Mais antiga: {dados['mais_antiga_s']} s")
+        st.write(f"Enviadas: {dados['enviadas']} | Falhas de envio: {dados['falhas']}")
+        if dados["latencia_p50_ms"] is not None:
+            st.write(f"Latência até o envio: p50 {dados['latencia_p50_ms']} ms, p95 {dados['latencia_p95_ms']} ms")
+        if dados["ultimo_erro"]:
+            st.caption(f"Último erro: {dados['ultimo_erro']}")
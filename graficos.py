@@ -0,0 +1,83 @@
+import os
+import streamlit as st
+import matplotlib.pyplot as plt
+import pandas as pd
+from io import BytesIO
+from cache_chamados import MemoriaLRU
+from desempenho import medir
+
+
+# Backends de gráficos: imagens do matplotlib ou gráficos nativos (Vega-Lite) do Streamlit
+BACKENDS = {"Imagem (matplotlib)": "matplotlib", "Nativo (Vega-Lite)": "nativo"}
+BACKEND_PADRAO = os.getenv("GRAFICOS_BACKEND", "matplotlib")
+
+# Mesma resolução usada pelo st.pyplot
+DPI = 200
+
+_imagens = MemoriaLRU(capacidade=128)
+
+
+def _chave(plotar, serie, kwargs):
+    return (
+        plotar.__name__,
+        tuple(str(i) for i in serie.index),
+        tuple(serie.to_numpy().tolist()),
+        tuple(sorted(kwargs.items())),
+    )
+
+
+def renderizar_png(plotar, serie, **kwargs):
+    """PNG do gráfico `plotar(serie, **kwargs)`, memoizado pelos dados agregados.
+
+    A figura é sempre fechada após salvar, para não acumular no registro do pyplot.
+    """
+    def gerar():
+        fig = plotar(serie, **kwargs)
+        try:
+            buffer = BytesIO()
+            fig.savefig(buffer, format="png", dpi=DPI)
+            return buffer.getvalue()
+        finally:
+            plt.close(fig)
+
+    return _imagens.obter(_chave(plotar, serie, kwargs), gerar)
+
+
+# Especificações Vega-Lite do backend nativo
+def espec_pizza(titulo=None):
+    return {
+        "title": titulo or "",
+        "mark": {"type": "arc", "tooltip": True},
+        "encoding": {
+            "theta": {"field": "valor", "type": "quantitative"},
+            "color": {"field": "categoria", "type": "nominal", "title": None},
+        },
+    }
+
+
+def espec_barra(titulo=None, horizontal=False, ordenar=True):
+    """Barras ordenadas pelo valor; com `ordenar=False`, na ordem da série (ex.: faixas)."""
+    ordem = ("-y" if not horizontal else "-x") if ordenar else None
+    categoria = {"field": "categoria", "type": "nominal", "title": None, "sort": ordem}
+    valor = {"field": "valor", "type": "quantitative", "title": "Qtd" if not horizontal else "Tempo médio em Minutos"}
+    return {
+        "title": titulo or "",
+        "mark": {"type": "bar", "tooltip": True},
+        "encoding": {"y": categoria, "x": valor} if horizontal else {"x": categoria, "y": valor},
+    }
+
+
+@medir()
+def exibir_grafico(plotar, serie, espec_nativa, backend=None, top_n=None, **kwargs):
+    """Mostra a série como imagem memoizada do matplotlib ou como gráfico nativo."""
+    if (backend or BACKEND_PADRAO) == "nativo":
+        dados = serie.head(top_n) if top_n else serie
+        st.vega_lite_chart(
+            pd.DataFrame({"categoria": dados.index.astype(str), "valor": dados.to_numpy()}),
+            espec_nativa,
+            use_container_width=True,
+        )
+    else:
+        if top_n:
+            kwargs["top_n"] = top_n
+        st.image(renderizar_png(plotar, serie, **kwargs), use_column_width=True)
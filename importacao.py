@@ -0,0 +1,55 @@
+import streamlit as st
+import pandas as pd
+from database import cadastrar_chamados_em_lote
+from recursos import indice_referencia
+
+
+COLUNAS_IMPORTACAO = ["regional", "loja", "lider", "motivo"]
+
+
+def ler_arquivo_importacao(arquivo):
+    """Lê um CSV ou XLSX enviado e normaliza os nomes das colunas."""
+    if arquivo.name.lower().endswith(".csv"):
+        df = pd.read_csv(arquivo, dtype=str, sep=None, engine="python")
+    else:
+        df = pd.read_excel(arquivo, dtype=str)
+    df.columns = [str(c).strip().lower().replace("í", "i") for c in df.columns]
+    return df
+
+
+# Página de importação (admin)
+def pagina_importacao():
+    st.title("📤 Importar Chamados em Lote")
+    st.write("Envie um arquivo CSV ou XLSX com as colunas: " + ", ".join(COLUNAS_IMPORTACAO) + ".")
+
+    arquivo = st.file_uploader("Arquivo de chamados", type=["csv", "xlsx"])
+    if arquivo is None:
+        return
+
+    try:
+        df = ler_arquivo_importacao(arquivo)
+    except Exception as e:
+        st.error(f"Erro ao ler arquivo: {e}")
+        return
+
+    faltando = [c for c in COLUNAS_IMPORTACAO if c not in df.columns]
+    if faltando:
+        st.error(f"❌ Colunas ausentes: {', '.join(faltando)}")
+        return
+
+    df = df[COLUNAS_IMPORTACAO].fillna("")
+    st.write(f"{len(df)} chamado(s) no arquivo.")
+    st.dataframe(df.head(20), hide_index=True, use_container_width=True)
+
+    if st.button("Importar Chamados"):
+        inseridos, falhas = cadastrar_chamados_em_lote(df.to_dict("records"), indice=indice_referencia())
+        if inseridos:
+            st.success(f"✅ {inseridos} chamado(s) cadastrado(s)!")
+        if falhas:
+            st.warning(f"⚠️ {len(falhas)} linha(s) não importada(s).")
+            # Linha 1 do arquivo é o cabeçalho
+            st.dataframe(
+                pd.DataFrame([{"linha": posicao + 2, "erro": erro} for posicao, erro in falhas]),
+                hide_index=True,
+                use_container_width=True,
+            )
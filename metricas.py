@@ -0,0 +1,59 @@
+"""Métricas agregadas de chamados por (dia, regional, loja, líder, motivo, status).
+
+Cada linha da tabela `metricas_chamados` guarda a quantidade de chamados e a
+soma/contagem das durações em segundos. Os cadastros somam os incrementos na
+própria função `cadastrar_chamados` e a finalização move a contagem de "Aberto" para
+"Finalizado" dentro da própria função `finalizar_chamados` (ver schema.sql).
+O dashboard lê o resumo por (regional, líder, motivo, status) da função
+`resumir_metricas`, cujo tamanho não cresce com o histórico.
+
+Reconstrução completa a partir da tabela de chamados: python metricas.py
+"""
+import sys
+import pandas as pd
+
+
+COLUNAS_CHAVE = ["dia", "regional", "loja", "lider", "motivo", "status"]
+COLUNAS_VALOR = ["quantidade", "soma_duracao_s", "qtd_duracao"]
+
+# Chave do resumo lido pelo dashboard (função resumir_metricas)
+COLUNAS_RESUMO = ["regional", "lider", "motivo", "status"]
+
+
+def calcular_metricas(df):
+    """Métricas completas a partir de um DataFrame de chamados (datas em datetime ou texto ISO)."""
+    if df.empty:
+        return pd.DataFrame(columns=COLUNAS_CHAVE + COLUNAS_VALOR)
+    abertura = pd.to_datetime(df["abertura"], errors="coerce", format="ISO8601")
+    base = pd.DataFrame({
+        "dia": abertura.dt.strftime("%Y-%m-%d"),
+        **{col: df[col].astype(object).fillna("").astype(str) for col in COLUNAS_CHAVE[1:]},
+    })
+    if "fechamento" in df.columns:
+        fechamento = pd.to_datetime(df["fechamento"], errors="coerce", format="ISO8601")
+        duracao = (fechamento - abertura).dt.total_seconds()
+    else:
+        duracao = pd.Series(float("nan"), index=df.index)
+    base["quantidade"] = 1
+    base["soma_duracao_s"] = duracao.fillna(0.0)
+    base["qtd_duracao"] = duracao.notna().astype(int)
+    base = base[base["dia"].notna()]
+    return base.groupby(COLUNAS_CHAVE, as_index=False)[COLUNAS_VALOR].sum()
+
+
+def incrementos_abertura(linhas):
+    """Incrementos de métricas para chamados recém-cadastrados (dicts com abertura, regional, ...)."""
+    if not linhas:
+        return []
+    return calcular_metricas(pd.DataFrame(linhas)).to_dict("records")
+
+
+def main():
+    import database
+
+    total = database.reconstruir_metricas()
+    print(f"Métricas reconstruídas: {total} linha(s)")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,152 @@
+"""Recursos compartilhados pelo processo do servidor Streamlit.
+
+Cliente do banco, dados de referência (chamado.xlsx) e caches são criados uma
+única vez por processo (`st.cache_resource`), no primeiro uso. `aquecer()`
+constrói todos de uma vez na primeira sessão, para que as seguintes já
+encontrem tudo pronto. O tempo de cada carga e o custo de inicialização de
+cada sessão ficam registrados para o painel de recursos do admin.
+"""
+import functools
+import os
+import threading
+import time
+from collections import deque
+import pandas as pd
+import streamlit as st
+from dotenv import load_dotenv
+from supabase import create_client
+from referencia import IndiceReferencia, carregar_referencia
+import fila_escrita
+import tempo_real
+
+# Carregar variáveis de ambiente
+load_dotenv()  # Procura arquivo .env na raiz do projeto
+
+SUPABASE_URL = os.getenv("SUPABASE_URL")
+SUPABASE_KEY = os.getenv("SUPABASE_KEY")
+
+# Banco usado pelo sistema: "supabase" (padrão) ou "sqlite" (banco_sqlite.py,
+# no arquivo CHAMADOS_SQLITE)
+BACKEND = os.getenv("CHAMADOS_BACKEND", "supabase")
+SQLITE_PATH = os.getenv("CHAMADOS_SQLITE", "chamados.db")
+
+EXCEL_PATH = "chamado.xlsx"
+
+# Segundos gastos na primeira construção de cada recurso neste processo
+tempos_carga = {}
+
+# Tempo de inicialização das sessões mais recentes (segundos)
+tempos_sessao = deque(maxlen=500)
+
+_lock = threading.Lock()
+
+
+def _cronometrado(nome):
+    """Registra em `tempos_carga` quanto a construção do recurso levou."""
+    def decorador(funcao):
+        @functools.wraps(funcao)
+        def envolvida(*args, **kwargs):
+            inicio = time.perf_counter()
+            try:
+                return funcao(*args, **kwargs)
+            finally:
+                with _lock:
+                    tempos_carga[nome] = time.perf_counter() - inicio
+        return envolvida
+    return decorador
+
+
+def credenciais_supabase():
+    if not SUPABASE_URL or not SUPABASE_KEY:
+        raise ValueError("Variáveis de ambiente SUPABASE_URL e SUPABASE_KEY não encontradas.")
+    return SUPABASE_URL, SUPABASE_KEY
+
+
+@st.cache_resource(show_spinner=False)
+@_cronometrado("cliente_banco")
+def cliente_banco():
+    """Cliente do banco do processo (Supabase ou SQLite), criado na primeira requisição."""
+    if BACKEND == "sqlite":
+        from banco_sqlite import ClienteSQLite
+
+        return ClienteSQLite(SQLITE_PATH)
+    if BACKEND != "supabase":
+        raise ValueError(f"CHAMADOS_BACKEND inválido: {BACKEND} (use supabase ou sqlite)")
+    return create_client(*credenciais_supabase())
+
+
+class ClienteSobDemanda:
+    """Repassa cada acesso ao cliente do processo, criando-o só no primeiro uso."""
+
+    def __getattr__(self, nome):
+        return getattr(cliente_banco(), nome)
+
+
+@st.cache_resource(show_spinner="Carregando dados de referência...")
+@_cronometrado("dados_referencia")
+def dados_referencia():
+    """Dados do chamado.xlsx (via snapshot Feather quando válido)."""
+    try:
+        return carregar_referencia(EXCEL_PATH)
+    except FileNotFoundError:
+        st.warning(f"⚠️ Arquivo {EXCEL_PATH} não encontrado!")
+        return pd.DataFrame()
+    except Exception as e:
+        st.error(f"Erro ao carregar Excel: {e}")
+        return pd.DataFrame()
+
+
+@st.cache_resource(show_spinner=False)
+@_cronometrado("indice_referencia")
+def indice_referencia():
+    """Índice Regional → Loja → Líder construído uma vez sobre o chamado.xlsx."""
+    return IndiceReferencia(dados_referencia())
+
+
+@st.cache_resource(show_spinner="Preparando o servidor...")
+@_cronometrado("aquecimento")
+def aquecer():
+    """Constrói todos os recursos do processo; as chamadas seguintes não fazem nada."""
+    import database
+
+    _cronometrado("usuarios_padrao")(database.inicializar_usuarios)()
+    indice_referencia()
+    _cronometrado("cache_chamados")(lambda: database.cache_chamados().obter())()
+    if fila_escrita.ATIVA:
+        # Envia o que ficou na fila de uma execução anterior
+        _cronometrado("fila_escrita")(fila_escrita.fila)()
+    if tempo_real.ATIVO:
+        _cronometrado("tempo_real")(tempo_real.iniciar)()
+    return True
+
+
+def registrar_sessao(segundos):
+    with _lock:
+        tempos_sessao.append(segundos)
+
+
+def relatorio():
+    """Tempos de carga dos recursos e custo de inicialização por sessão, em ms."""
+    with _lock:
+        carga = {nome: round(segundos * 1000, 1) for nome, segundos in tempos_carga.items()}
+        sessoes = list(tempos_sessao)
+    return {
+        "carga_ms": carga,
+        "sessoes": len(sessoes),
+        "sessao_media_ms": round(1000 * sum(sessoes) / len(sessoes), 2) if sessoes else None,
+        "sessao_max_ms": round(1000 * max(sessoes), 2) if sessoes else None,
+    }
+
+
+def painel_recursos():
+    """Tempos de carga e de inicialização de sessão, na barra lateral (admin)."""
+    with st.sidebar.expander("⚙️ Recursos do servidor"):
+        dados = relatorio()
+        st.dataframe(
+            pd.DataFrame(list(dados["carga_ms"].items()), columns=["recurso", "carga (ms)"]),
+            hide_index=True,
+            use_container_width=True,
+        )
+        st.write(f"Sessões: {dados['sessoes']}")
+        if dados["sessoes"]:
+            st.write(f"Inicialização por sessão: média {dados['sessao_media_ms']} ms, máx. {dados['sessao_max_ms']} ms")
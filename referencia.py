@@ -0,0 +1,220 @@
+import hashlib
+import json
+import os
+import sys
+import time
+from datetime import timedelta
+import numpy as np
+import pandas as pd
+from desempenho import medir
+
+
+# Colunas do chamado.xlsx usadas pelo sistema
+COLUNA_DATA = "4"
+COLUNA_REGIONAL = "8"
+COLUNA_LOJA = "1"
+COLUNA_LIDER = "12"
+COLUNAS_TEXTO = [COLUNA_REGIONAL, COLUNA_LOJA, COLUNA_LIDER]
+
+# Snapshot colunar (Feather) da planilha, reconstruído quando o xlsx muda
+PASTA_SNAPSHOT = ".snapshot"
+
+# Origem e duração da última carga ({"origem": "snapshot" | "xlsx", "segundos": ...})
+ultimo_carregamento = {}
+
+
+def ler_planilha(caminho):
+    """Lê o xlsx com openpyxl e aplica a tipagem das colunas usadas."""
+    dados = pd.read_excel(caminho, header=1)
+    dados.columns = [str(c).strip().upper() for c in dados.columns]
+
+    # Converter colunas específicas
+    for col in COLUNAS_TEXTO:
+        if col in dados.columns:
+            dados[col] = dados[col].astype(str)
+    if COLUNA_DATA in dados.columns:
+        dados[COLUNA_DATA] = pd.to_datetime(dados[COLUNA_DATA], errors="coerce")
+    return dados
+
+
+def _caminhos_snapshot(caminho_xlsx, pasta):
+    base = os.path.join(pasta, os.path.basename(caminho_xlsx))
+    return base + ".feather", base + ".json"
+
+
+def _hash_arquivo(caminho):
+    with open(caminho, "rb") as arquivo:
+        return hashlib.sha256(arquivo.read()).hexdigest()
+
+
+def construir_snapshot(caminho_xlsx, pasta=PASTA_SNAPSHOT):
+    """Converte o xlsx em um snapshot Feather com as colunas já tipadas."""
+    dados = ler_planilha(caminho_xlsx)
+    # Só as colunas usadas: as demais misturam tipos e não têm representação colunar
+    colunas = [c for c in [COLUNA_DATA, *COLUNAS_TEXTO] if c in dados.columns]
+    caminho_dados, caminho_meta = _caminhos_snapshot(caminho_xlsx, pasta)
+    os.makedirs(pasta, exist_ok=True)
+    dados[colunas].reset_index(drop=True).to_feather(caminho_dados)
+    estado = os.stat(caminho_xlsx)
+    with open(caminho_meta, "w") as arquivo:
+        json.dump({"mtime_ns": estado.st_mtime_ns, "tamanho": estado.st_size, "sha256": _hash_arquivo(caminho_xlsx)}, arquivo)
+    return dados[colunas]
+
+
+def _snapshot_valido(caminho_xlsx, caminho_dados, caminho_meta):
+    if not (os.path.exists(caminho_dados) and os.path.exists(caminho_meta)):
+        return False
+    with open(caminho_meta) as arquivo:
+        meta = json.load(arquivo)
+    estado = os.stat(caminho_xlsx)
+    if meta.get("mtime_ns") == estado.st_mtime_ns and meta.get("tamanho") == estado.st_size:
+        return True
+    # mtime mudou (cópia, checkout): só reconstrói se o conteúdo mudou
+    if meta.get("sha256") != _hash_arquivo(caminho_xlsx):
+        return False
+    meta.update(mtime_ns=estado.st_mtime_ns, tamanho=estado.st_size)
+    with open(caminho_meta, "w") as arquivo:
+        json.dump(meta, arquivo)
+    return True
+
+
+def carregar_referencia(caminho_xlsx, pasta=PASTA_SNAPSHOT):
+    """Carrega os dados de referência do snapshot, reconstruindo-o se o xlsx mudou."""
+    inicio = time.perf_counter()
+    caminho_dados, caminho_meta = _caminhos_snapshot(caminho_xlsx, pasta)
+    if _snapshot_valido(caminho_xlsx, caminho_dados, caminho_meta):
+        dados = pd.read_feather(caminho_dados)
+        origem = "snapshot"
+    else:
+        try:
+            dados = construir_snapshot(caminho_xlsx, pasta)
+        except OSError:
+            # Sistema de arquivos somente leitura: segue sem snapshot
+            dados = ler_planilha(caminho_xlsx)
+        origem = "xlsx"
+    ultimo_carregamento.update(origem=origem, segundos=time.perf_counter() - inicio)
+    return dados
+
+
+def _nanossegundos(data):
+    return np.datetime64(data, "ns").astype(np.int64)
+
+
+class IndiceReferencia:
+    """Índice Regional → Loja → Líder sobre os dados do chamado.xlsx.
+
+    Os textos são normalizados uma única vez e as linhas ordenadas por
+    (regional, data) e por (regional, loja, data). Assim cada regional e cada
+    par (regional, loja) ocupa uma faixa contínua, e a janela de datas dentro
+    da faixa é encontrada por busca binária.
+    """
+
+    def __init__(self, dados):
+        self.regionais_ordenadas = []
+        self._faixa_regional = {}
+        self._faixa_loja = {}
+        self._lojas_por_regional = {}
+        self._datas_regional = np.empty(0, dtype=np.int64)
+        self._datas_loja = np.empty(0, dtype=np.int64)
+        self._posicao_loja = np.empty(0, dtype=np.int64)
+        self._lider_loja = np.empty(0, dtype=object)
+        self._lideres_por_loja = {}
+
+        colunas = {COLUNA_DATA, COLUNA_REGIONAL, COLUNA_LOJA, COLUNA_LIDER}
+        if dados.empty or not colunas.issubset(dados.columns):
+            return
+
+        regional = dados[COLUNA_REGIONAL].astype(str).str.strip().to_numpy(object)
+        loja = dados[COLUNA_LOJA].astype(str).str.strip().to_numpy(object)
+        lider = dados[COLUNA_LIDER].to_numpy(object)
+        # NaT vira o menor int64 e fica fora de qualquer janela de datas
+        datas = pd.to_datetime(dados[COLUNA_DATA], errors="coerce").to_numpy("datetime64[ns]").view(np.int64)
+        posicao = np.arange(len(dados))
+
+        # Códigos na ordem da primeira ocorrência, igual ao `unique()` das máscaras
+        codigo_regional, self.regionais_ordenadas = pd.factorize(regional)
+        codigo_loja, lojas = pd.factorize(loja)
+        self.regionais_ordenadas = list(self.regionais_ordenadas)
+
+        # Ordenação por (regional, data)
+        ordem = np.lexsort((posicao, datas, codigo_regional))
+        self._datas_regional = datas[ordem]
+        inicios = np.searchsorted(codigo_regional[ordem], np.arange(len(self.regionais_ordenadas)))
+        fins = np.append(inicios[1:], len(ordem))
+        self._faixa_regional = dict(zip(self.regionais_ordenadas, zip(inicios.tolist(), fins.tolist())))
+
+        # Ordenação por (regional, loja, data)
+        ordem = np.lexsort((posicao, datas, codigo_loja, codigo_regional))
+        self._datas_loja = datas[ordem]
+        self._posicao_loja = posicao[ordem]
+        self._lider_loja = lider[ordem]
+        chave = codigo_regional[ordem].astype(np.int64) * len(lojas) + codigo_loja[ordem]
+        quebras = np.flatnonzero(np.diff(chave)) + 1
+        inicios = np.concatenate(([0], quebras))
+        fins = np.append(quebras, len(ordem))
+        for a, b in zip(inicios.tolist(), fins.tolist()):
+            nome_regional = self.regionais_ordenadas[codigo_regional[ordem[a]]]
+            nome_loja = lojas[codigo_loja[ordem[a]]]
+            self._faixa_loja[(nome_regional, nome_loja)] = (a, b)
+            self._lojas_por_regional.setdefault(nome_regional, []).append(nome_loja)
+            self._lideres_por_loja[(nome_regional, nome_loja)] = {
+                str(l).strip().upper() for l in self._lider_loja[a:b]
+            }
+
+    def validar(self, regional, loja, lider):
+        """Mensagem de erro se a combinação não existe na planilha, ou None se for válida."""
+        if regional not in self._faixa_regional:
+            return f"Regional '{regional}' não encontrada"
+        if (regional, loja) not in self._faixa_loja:
+            return f"Loja '{loja}' não pertence à regional '{regional}'"
+        if str(lider).strip().upper() not in self._lideres_por_loja[(regional, loja)]:
+            return f"Líder '{lider}' não cadastrado para a loja '{loja}'"
+        return None
+
+    @staticmethod
+    def _janela(datas, faixa, inicio, fim):
+        """Posições [i, j) de `datas` dentro da faixa com data entre inicio e fim (inclusive)."""
+        a, b = faixa
+        trecho = datas[a:b]
+        i = np.searchsorted(trecho, _nanossegundos(inicio), side="left")
+        j = np.searchsorted(trecho, _nanossegundos(fim + timedelta(days=1)), side="left")
+        return a + i, a + j
+
+    def _tem_linhas(self, datas, faixa, inicio, fim):
+        i, j = self._janela(datas, faixa, inicio, fim)
+        return i < j
+
+    @medir()
+    def regionais(self, inicio, fim):
+        """Regionais com alguma linha no período."""
+        return [
+            r for r in self.regionais_ordenadas
+            if self._tem_linhas(self._datas_regional, self._faixa_regional[r], inicio, fim)
+        ]
+
+    @medir()
+    def lojas(self, regional, inicio, fim):
+        """Lojas da regional com alguma linha no período."""
+        return [
+            l for l in self._lojas_por_regional.get(regional, [])
+            if self._tem_linhas(self._datas_loja, self._faixa_loja[(regional, l)], inicio, fim)
+        ]
+
+    @medir()
+    def lider(self, regional, loja, inicio, fim):
+        """Líder da primeira linha (na ordem do arquivo) da loja no período, ou ""."""
+        faixa = self._faixa_loja.get((regional, loja))
+        if faixa is None:
+            return ""
+        i, j = self._janela(self._datas_loja, faixa, inicio, fim)
+        if i == j:
+            return ""
+        return self._lider_loja[i + np.argmin(self._posicao_loja[i:j])]
+
+
+if __name__ == "__main__":
+    # Etapa de build: python referencia.py [chamado.xlsx]
+    caminho = sys.argv[1] if len(sys.argv) > 1 else "chamado.xlsx"
+    inicio = time.perf_counter()
+    construir_snapshot(caminho)
+    print(f"Snapshot de {caminho} gerado em {time.perf_counter() - inicio:.2f}s")
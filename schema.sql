@@ -0,0 +1,291 @@
+-- Objetos do banco Supabase usados pelo sistema de chamados.
+-- Executar no SQL Editor do Supabase; os comandos podem ser reaplicados.
+
+-- Catálogo de motivos (um registro por motivo, sempre em maiúsculas)
+create table if not exists motivos (
+    id bigint generated by default as identity primary key,
+    motivo text not null unique check (motivo = upper(btrim(motivo)))
+);
+
+-- Migração: popular o catálogo com os motivos já usados nos chamados
+insert into motivos (motivo)
+select distinct upper(btrim(motivo))
+from chamados
+where motivo is not null and btrim(motivo) <> ''
+on conflict (motivo) do nothing;
+
+-- Migração: remover as linhas de chamados criadas só para guardar um motivo novo
+delete from chamados
+where regional is null and loja is null and abertura is null and motivo is not null;
+
+-- Duração no mesmo formato de str(timedelta) do Python ("1 day, 2:03:04")
+create or replace function formatar_duracao(d interval)
+returns text
+language sql
+immutable
+as $$
+    select case
+               when s >= 86400 then (s / 86400)::text || case when s / 86400 = 1 then ' day, ' else ' days, ' end
+               else ''
+           end
+           || ((s % 86400) / 3600)::text || ':'
+           || lpad(((s % 3600) / 60)::text, 2, '0') || ':'
+           || lpad((s % 60)::text, 2, '0')
+    from (select floor(extract(epoch from d))::bigint as s) t
+$$;
+
+-- Métricas por (dia, regional, loja, líder, motivo, status), mantidas a cada escrita.
+-- O dashboard lê esta tabela em vez de agregar todos os chamados.
+create table if not exists metricas_chamados (
+    dia date not null,
+    regional text not null default '',
+    loja text not null default '',
+    lider text not null default '',
+    motivo text not null default '',
+    status text not null,
+    quantidade bigint not null default 0,
+    soma_duracao_s double precision not null default 0,
+    qtd_duracao bigint not null default 0,
+    primary key (dia, regional, loja, lider, motivo, status)
+);
+
+-- Cadastro e finalização somam as próprias métricas (cadastrar_chamados, finalizar_chamados)
+drop function if exists incrementar_metricas(jsonb);
+
+-- Recalcula todas as métricas a partir dos chamados, inclusive os arquivados (python metricas.py)
+create or replace function reconstruir_metricas()
+returns bigint
+language plpgsql
+as $$
+declare
+    total bigint;
+begin
+    delete from metricas_chamados where true;
+    insert into metricas_chamados
+        (dia, regional, loja, lider, motivo, status, quantidade, soma_duracao_s, qtd_duracao)
+    select abertura::date,
+           coalesce(regional, ''), coalesce(loja, ''), coalesce(lider, ''), coalesce(motivo, ''),
+           status,
+           count(*),
+           coalesce(sum(extract(epoch from fechamento::timestamp - abertura::timestamp)), 0),
+           count(fechamento)
+    from (
+        select abertura, regional, loja, lider, motivo, status, fechamento from chamados
+        union all
+        select abertura, regional, loja, lider, motivo, status, fechamento from chamados_historico
+    ) c
+    where abertura is not null and status is not null
+    group by 1, 2, 3, 4, 5, 6;
+    get diagnostics total = row_count;
+    return total;
+end
+$$;
+
+-- Resumo das métricas sem dia e loja, para o dashboard: o tamanho depende só das
+-- combinações de regional, líder, motivo e status, não do histórico.
+-- Retorna um único JSON para não esbarrar no limite de linhas do PostgREST.
+create or replace function resumir_metricas(p_inicio date default null, p_fim date default null)
+returns jsonb
+language sql
+stable
+as $$
+    select coalesce(jsonb_agg(r), '[]'::jsonb)
+    from (
+        select regional, lider, motivo, status,
+               sum(quantidade) as quantidade,
+               sum(soma_duracao_s) as soma_duracao_s,
+               sum(qtd_duracao) as qtd_duracao
+        from metricas_chamados
+        where (p_inicio is null or dia >= p_inicio)
+          and (p_fim is null or dia <= p_fim)
+        group by regional, lider, motivo, status
+        having sum(quantidade) <> 0
+    ) r
+$$;
+
+-- Finalização em um único UPDATE; só altera chamados ainda abertos.
+-- As métricas passam de "Aberto" para "Finalizado" na mesma instrução.
+create or replace function finalizar_chamados(
+    p_ids bigint[],
+    p_observacao text default null,
+    p_fechamento timestamp default null
+)
+returns table (id bigint, fechamento timestamp, duracao text)
+language sql
+as $$
+    with finalizados as (
+        update chamados c
+        set status = 'Finalizado',
+            fechamento = coalesce(p_fechamento, localtimestamp),
+            duracao = formatar_duracao(coalesce(p_fechamento, localtimestamp) - c.abertura::timestamp),
+            observacao = p_observacao
+        where c.id = any(p_ids)
+          and c.status = 'Aberto'
+        returning c.id, c.fechamento::timestamp as fechamento, c.duracao,
+                  c.abertura::date as dia,
+                  coalesce(c.regional, '') as regional, coalesce(c.loja, '') as loja,
+                  coalesce(c.lider, '') as lider, coalesce(c.motivo, '') as motivo,
+                  extract(epoch from c.fechamento::timestamp - c.abertura::timestamp) as duracao_s
+    ),
+    metricas as (
+        insert into metricas_chamados as m
+            (dia, regional, loja, lider, motivo, status, quantidade, soma_duracao_s, qtd_duracao)
+        select dia, regional, loja, lider, motivo, 'Aberto', -count(*), 0, 0
+        from finalizados group by 1, 2, 3, 4, 5
+        union all
+        select dia, regional, loja, lider, motivo, 'Finalizado', count(*), sum(duracao_s), count(*)
+        from finalizados group by 1, 2, 3, 4, 5
+        on conflict (dia, regional, loja, lider, motivo, status) do update
+        set quantidade = m.quantidade + excluded.quantidade,
+            soma_duracao_s = m.soma_duracao_s + excluded.soma_duracao_s,
+            qtd_duracao = m.qtd_duracao + excluded.qtd_duracao
+    )
+    select f.id, f.fechamento, f.duracao from finalizados f
+$$;
+
+-- Chave de idempotência gerada pelo app (fila_escrita.py): reenviar o mesmo
+-- cadastro não cria outro chamado
+alter table chamados add column if not exists chave text;
+create unique index if not exists chamados_chave_key on chamados (chave);
+
+-- Cadastro em lote com chave de idempotência; chaves já gravadas são ignoradas.
+-- As métricas dos chamados inseridos são somadas na mesma instrução.
+create or replace function cadastrar_chamados(p_chamados jsonb)
+returns table (id bigint, chave text)
+language sql
+as $$
+    with inseridos as (
+        insert into chamados (regional, loja, lider, motivo, abertura, status, chave)
+        select r.regional, r.loja, r.lider, r.motivo, r.abertura, coalesce(r.status, 'Aberto'), r.chave
+        from jsonb_populate_recordset(null::chamados, p_chamados) r
+        on conflict (chave) do nothing
+        returning chamados.id, chamados.chave, chamados.abertura::date as dia,
+                  coalesce(chamados.regional, '') as regional, coalesce(chamados.loja, '') as loja,
+                  coalesce(chamados.lider, '') as lider, coalesce(chamados.motivo, '') as motivo,
+                  chamados.status
+    ),
+    metricas as (
+        insert into metricas_chamados as m
+            (dia, regional, loja, lider, motivo, status, quantidade, soma_duracao_s, qtd_duracao)
+        select dia, regional, loja, lider, motivo, status, count(*), 0, 0
+        from inseridos group by 1, 2, 3, 4, 5, 6
+        on conflict (dia, regional, loja, lider, motivo, status) do update
+        set quantidade = m.quantidade + excluded.quantidade
+    )
+    select i.id, i.chave from inseridos i
+$$;
+
+-- Histórico: chamados finalizados há mais de N dias saem da tabela `chamados`
+-- (python arquivo.py). Uma partição por mês de abertura, criada no arquivamento;
+-- consultas com período na abertura leem só as partições do período.
+create table if not exists chamados_historico (like chamados including defaults)
+    partition by range (abertura);
+create index if not exists chamados_historico_id on chamados_historico (id);
+create index if not exists chamados_historico_abertura on chamados_historico (abertura);
+
+-- Move para o histórico os chamados finalizados antes de `p_dias` dias atrás, em
+-- uma única transação; as métricas não mudam. Retorna quantos foram movidos.
+create or replace function arquivar_chamados(p_dias integer default 90)
+returns bigint
+language plpgsql
+as $$
+declare
+    corte timestamp := localtimestamp - make_interval(days => p_dias);
+    mes date;
+    total bigint;
+begin
+    for mes in
+        select distinct date_trunc('month', abertura::timestamp)::date
+        from chamados
+        where status = 'Finalizado' and fechamento::timestamp < corte and abertura is not null
+    loop
+        execute format(
+            'create table if not exists %I partition of chamados_historico for values from (%L) to (%L)',
+            'chamados_historico_' || to_char(mes, 'YYYY_MM'), mes, (mes + interval '1 month')::date
+        );
+    end loop;
+    with movidos as (
+        delete from chamados
+        where status = 'Finalizado' and fechamento::timestamp < corte and abertura is not null
+        returning *
+    )
+    insert into chamados_historico select * from movidos;
+    get diagnostics total = row_count;
+    return total;
+end
+$$;
+
+-- Alterações dos chamados para o cache do app (cache_chamados.py): cada insert ou
+-- update recebe o próximo número da sequência em `alteracao` e cada remoção
+-- (inclusive o arquivamento) fica em `chamados_removidos`. O app busca só o que
+-- tem número maior que o último visto, sem depender do relógio de quem escreveu.
+create sequence if not exists chamados_alteracao_seq;
+alter table chamados add column if not exists alteracao bigint;
+alter table chamados_historico add column if not exists alteracao bigint;
+create index if not exists chamados_alteracao on chamados (alteracao);
+
+create table if not exists chamados_removidos (
+    id bigint not null,
+    alteracao bigint not null default nextval('chamados_alteracao_seq')
+);
+create index if not exists chamados_removidos_alteracao on chamados_removidos (alteracao);
+
+create or replace function marcar_alteracao()
+returns trigger
+language plpgsql
+as $$
+begin
+    new.alteracao := nextval('chamados_alteracao_seq');
+    return new;
+end
+$$;
+
+create or replace function registrar_remocao()
+returns trigger
+language plpgsql
+as $$
+begin
+    insert into chamados_removidos (id) values (old.id);
+    return old;
+end
+$$;
+
+drop trigger if exists chamados_alteracao on chamados;
+create trigger chamados_alteracao before insert or update on chamados
+    for each row execute function marcar_alteracao();
+drop trigger if exists chamados_remocao on chamados;
+create trigger chamados_remocao after delete on chamados
+    for each row execute function registrar_remocao();
+
+-- Número da última alteração; o app o lê antes de buscar as alterações
+create or replace function ultima_alteracao()
+returns bigint
+language sql
+stable
+as $$
+    select case when is_called then last_value else 0 end from chamados_alteracao_seq
+$$;
+
+-- Migração: numerar os chamados existentes (o gatilho preenche `alteracao`)
+update chamados set alteracao = null where alteracao is null;
+
+-- Migração: preencher as métricas com os chamados existentes
+select reconstruir_metricas();
+
+-- Senhas com hash bcrypt (60 caracteres). As senhas em texto puro existentes são
+-- convertidas no próximo login ou de uma vez com: python senhas.py
+alter table usuarios alter column senha type text;
+
+-- Tempo real (CHAMADOS_TEMPO_REAL=1): publica as alterações de chamados no Realtime.
+-- "replica identity full" faz o DELETE trazer a linha removida.
+alter table chamados replica identity full;
+do $$
+begin
+    if not exists (
+        select 1 from pg_publication_tables
+        where pubname = 'supabase_realtime' and schemaname = 'public' and tablename = 'chamados'
+    ) then
+        alter publication supabase_realtime add table chamados;
+    end if;
+end
+$$;
@@ -0,0 +1,60 @@
+"""Hash de senhas com bcrypt.
+
+O custo é configurado por BCRYPT_ROUNDS (padrão 12). Senhas ainda gravadas em
+texto puro são aceitas uma última vez e trocadas pelo hash no login; para
+migrar todas de uma vez: python senhas.py
+"""
+import hmac
+import os
+import sys
+from functools import lru_cache
+import bcrypt
+
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
+
+def eh_hash(valor):
+    return isinstance(valor, str) and valor.startswith(("$2a$", "$2b$", "$2y$"))
+
+
+def gerar_hash(senha, rounds=None):
+    return bcrypt.hashpw(senha.encode("utf-8"), bcrypt.gensalt(rounds or BCRYPT_ROUNDS)).decode("ascii")
+
+
+def precisa_rehash(armazenada, rounds=None):
+    """True para senhas em texto puro ou com hash de custo diferente do configurado."""
+    if not eh_hash(armazenada):
+        return True
+    return int(armazenada.split("$")[2]) != (rounds or BCRYPT_ROUNDS)
+
+
+@lru_cache(maxsize=1)
+def _hash_ficticio():
+    # Usado quando o usuário não existe, para o tempo de resposta não revelar isso
+    return bcrypt.hashpw(b"usuario-inexistente", bcrypt.gensalt(BCRYPT_ROUNDS))
+
+
+def conferir_senha(senha, armazenada):
+    """Compara a senha digitada com o valor gravado (hash bcrypt ou texto puro legado).
+
+    O bcrypt libera o GIL durante o cálculo: outras sessões continuam rodando
+    enquanto a do login espera.
+    """
+    if armazenada is None:
+        bcrypt.checkpw(senha.encode("utf-8"), _hash_ficticio())
+        return False
+    if eh_hash(armazenada):
+        return bcrypt.checkpw(senha.encode("utf-8"), armazenada.encode("ascii"))
+    return hmac.compare_digest(senha.encode("utf-8"), str(armazenada).encode("utf-8"))
+
+
+def main():
+    import database
+
+    total = database.migrar_senhas()
+    print(f"Senhas migradas para bcrypt: {total}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,3 +1,5 @@
+import time
+import uuid
 import streamlit as st
 # Configuração da página
 st.set_page_config(
@@ -6,94 +8,117 @@ st.set_page_config(
     layout="wide",
     initial_sidebar_state="expanded"
 )
-from chamados import sistema_chamados
-from database import (
-    verificar_usuario,
-    cadastrar_usuario_se_nao_existir,
-    zerar_banco
-)
-from dashboard import dashboard_admin, dashboard_usuario
-
-
-# Inicialização de usuários (admin e user)
-if "usuarios_inicializados" not in st.session_state:
-    # Cria admin apenas se não existir
-    cadastrar_usuario_se_nao_existir("admin", "admin123", papel="admin")
-    # Cria usuário padrão apenas se não existir
-    cadastrar_usuario_se_nao_existir("user", "user", papel="usuario")
-    st.session_state["usuarios_inicializados"] = True
-
-
-# Sessão persistente
-if "usuario_logado" not in st.session_state:
-    st.session_state["usuario_logado"] = None
-    st.session_state["papel"] = None
-
+from desempenho import finalizar_rerun, iniciar_rerun, painel_desempenho
+iniciar_rerun(st.session_state.setdefault("sessao_id", uuid.uuid4().hex[:12]))
+
+# O rerun termina em `st.rerun()`/`st.stop()` (login, logout, finalização) ou
+# numa exceção sem passar pelo fim do script; o finally fecha as medições igual
+try:
+    from chamados import sistema_chamados
+    from database import (
+        verificar_usuario,
+        zerar_banco
+    )
+    from arquivo import painel_arquivo
+    from dashboard import dashboard_admin, dashboard_usuario
+    import fila_escrita
+    from importacao import pagina_importacao
+    from recursos import aquecer, painel_recursos, registrar_sessao
+
+
+    # Recursos do processo (cliente, referência, cache de chamados e usuários padrão),
+    # construídos na primeira sessão; nas demais a chamada não faz nada
+    inicio_sessao = time.perf_counter()
+    aquecer()
+    if "sessao_registrada" not in st.session_state:
+        registrar_sessao(time.perf_counter() - inicio_sessao)
+        st.session_state["sessao_registrada"] = True
+
+
+    # Sessão persistente
+    if "usuario_logado" not in st.session_state:
+        st.session_state["usuario_logado"] = None
+        st.session_state["papel"] = None
+
+
+    # Função de logout
+    def sair():
+        st.session_state["usuario_logado"] = None
+        st.session_state["papel"] = None
+        st.rerun()
+
+
+    # Tela de login
+    if not st.session_state["usuario_logado"]:
+        st.title("🔐 Login Sistema de Chamados")
+        usuario_input = st.text_input("Usuário")
+        senha_input = st.text_input("Senha", type="password")
+
+        if st.button("Entrar"):
+            papel = verificar_usuario(usuario_input, senha_input)
+            if papel:
+                st.session_state["usuario_logado"] = usuario_input
+                st.session_state["papel"] = papel
+                st.success(f"Bem-vindo(a), {usuario_input}!")
+                st.rerun()
+            else:
+                st.error("Usuário ou senha incorretos")
 
-# Função de logout
-def sair():
-    st.session_state["usuario_logado"] = None
-    st.session_state["papel"] = None
-    st.rerun()
 
+    # Tela principal
+    else:
+        usuario_logado = st.session_state["usuario_logado"]
+        papel = st.session_state["papel"]
 
-# Tela de login
-if not st.session_state["usuario_logado"]:
-    st.title("🔐 Login Sistema de Chamados")
-    usuario_input = st.text_input("Usuário")
-    senha_input = st.text_input("Senha", type="password")
+        # Menu lateral
+        st.sidebar.title(f"Olá, {usuario_logado}")
+        if st.sidebar.button("Sair"):
+            sair()
 
-    if st.button("Entrar"):
-        papel = verificar_usuario(usuario_input, senha_input)
-        if papel:
-            st.session_state["usuario_logado"] = usuario_input
-            st.session_state["papel"] = papel
-            st.success(f"Bem-vindo(a), {usuario_input}!")
-            st.rerun()
-        else:
-            st.error("Usuário ou senha incorretos")
+        menu_opcoes = ["Dashboard", "Sistema de Chamados"]
+        if papel == "admin":
+            menu_opcoes.append("Importar Chamados")
+        pagina = st.sidebar.radio("Ir para:", menu_opcoes)
 
 
-# Tela principal
-else:
-    usuario_logado = st.session_state["usuario_logado"]
-    papel = st.session_state["papel"]
+        # Navegação entre páginas
+        if pagina == "Dashboard":
+            if papel == "admin":
+                dashboard_admin()      # Dashboard completo com gráficos e exportação
+            else:
+                dashboard_usuario()    # Dashboard simplificado para usuários
 
-    # Menu lateral
-    st.sidebar.title(f"Olá, {usuario_logado}")
-    if st.sidebar.button("Sair"):
-        sair()
+        elif pagina == "Sistema de Chamados":
+            sistema_chamados(usuario_logado)
 
-    menu_opcoes = ["Dashboard", "Sistema de Chamados"]
-    pagina = st.sidebar.radio("Ir para:", menu_opcoes)
+        elif pagina == "Importar Chamados":
+            pagina_importacao()
 
 
-    # Navegação entre páginas
-    if pagina == "Dashboard":
+        # Função sensível apenas para admin
         if papel == "admin":
-            dashboard_admin()      # Dashboard completo com gráficos e exportação
-        else:
-            dashboard_usuario()    # Dashboard simplificado para usuários
-
-    elif pagina == "Sistema de Chamados":
-        sistema_chamados(usuario_logado)
-
-
-    # Função sensível apenas para admin
-    if papel == "admin":
-        st.sidebar.markdown("---")
-        if "confirm_zerar" not in st.session_state:
-            st.session_state["confirm_zerar"] = False
-
-        if not st.session_state["confirm_zerar"]:
-            if st.sidebar.button("Zerar Banco de Dados"):
-                st.session_state["confirm_zerar"] = True
-        else:
-            st.warning("⚠️ Esta ação apagará TODOS os dados do banco de dados!")
-            col1, col2 = st.sidebar.columns(2)
-            if col1.button("Sim"):
-                zerar_banco(confirmar=True)
-                st.session_state["confirm_zerar"] = False
-                st.rerun()
-            if col2.button("Não"):
+            painel_recursos()
+            painel_desempenho()
+            if fila_escrita.ATIVA:
+                fila_escrita.painel_fila()
+            painel_arquivo()
+            st.sidebar.markdown("---")
+            if "confirm_zerar" not in st.session_state:
                 st.session_state["confirm_zerar"] = False
+
+            if not st.session_state["confirm_zerar"]:
+                if st.sidebar.button("Zerar Banco de Dados"):
+                    st.session_state["confirm_zerar"] = True
+            else:
+                st.warning("⚠️ Esta ação apagará TODOS os dados do banco de dados!")
+                col1, col2 = st.sidebar.columns(2)
+                if col1.button("Sim"):
+                    zerar_banco(confirmar=True)
+                    st.session_state["confirm_zerar"] = False
+                    st.rerun()
+                if col2.button("Não"):
+                    st.session_state["confirm_zerar"] = False
+
+finally:
+    # Fecha as medições de desempenho deste rerun
+    finalizar_rerun()
@@ -0,0 +1,395 @@
+"""Substituto local, em memória, do cliente Supabase.
+
+Implementa a parte da API de consulta usada pelo sistema
+(`table().select/insert/update/delete` com filtros, ordenação e paginação)
+para rodar benchmarks e conferências sem acesso à rede. `assinar` imita o
+canal de tempo real: cada alteração é entregue no formato do realtime.
+`falhas_simuladas` faz as próximas requisições falharem, como sem rede.
+Cada alteração de chamados recebe o próximo número em `alteracao` e cada
+remoção vai para `chamados_removidos`, como os gatilhos de schema.sql.
+"""
+import copy
+import threading
+import time
+from datetime import datetime, timedelta
+import pandas as pd
+import metricas
+
+
+class RespostaLocal:
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+
+class ConsultaLocal:
+    def __init__(self, cliente, tabela):
+        self._cliente = cliente
+        self._tabela = tabela
+        self._operacao = "select"
+        self._colunas = None
+        self._contar = False
+        self._dados = None
+        self._filtros = []
+        self._negar = False
+        self._ordem = []
+        self._limite = None
+        self._deslocamento = 0
+        self._ignorar_duplicados = False
+        self._conflito = None
+
+    # Operações
+    def select(self, colunas="*", count=None):
+        self._operacao = "select"
+        if colunas and colunas != "*":
+            self._colunas = [c.strip() for c in colunas.split(",")]
+        self._contar = count is not None
+        return self
+
+    def insert(self, dados, **kwargs):
+        self._operacao = "insert"
+        self._dados = dados if isinstance(dados, list) else [dados]
+        return self
+
+    def upsert(self, dados, on_conflict=None, ignore_duplicates=False, **kwargs):
+        self._operacao = "upsert"
+        self._dados = dados if isinstance(dados, list) else [dados]
+        self._conflito = [c.strip() for c in on_conflict.split(",")] if on_conflict else ["id"]
+        self._ignorar_duplicados = ignore_duplicates
+        return self
+
+    def update(self, dados, **kwargs):
+        self._operacao = "update"
+        self._dados = dados
+        return self
+
+    def delete(self, **kwargs):
+        self._operacao = "delete"
+        return self
+
+    # Filtros
+    def _filtro(self, funcao):
+        negar, self._negar = self._negar, False
+        self._filtros.append((lambda linha: not funcao(linha)) if negar else funcao)
+        return self
+
+    @property
+    def not_(self):
+        self._negar = True
+        return self
+
+    def eq(self, coluna, valor):
+        return self._filtro(lambda l: l.get(coluna) is not None and l.get(coluna) == valor)
+
+    def neq(self, coluna, valor):
+        return self._filtro(lambda l: l.get(coluna) is not None and l.get(coluna) != valor)
+
+    def gt(self, coluna, valor):
+        return self._filtro(lambda l: l.get(coluna) is not None and l[coluna] > valor)
+
+    def gte(self, coluna, valor):
+        return self._filtro(lambda l: l.get(coluna) is not None and l[coluna] >= valor)
+
+    def lt(self, coluna, valor):
+        return self._filtro(lambda l: l.get(coluna) is not None and l[coluna] < valor)
+
+    def lte(self, coluna, valor):
+        return self._filtro(lambda l: l.get(coluna) is not None and l[coluna] <= valor)
+
+    def in_(self, coluna, valores):
+        valores = list(valores)
+        return self._filtro(lambda l: l.get(coluna) in valores)
+
+    def is_(self, coluna, valor):
+        if valor in (None, "null"):
+            return self._filtro(lambda l: l.get(coluna) is None)
+        return self._filtro(lambda l: l.get(coluna) is valor)
+
+    # Ordenação e paginação
+    def order(self, coluna, desc=False):
+        self._ordem.append((coluna, desc))
+        return self
+
+    def limit(self, quantidade):
+        self._limite = quantidade
+        return self
+
+    def range(self, inicio, fim):
+        self._deslocamento = inicio
+        self._limite = fim - inicio + 1
+        return self
+
+    def execute(self):
+        return self._cliente._executar(self)
+
+    def _selecionar(self, linhas):
+        linhas = [l for l in linhas if all(f(l) for f in self._filtros)]
+        if self._ordem and not any(desc for _, desc in self._ordem):
+            # Ordenação ascendente por várias colunas em uma única passada
+            colunas = [coluna for coluna, _ in self._ordem]
+            linhas.sort(key=lambda l: tuple((l.get(c) is None, l.get(c)) for c in colunas))
+            return linhas
+        for coluna, desc in reversed(self._ordem):
+            linhas.sort(key=lambda l: (l.get(coluna) is None, l.get(coluna)), reverse=desc)
+        return linhas
+
+
+class ChamadaLocal:
+    def __init__(self, cliente, nome, parametros):
+        self._cliente = cliente
+        self._nome = nome
+        self._parametros = parametros
+
+    def execute(self):
+        self._cliente._simular_latencia()
+        with self._cliente._lock:
+            self._cliente.requisicoes += 1
+            funcao = FUNCOES[self._nome]
+            return RespostaLocal(copy.deepcopy(funcao(self._cliente, **self._parametros)))
+
+
+# Equivalentes das funções SQL de schema.sql
+def _somar_metricas(cliente, p_linhas):
+    """Soma às métricas os incrementos já agrupados por chave (parte de cadastrar/finalizar)."""
+    tabela = cliente.tabelas.setdefault("metricas_chamados", [])
+    por_chave = {tuple(l[c] for c in metricas.COLUNAS_CHAVE): l for l in tabela}
+    for incremento in p_linhas:
+        chave = tuple(incremento.get(c) or "" for c in metricas.COLUNAS_CHAVE)
+        linha = por_chave.get(chave)
+        if linha is None:
+            linha = dict(zip(metricas.COLUNAS_CHAVE, chave), quantidade=0, soma_duracao_s=0.0, qtd_duracao=0)
+            por_chave[chave] = linha
+            tabela.append(linha)
+        for coluna in metricas.COLUNAS_VALOR:
+            linha[coluna] += incremento.get(coluna) or 0
+    return None
+
+
+def _reconstruir_metricas(cliente):
+    df = pd.DataFrame(cliente.tabelas.get("chamados", []) + cliente.tabelas.get("chamados_historico", []))
+    if not df.empty:
+        df = df[df["abertura"].notna() & df["status"].notna()]
+    linhas = metricas.calcular_metricas(df).to_dict("records")
+    cliente.tabelas["metricas_chamados"] = linhas
+    return len(linhas)
+
+
+def _resumir_metricas(cliente, p_inicio=None, p_fim=None):
+    df = pd.DataFrame(cliente.tabelas.get("metricas_chamados", []), columns=metricas.COLUNAS_CHAVE + metricas.COLUNAS_VALOR)
+    if p_inicio:
+        df = df[df["dia"] >= p_inicio]
+    if p_fim:
+        df = df[df["dia"] <= p_fim]
+    resumo = df.groupby(metricas.COLUNAS_RESUMO, as_index=False)[metricas.COLUNAS_VALOR].sum()
+    return resumo[resumo["quantidade"] != 0].to_dict("records")
+
+
+def _finalizar_chamados(cliente, p_ids, p_observacao=None, p_fechamento=None):
+    fechamento = datetime.fromisoformat(p_fechamento) if p_fechamento else datetime.now()
+    finalizados = []
+    incrementos = []
+    for linha in cliente.tabelas.get("chamados", []):
+        if linha.get("id") in p_ids and linha.get("status") == "Aberto":
+            abertura = datetime.fromisoformat(linha["abertura"]).replace(tzinfo=None)
+            linha.update({
+                "status": "Finalizado",
+                "fechamento": fechamento.isoformat(),
+                "duracao": str(fechamento - abertura).split(".")[0],
+                "observacao": p_observacao,
+            })
+            finalizados.append({k: linha[k] for k in ("id", "fechamento", "duracao")})
+            cliente._publicar("chamados", "UPDATE", linha)
+            chave = {c: linha.get(c) or "" for c in metricas.COLUNAS_CHAVE[1:-1]}
+            chave["dia"] = abertura.date().isoformat()
+            incrementos.append(dict(chave, status="Aberto", quantidade=-1))
+            incrementos.append(dict(
+                chave, status="Finalizado", quantidade=1,
+                soma_duracao_s=(fechamento - abertura).total_seconds(), qtd_duracao=1,
+            ))
+    _somar_metricas(cliente, incrementos)
+    return finalizados
+
+
+def _cadastrar_chamados(cliente, p_chamados):
+    tabela = cliente.tabelas.setdefault("chamados", [])
+    chaves = {linha.get("chave") for linha in tabela} - {None}
+    inseridos = []
+    for chamado in p_chamados:
+        # Sem chave, sempre insere (o índice único do banco aceita vários nulos)
+        if chamado.get("chave") is not None and chamado["chave"] in chaves:
+            continue
+        linha = {c: chamado.get(c) for c in ("regional", "loja", "lider", "motivo", "abertura", "chave")}
+        linha["status"] = chamado.get("status") or "Aberto"
+        linha["id"] = cliente._novo_id("chamados", tabela)
+        tabela.append(linha)
+        chaves.add(linha["chave"])
+        inseridos.append(linha)
+        cliente._publicar("chamados", "INSERT", linha)
+    _somar_metricas(cliente, metricas.incrementos_abertura(inseridos))
+    return [{"id": linha["id"], "chave": linha["chave"]} for linha in inseridos]
+
+
+def _arquivar_chamados(cliente, p_dias=90):
+    corte = datetime.now() - timedelta(days=p_dias)
+    tabela = cliente.tabelas.setdefault("chamados", [])
+    movidos = [
+        linha for linha in tabela
+        if linha.get("status") == "Finalizado" and linha.get("abertura") and linha.get("fechamento")
+        and datetime.fromisoformat(linha["fechamento"]).replace(tzinfo=None) < corte
+    ]
+    if movidos:
+        ids = {id(linha) for linha in movidos}
+        tabela[:] = [linha for linha in tabela if id(linha) not in ids]
+        cliente.tabelas.setdefault("chamados_historico", []).extend(movidos)
+        for linha in movidos:
+            cliente._publicar("chamados", "DELETE", linha)
+    return len(movidos)
+
+
+def _ultima_alteracao(cliente):
+    return cliente.alteracao
+
+
+FUNCOES = {
+    "arquivar_chamados": _arquivar_chamados,
+    "cadastrar_chamados": _cadastrar_chamados,
+    "finalizar_chamados": _finalizar_chamados,
+    "reconstruir_metricas": _reconstruir_metricas,
+    "resumir_metricas": _resumir_metricas,
+    "ultima_alteracao": _ultima_alteracao,
+}
+
+
+class ClienteLocal:
+    """Cliente em memória com a mesma interface de consulta do `supabase.Client`."""
+
+    def __init__(self, tabelas=None, latencia=0.0):
+        self.tabelas = {nome: list(linhas) for nome, linhas in (tabelas or {}).items()}
+        # Número da última alteração de chamados; as linhas iniciais são numeradas em ordem
+        self.tabelas["chamados"] = [
+            dict(linha, alteracao=numero) for numero, linha in enumerate(self.tabelas.get("chamados", []), 1)
+        ]
+        self.alteracao = len(self.tabelas["chamados"])
+        # Atraso simulado (em segundos) de ida e volta por requisição
+        self.latencia = latencia
+        self.requisicoes = 0
+        # Próximas requisições que falham como se a rede tivesse caído
+        self.falhas_simuladas = 0
+        self._proximo_id = {}
+        self._assinantes = {}
+        self._estados = {}
+        # Tabelas com a assinatura caída: os eventos se perdem, como numa queda do socket
+        self._interrompidas = set()
+        self._lock = threading.Lock()
+
+    def table(self, nome):
+        return ConsultaLocal(self, nome)
+
+    def assinar(self, tabela, callback, ao_mudar_estado=None):
+        """Chama `callback(payload)` a cada INSERT, UPDATE ou DELETE da tabela."""
+        self._assinantes.setdefault(tabela, []).append(callback)
+        if ao_mudar_estado:
+            self._estados.setdefault(tabela, []).append(ao_mudar_estado)
+
+    def interromper_assinatura(self, tabela):
+        """Simula a queda do canal: avisa "CHANNEL_ERROR" e descarta os eventos até `retomar_assinatura`."""
+        self._interrompidas.add(tabela)
+        for ao_mudar_estado in self._estados.get(tabela, []):
+            ao_mudar_estado("CHANNEL_ERROR")
+
+    def retomar_assinatura(self, tabela):
+        self._interrompidas.discard(tabela)
+        for ao_mudar_estado in self._estados.get(tabela, []):
+            ao_mudar_estado("SUBSCRIBED")
+
+    def _publicar(self, tabela, tipo, linha):
+        if tabela == "chamados":
+            self._registrar_alteracao(tipo, linha)
+        if not self._assinantes.get(tabela) or tabela in self._interrompidas:
+            return
+        registro = copy.deepcopy(linha)
+        payload = {
+            "data": {
+                "type": tipo,
+                "table": tabela,
+                "record": None if tipo == "DELETE" else registro,
+                "old_record": {"id": registro.get("id")},
+            },
+            "ids": [],
+        }
+        for callback in self._assinantes[tabela]:
+            callback(payload)
+
+    def _registrar_alteracao(self, tipo, linha):
+        self.alteracao += 1
+        if tipo == "DELETE":
+            self.tabelas.setdefault("chamados_removidos", []).append({"id": linha.get("id"), "alteracao": self.alteracao})
+        else:
+            linha["alteracao"] = self.alteracao
+
+    def rpc(self, nome, parametros=None):
+        return ChamadaLocal(self, nome, parametros or {})
+
+    def _novo_id(self, tabela, linhas):
+        if tabela not in self._proximo_id:
+            self._proximo_id[tabela] = max((l.get("id") or 0 for l in linhas), default=0) + 1
+        novo = self._proximo_id[tabela]
+        self._proximo_id[tabela] += 1
+        return novo
+
+    def _simular_latencia(self):
+        if self.latencia:
+            time.sleep(self.latencia)
+        with self._lock:
+            if self.falhas_simuladas:
+                self.falhas_simuladas -= 1
+                raise ConnectionError("Falha de rede simulada")
+
+    def _executar(self, consulta):
+        self._simular_latencia()
+        with self._lock:
+            self.requisicoes += 1
+            linhas = self.tabelas.setdefault(consulta._tabela, [])
+
+            if consulta._operacao == "select":
+                selecionadas = consulta._selecionar(linhas)
+                total = len(selecionadas)
+                fim = None if consulta._limite is None else consulta._deslocamento + consulta._limite
+                selecionadas = selecionadas[consulta._deslocamento:fim]
+                if consulta._colunas:
+                    selecionadas = [{c: l.get(c) for c in consulta._colunas} for l in selecionadas]
+                return RespostaLocal(copy.deepcopy(selecionadas), total if consulta._contar else None)
+
+            if consulta._operacao in ("insert", "upsert"):
+                inseridas = []
+                for dado in consulta._dados:
+                    dado = dict(dado)
+                    if consulta._operacao == "upsert":
+                        existente = next(
+                            (l for l in linhas if all(l.get(c) == dado.get(c) for c in consulta._conflito)),
+                            None,
+                        )
+                        if existente is not None:
+                            if not consulta._ignorar_duplicados:
+                                existente.update(dado)
+                                inseridas.append(existente)
+                                self._publicar(consulta._tabela, "UPDATE", existente)
+                            continue
+                    if dado.get("id") is None:
+                        dado["id"] = self._novo_id(consulta._tabela, linhas)
+                    linhas.append(dado)
+                    inseridas.append(dado)
+                    self._publicar(consulta._tabela, "INSERT", dado)
+                return RespostaLocal(copy.deepcopy(inseridas))
+
+            afetadas = consulta._selecionar(linhas)
+            if consulta._operacao == "update":
+                for linha in afetadas:
+                    linha.update(consulta._dados)
+                    self._publicar(consulta._tabela, "UPDATE", linha)
+            elif consulta._operacao == "delete":
+                ids = {id(l) for l in afetadas}
+                linhas[:] = [l for l in linhas if id(l) not in ids]
+                for linha in afetadas:
+                    self._publicar(consulta._tabela, "DELETE", linha)
+            return RespostaLocal(copy.deepcopy(afetadas))
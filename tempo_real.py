@@ -0,0 +1,150 @@
+"""Atualizações em tempo real da tabela de chamados.
+
+Com CHAMADOS_TEMPO_REAL=1, o processo assina as alterações da tabela
+`chamados` (Supabase Realtime, ou `ClienteLocal.assinar` nos benchmarks) e
+aplica cada lote de eventos ao cache de chamados em uma thread própria. O
+cache deixa de consultar o servidor periodicamente, a lista de chamados é
+paginada em memória e as partes da tela marcadas com `ao_vivo` se redesenham
+sozinhas, sem que o usuário precise clicar para atualizar. Sem o tempo real,
+essas partes continuam sendo fragmentos: os widgets delas reexecutam só a parte.
+"""
+import math
+import os
+import queue
+import threading
+import time
+import streamlit as st
+import desempenho
+
+
+ATIVO = os.getenv("CHAMADOS_TEMPO_REAL", "0") == "1"
+
+# Intervalo (segundos) de redesenho das partes da tela ao vivo
+INTERVALO_TELA = float(os.getenv("CHAMADOS_TEMPO_REAL_INTERVALO", "3"))
+
+# Eventos aplicados ao cache por vez
+TAMANHO_LOTE = 500
+
+# Tempo máximo (segundos) para confirmar a assinatura no Supabase
+TIMEOUT_ASSINATURA = 10
+
+# Intervalo (segundos) entre as conferências de que o canal segue conectado
+INTERVALO_VERIFICACAO = 5
+
+
+def converter_evento(payload):
+    """(tipo, registro) a partir do payload de postgres_changes do realtime."""
+    dados = payload["data"]
+    tipo = str(getattr(dados["type"], "value", dados["type"]))
+    registro = dados.get("old_record") if tipo == "DELETE" else dados.get("record")
+    return tipo, registro or {}
+
+
+class AssinaturaChamados:
+    """Fila de eventos da tabela de chamados consumida por uma thread em lotes."""
+
+    def __init__(self, cache, ao_alterar=()):
+        self.cache = cache
+        self.ao_alterar = list(ao_alterar)
+        self.conectada = False
+        self.eventos = 0
+        self.lotes = 0
+        self.erros = 0
+        self.quedas = 0
+        self._intervalo = cache.intervalo_minimo
+        self._fila = queue.Queue()
+        threading.Thread(target=self._consumir, name="chamados-tempo-real", daemon=True).start()
+
+    def receber(self, payload):
+        """Callback do canal: só enfileira, para não travar quem entrega o evento."""
+        self._fila.put(converter_evento(payload))
+
+    def conectar(self, cliente):
+        """Assina as alterações no cliente local ou no Supabase Realtime."""
+        if hasattr(cliente, "assinar"):
+            cliente.assinar("chamados", self.receber, self.mudar_estado)
+        else:
+            from database_async import agendar, assinar_alteracoes, canal_ativo
+
+            canal = agendar(
+                assinar_alteracoes("chamados", self.receber, ao_mudar_estado=self.mudar_estado)
+            ).result(TIMEOUT_ASSINATURA)
+            threading.Thread(
+                target=self._vigiar, args=(lambda: canal_ativo(canal),), name="chamados-tempo-real-canal", daemon=True
+            ).start()
+        # Os eventos passam a manter o cache; alterações anteriores à assinatura
+        # entram pela leitura incremental forçada aqui
+        self._ativar()
+
+    def mudar_estado(self, estado):
+        """Estados do canal depois da assinatura.
+
+        Fora do ar, o cache volta a consultar o servidor no intervalo de antes;
+        inscrito de novo, recarrega tudo, porque os eventos da queda se perderam.
+        """
+        if estado == "SUBSCRIBED":
+            self._ativar(completo=True)
+        else:
+            self._desativar()
+
+    def _ativar(self, completo=False):
+        self.conectada = True
+        self.cache.intervalo_minimo = math.inf
+        self.cache.invalidar(completo=completo)
+
+    def _desativar(self):
+        if self.conectada:
+            self.conectada = False
+            self.quedas += 1
+            self.cache.intervalo_minimo = self._intervalo
+
+    def _vigiar(self, ativo):
+        # A queda do socket não chega como estado do canal; só a volta ("SUBSCRIBED")
+        while True:
+            time.sleep(INTERVALO_VERIFICACAO)
+            if self.conectada and not ativo():
+                self._desativar()
+
+    def aguardar(self):
+        """Espera a fila esvaziar (benchmarks e conferências)."""
+        self._fila.join()
+
+    def _consumir(self):
+        while True:
+            lote = [self._fila.get()]
+            while len(lote) < TAMANHO_LOTE:
+                try:
+                    lote.append(self._fila.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self.cache.aplicar_eventos(lote)
+                self.eventos += len(lote)
+                self.lotes += 1
+                for funcao in self.ao_alterar:
+                    funcao()
+            except Exception:
+                # Na dúvida, a próxima leitura busca as alterações no servidor
+                self.erros += 1
+                self.cache.invalidar()
+            finally:
+                for _ in lote:
+                    self._fila.task_done()
+
+
+@st.cache_resource(show_spinner=False)
+def iniciar():
+    """Assinatura única do processo; sem conexão, o cache continua consultando o servidor."""
+    import database
+
+    assinatura = AssinaturaChamados(database.cache_chamados(), ao_alterar=[database.ler_metricas.clear])
+    try:
+        assinatura.conectar(database.supabase)
+    except Exception as e:
+        st.warning(f"⚠️ Atualização em tempo real indisponível: {e}")
+    return assinatura
+
+
+def ao_vivo(funcao):
+    """Fragmento medido (desempenho.fragmento); com o tempo real ativo, redesenhado a cada INTERVALO_TELA."""
+    return desempenho.fragmento(funcao, run_every=INTERVALO_TELA if ATIVO else None)